@@ -0,0 +1,349 @@
+"""
+Benchmark harness for the discovery pipeline in discovery_methods.
+
+A local mock server stands in for the Claude, OpenAI and Ollama APIs (same
+request and response schemas, including streaming) with configurable latency
+distributions, error rates and chunking, so run_autonomous_discovery can be
+measured end to end without network access:
+
+    python discovery_benchmark.py --runs 5 --latency 0.2 --error-rate 0.05
+
+test_discovery_benchmark.py runs a small version of every scenario as a CI
+check (python -m pytest -q in this directory).
+"""
+import numpy as np
+import argparse
+import io
+import json
+import contextlib
+import threading
+import time
+from typing import List, Dict, Optional
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import discovery_methods as dm
+
+# Scripted answers: the n-th distinct attempt of a run gets DEFAULT_SCRIPT[n] (the last one repeats)
+DEFAULT_SCRIPT = [
+    "A = 5000 + 300*t",
+    "A = 1000*(1 + 0.05*t)**2",
+    "A = 1000*exp(0.08*t)",
+]
+
+PROVIDER_PATHS = {
+    'claude': '/v1/messages',
+    'openai': '/v1/chat/completions',
+    'ollama': '/api/generate',
+}
+
+def sample_latency(spec: Dict, rng: np.random.Generator) -> float:
+    """
+    Draw one latency in seconds from a distribution spec.
+    
+    Specs: {'dist': 'constant', 'value': s}, {'dist': 'uniform', 'low': a, 'high': b},
+    {'dist': 'lognormal', 'median': m, 'sigma': s} or {'dist': 'exponential', 'mean': m}.
+    """
+    dist = spec.get('dist', 'constant')
+    if dist == 'constant':
+        return spec.get('value', 0.0)
+    if dist == 'uniform':
+        return rng.uniform(spec['low'], spec['high'])
+    if dist == 'lognormal':
+        return spec['median'] * np.exp(spec.get('sigma', 0.5) * rng.standard_normal())
+    if dist == 'exponential':
+        return rng.exponential(spec['mean'])
+    raise ValueError(f"Unknown latency distribution: {dist}")
+
+def scripted_response(prompt: str, script: List[str]) -> str:
+    """Answer in the REASONING/EQUATION/CONFIDENCE format, advancing through the script per past attempt."""
+    attempts = prompt.split("PREVIOUS ATTEMPTS:")[1].count("\nIteration ") + 1 if "PREVIOUS ATTEMPTS:" in prompt else 0
+    equation = script[min(attempts, len(script) - 1)]
+    return (f"REASONING: Attempt {attempts + 1}. The amounts grow faster than linearly, so I compare "
+            f"polynomial and exponential forms against the ratios between consecutive points.\n"
+            f"EQUATION: {equation}\n"
+            f"CONFIDENCE: {'High' if attempts >= len(script) - 1 else 'Medium'}")
+
+class MockLLMServer:
+    """
+    Local HTTP server emulating the Claude, OpenAI and Ollama generation endpoints.
+    
+    Every request first waits for a latency drawn from `latency`, then fails
+    with probability `error_rate` (429 or 503 with Retry-After: 0, so the
+    client's retry path is exercised without slowing the run) or answers from
+    the script. Streaming requests are sent in chunks of `chunk_size`
+    characters, `chunk_delay` seconds apart. Use as a context manager.
+    """
+    
+    def __init__(self, latency: Optional[Dict] = None, error_rate: float = 0.0,
+                 chunk_size: int = 16, chunk_delay: float = 0.005,
+                 script: Optional[List[str]] = None, seed: int = 0):
+        self.latency = latency or {'dist': 'constant', 'value': 0.0}
+        self.error_rate = error_rate
+        self.chunk_size = chunk_size
+        self.chunk_delay = chunk_delay
+        self.script = script or DEFAULT_SCRIPT
+        self.rng = np.random.default_rng(seed)
+        self.requests = 0
+        self.errors = 0
+        self._lock = threading.Lock()
+        self._server = None
+        self._thread = None
+    
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self._server.server_port}"
+    
+    def start(self):
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), self._handler())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+    
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+    
+    def __enter__(self):
+        return self.start()
+    
+    def __exit__(self, *exc):
+        self.stop()
+    
+    def _draw(self):
+        """Latency and failure decision for one request (the shared generator is not thread-safe)."""
+        with self._lock:
+            self.requests += 1
+            latency = sample_latency(self.latency, self.rng)
+            fail = self.rng.random() < self.error_rate
+            status = 429 if self.rng.random() < 0.5 else 503
+            if fail:
+                self.errors += 1
+        return max(latency, 0.0), (status if fail else None)
+    
+    def _handler(self):
+        mock = self
+        
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # Buffer headers and body into one write and send it at once; with separate small
+            # writes on a keep-alive connection Nagle's algorithm waits for the client's delayed
+            # ACK and every reused-connection request would measure a ~40 ms stall of the mock
+            wbufsize = -1
+            disable_nagle_algorithm = True
+            
+            def log_message(self, *args):
+                pass
+            
+            def _send(self, status: int, body: bytes, content_type: str = "application/json", headers=None):
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                for key, value in (headers or {}).items():
+                    self.send_header(key, value)
+                self.end_headers()
+                self.wfile.write(body)
+            
+            def _stream(self, content_type: str, events: List[bytes]):
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                for event in events:
+                    self.wfile.write(f"{len(event):X}\r\n".encode() + event + b"\r\n")
+                    self.wfile.flush()
+                    time.sleep(mock.chunk_delay)
+                self.wfile.write(b"0\r\n\r\n")
+            
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+                latency, failure = mock._draw()
+                time.sleep(latency)
+                if failure is not None:
+                    error = json.dumps({"error": {"type": "mock_error", "status": failure}}).encode()
+                    self._send(failure, error, headers={"Retry-After": "0"})
+                    return
+                
+                if self.path == PROVIDER_PATHS['claude']:
+                    prompt = body["messages"][0]["content"]
+                elif self.path == PROVIDER_PATHS['openai']:
+                    prompt = body["messages"][0]["content"]
+                elif self.path == PROVIDER_PATHS['ollama']:
+                    prompt = body["prompt"]
+                else:
+                    self._send(404, b'{"error": "not found"}')
+                    return
+                text = scripted_response(prompt, mock.script)
+                input_tokens, output_tokens = len(prompt) // 4, len(text) // 4
+                chunks = [text[i:i + mock.chunk_size] for i in range(0, len(text), mock.chunk_size)]
+                
+                if not body.get("stream"):
+                    if self.path == PROVIDER_PATHS['claude']:
+                        reply = {"content": [{"type": "text", "text": text}],
+                                 "usage": {"input_tokens": input_tokens, "output_tokens": output_tokens}}
+                    elif self.path == PROVIDER_PATHS['openai']:
+                        reply = {"choices": [{"message": {"role": "assistant", "content": text}}],
+                                 "usage": {"prompt_tokens": input_tokens, "completion_tokens": output_tokens}}
+                    else:
+                        reply = {"response": text, "done": True,
+                                 "prompt_eval_count": input_tokens, "eval_count": output_tokens}
+                    self._send(200, json.dumps(reply).encode())
+                    return
+                
+                if self.path == PROVIDER_PATHS['claude']:
+                    events = [{"type": "message_start", "message": {"usage": {"input_tokens": input_tokens}}}]
+                    events += [{"type": "content_block_delta", "delta": {"type": "text_delta", "text": c}}
+                               for c in chunks]
+                    events += [{"type": "message_delta", "usage": {"output_tokens": output_tokens}},
+                               {"type": "message_stop"}]
+                    lines = [f"event: {e['type']}\ndata: {json.dumps(e)}\n\n".encode() for e in events]
+                    self._stream("text/event-stream", lines)
+                elif self.path == PROVIDER_PATHS['openai']:
+                    events = [{"choices": [{"delta": {"content": c}}]} for c in chunks]
+                    events.append({"choices": [], "usage": {"prompt_tokens": input_tokens,
+                                                            "completion_tokens": output_tokens}})
+                    lines = [f"data: {json.dumps(e)}\n\n".encode() for e in events] + [b"data: [DONE]\n\n"]
+                    self._stream("text/event-stream", lines)
+                else:
+                    events = [{"response": c, "done": False} for c in chunks]
+                    events.append({"response": "", "done": True,
+                                   "prompt_eval_count": input_tokens, "eval_count": output_tokens})
+                    self._stream("application/x-ndjson", [(json.dumps(e) + "\n").encode() for e in events])
+        
+        return Handler
+
+def mock_config(provider: str, server: MockLLMServer, **overrides) -> Dict:
+    """A run_autonomous_discovery config pointing the given provider at the mock server."""
+    config = {
+        'provider': provider,
+        'anthropic_api_key': 'mock', 'claude_model': 'claude-sonnet-4-mock',
+        'openai_api_key': 'mock', 'openai_model': 'gpt-4o-mock',
+        'ollama_model': 'llama3.1', 'ollama_base_url': server.url,
+        'anthropic_base_url': server.url, 'openai_base_url': server.url,
+        'max_iterations': 5, 'render': 'off', 'max_retries': 5,
+        # The mock has no quota, so only its 429s throttle the scheduler
+        'rate_limits': {name: {'requests_per_minute': None, 'tokens_per_minute': None, 'max_in_flight': None}
+                        for name in dm.PROVIDER_RATE_LIMITS},
+    }
+    config.update(overrides)
+    return config
+
+MODES = {
+    'plain': {},
+    'stream': {'stream': True},
+    'candidates': {'num_candidates': 3},
+}
+
+def _percentiles(values) -> Dict[str, Optional[float]]:
+    values = np.asarray([v for v in values if v is not None], dtype=float)
+    if values.size == 0:
+        return {'p50': None, 'p95': None, 'p99': None}
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {'p50': float(p50), 'p95': float(p95), 'p99': float(p99)}
+
+def run_benchmark(providers=('claude', 'openai', 'ollama'), modes=('plain', 'stream', 'candidates'),
+                  runs: int = 5, latency: Optional[Dict] = None, error_rate: float = 0.0,
+                  chunk_size: int = 16, chunk_delay: float = 0.005, noise_level: float = 0.02,
+                  seed: int = 0, config_overrides: Optional[Dict] = None) -> List[Dict]:
+    """
+    Drive run_autonomous_discovery end to end against the mock server for each provider and mode.
+    
+    Each scenario runs `runs` discoveries on freshly generated datasets (seeded,
+    so every scenario sees the same data) with printing and plotting off.
+    
+    Returns:
+        One report dict per (provider, mode) with 'throughput' (iterations/s and
+        LLM calls/s), 'stages' (p50/p95/p99 seconds for prompt, request, parse,
+        evaluate, plot, the parse/evaluate overlap with streamed requests and
+        total), 'http' (per-attempt latency percentiles and
+        retries), 'time_to_first_score' and 'iterations_to_fit' (iterations until
+        R² > 0.99; None for runs that never got there)
+    """
+    reports = []
+    with MockLLMServer(latency, error_rate, chunk_size, chunk_delay, seed=seed) as server:
+        for provider in providers:
+            for mode in modes:
+                config = mock_config(provider, server, **MODES[mode], **(config_overrides or {}))
+                iterations_all, to_fit = [], []
+                dm.reset_call_stats()
+                start = time.perf_counter()
+                for run in range(runs):
+                    np.random.seed(seed + run)
+                    t, A_noisy, _ = dm.generate_compound_interest_data(noise_level=noise_level)
+                    with contextlib.redirect_stdout(io.StringIO()):
+                        iterations = dm.run_autonomous_discovery(t, A_noisy, config)
+                    iterations_all += iterations
+                    hits = [it['iteration'] for it in iterations
+                            if it['predictions'] is not None and it['r_squared'] > 0.99]
+                    to_fit.append(hits[0] if hits else None)
+                wall = time.perf_counter() - start
+                
+                attempts = [r for r in dm.get_call_stats() if r['provider'] == provider]
+                totals = dm.get_call_totals().get(provider, {})
+                calls = sum((it.get('usage') or {}).get('calls', 0) for it in iterations_all)
+                reached = [n for n in to_fit if n is not None]
+                reports.append({
+                    'provider': provider,
+                    'mode': mode,
+                    'runs': runs,
+                    'iterations': len(iterations_all),
+                    'wall_time': wall,
+                    'throughput': {'iterations_per_s': len(iterations_all) / wall, 'calls_per_s': calls / wall},
+                    'stages': {stage: _percentiles([(it.get('timings') or {}).get(stage) for it in iterations_all])
+                               for stage in dm.TIMING_STAGES + ('overlap', 'total')},
+                    'http': dict(_percentiles([r['latency'] for r in attempts]),
+                                 attempts=totals.get('attempts', 0), retries=totals.get('retries', 0)),
+                    'time_to_first_score': _percentiles([it.get('time_to_first_score') for it in iterations_all]),
+                    'iterations_to_fit': {'per_run': to_fit,
+                                          'mean': float(np.mean(reached)) if reached else None,
+                                          'success_rate': len(reached) / runs},
+                })
+    dm.close_sessions()
+    return reports
+
+def print_benchmark_report(reports: List[Dict]):
+    """Print run_benchmark results as one block per scenario."""
+    def ms(value):
+        return f"{value * 1000:8.1f}" if value is not None else "       -"
+    
+    for rep in reports:
+        print("=" * 80)
+        print(f"{rep['provider']} / {rep['mode']}: {rep['runs']} runs, {rep['iterations']} iterations "
+              f"in {rep['wall_time']:.2f}s "
+              f"({rep['throughput']['iterations_per_s']:.2f} it/s, {rep['throughput']['calls_per_s']:.2f} calls/s)")
+        print(f"  {'stage (ms)':<20}{'p50':>8}{'p95':>8}{'p99':>8}")
+        rows = list(rep['stages'].items()) + [('http attempt', rep['http']),
+                                              ('time to 1st score', rep['time_to_first_score'])]
+        for stage, pct in rows:
+            print(f"  {stage:<20}{ms(pct['p50'])}{ms(pct['p95'])}{ms(pct['p99'])}")
+        fit = rep['iterations_to_fit']
+        mean = f"{fit['mean']:.2f}" if fit['mean'] is not None else "-"
+        print(f"  HTTP attempts: {rep['http']['attempts']} ({rep['http']['retries']} retries)")
+        print(f"  Iterations to R² > 0.99: mean {mean}, reached in {fit['success_rate']:.0%} of runs")
+    print("=" * 80)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the discovery pipeline against a local mock LLM server.")
+    parser.add_argument("--providers", nargs="+", default=list(PROVIDER_PATHS), choices=list(PROVIDER_PATHS))
+    parser.add_argument("--modes", nargs="+", default=list(MODES), choices=list(MODES))
+    parser.add_argument("--runs", type=int, default=5, help="discovery runs per scenario")
+    parser.add_argument("--latency", type=float, default=0.05, help="median request latency in seconds")
+    parser.add_argument("--sigma", type=float, default=0.5, help="log-normal latency spread")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests answered with 429/503")
+    parser.add_argument("--chunk-size", type=int, default=16, help="characters per streamed chunk")
+    parser.add_argument("--chunk-delay", type=float, default=0.005, help="seconds between streamed chunks")
+    parser.add_argument("--noise-level", type=float, default=0.02)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="also write the reports to this file")
+    args = parser.parse_args()
+    
+    reports = run_benchmark(args.providers, args.modes, args.runs,
+                            {'dist': 'lognormal', 'median': args.latency, 'sigma': args.sigma},
+                            args.error_rate, args.chunk_size, args.chunk_delay, args.noise_level, args.seed)
+    print_benchmark_report(reports)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(reports, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""
+On-disk response cache for the LLM providers used by discovery_methods.
+
+Responses are content-addressed by (provider, model, prompt) and stored in
+one SQLite file, which several processes may share. 'replay' mode serves
+recorded responses only, so a run can be repeated without network access.
+"""
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional
+
+# Response cache: content-addressed by (provider, model, prompt), stored in one SQLite file
+CACHE_MODES = ('off', 'readwrite', 'replay')
+
+class CacheMissError(LookupError):
+    """Raised in replay mode when a prompt has no recorded response."""
+
+class ResponseCache:
+    """
+    On-disk LLM response cache with age and size eviction.
+    
+    Entries are keyed by the SHA-256 of (provider, model, prompt). Reads refresh
+    an entry's last-access time, and writes evict expired entries and then the
+    least recently used ones until the stored prompts and responses take at most
+    max_bytes (UTF-8 encoded).
+    Several processes may share one file (see run_batch_discovery): it is kept
+    in WAL mode and a locked database is waited on for up to `timeout` seconds.
+    """
+    
+    def __init__(self, path: str, max_age: Optional[float] = None, max_bytes: Optional[int] = None,
+                 timeout: float = 30.0):
+        self.path = path
+        self.max_age = max_age
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=timeout, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY, provider TEXT, model TEXT, prompt TEXT, response TEXT,"
+            " size INTEGER, created REAL, accessed REAL)"
+        )
+        self._conn.commit()
+    
+    @staticmethod
+    def key(provider: str, model: str, prompt: str) -> str:
+        return hashlib.sha256(json.dumps([provider, model, prompt]).encode("utf-8")).hexdigest()
+    
+    def get(self, provider: str, model: str, prompt: str) -> Optional[str]:
+        """Return the recorded response, or None if absent or expired."""
+        key = self.key(provider, model, prompt)
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT response, created FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            if self.max_age is not None and now - row[1] > self.max_age:
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._conn.commit()
+                return None
+            self._conn.execute("UPDATE responses SET accessed = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            return row[0]
+    
+    def put(self, provider: str, model: str, prompt: str, response: str):
+        """Record a response and apply the eviction policy."""
+        key = self.key(provider, model, prompt)
+        size = len(prompt.encode("utf-8")) + len(response.encode("utf-8"))
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, provider, model, prompt, response, size, now, now)
+            )
+            self._evict(now)
+            self._conn.commit()
+    
+    def _evict(self, now: float):
+        if self.max_age is not None:
+            self._conn.execute("DELETE FROM responses WHERE created < ?", (now - self.max_age,))
+        if self.max_bytes is not None:
+            total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+            if total > self.max_bytes:
+                # Walk from least recently used, collecting keys until enough bytes are freed
+                excess, doomed = total - self.max_bytes, []
+                for key, size in self._conn.execute("SELECT key, size FROM responses ORDER BY accessed"):
+                    if excess <= 0:
+                        break
+                    doomed.append((key,))
+                    excess -= size
+                self._conn.executemany("DELETE FROM responses WHERE key = ?", doomed)
+    
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+    
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+            self._conn.commit()
+    
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+_caches: Dict[str, ResponseCache] = {}
+_caches_lock = threading.Lock()
+
+def get_response_cache(config: Dict) -> Optional[ResponseCache]:
+    """Return the shared cache for config['llm_cache'] (a file path), or None if caching is off."""
+    path = config.get("llm_cache")
+    if path is None or config.get("llm_cache_mode", "readwrite") == "off":
+        return None
+    with _caches_lock:
+        cache = _caches.get(path)
+        if cache is None:
+            cache = ResponseCache(path, config.get("llm_cache_max_age"), config.get("llm_cache_max_bytes"),
+                                  config.get("llm_cache_timeout", 30.0))
+            _caches[path] = cache
+        return cache
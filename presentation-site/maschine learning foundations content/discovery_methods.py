@@ -1,10 +1,42 @@
 import numpy as np
 import matplotlib.pyplot as plt
-from typing import List, Dict, Tuple
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from typing import List, Dict, Tuple, Callable, Optional, Iterator
+from dataclasses import dataclass
+import ast
+import functools
+import hashlib
+import itertools
+import json
+import csv
 import requests
 import re
+import time
+import threading
+import queue
+import zlib
+import os
+import contextlib
+import io
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+import multiprocessing
+
+# Provider transport, response cache, request scheduling and streaming live in their own modules;
+# their public names are re-exported here
+from discovery_cache import CACHE_MODES, CacheMissError, ResponseCache, get_response_cache
+from discovery_scheduler import (PROVIDER_RATE_LIMITS, DEFAULT_EXPECTED_OUTPUT_TOKENS, TokenBucket,
+                                 ProviderScheduler, get_scheduler, get_scheduler_stats, estimate_tokens,
+                                 _provider_slots, _scheduled_request, _yield_request_slot)
+from discovery_transport import (DEFAULT_TIMEOUT, DEFAULT_MAX_RETRIES, DEFAULT_BACKOFF, CALL_LOG_SIZE,
+                                 MODEL_PRICING, get_session, close_sessions, get_call_stats, get_call_totals,
+                                 reset_call_stats, post_json, estimate_cost, call_claude, call_openai,
+                                 call_ollama, call_llm)
+from discovery_streaming import IncrementalParser, stream_claude, stream_openai, stream_ollama, stream_llm
+
 def generate_compound_interest_data(principal: float = 1000.0, rate: float = 0.08, 
-                                     noise_level: float = 0.15, num_points: int = 20) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+                                     noise_level: float = 0.15, num_points: int = 20,
+                                     rng: Optional[np.random.Generator] = None) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
     """
     Generate synthetic compound interest data with noise.
     
@@ -13,6 +45,7 @@ def generate_compound_interest_data(principal: float = 1000.0, rate: float = 0.0
         rate: Annual interest rate (as decimal, e.g., 0.08 for 8%)
         noise_level: Standard deviation of noise as fraction of true value
         num_points: Number of data points
+        rng: Optional seeded np.random.Generator (the global np.random state otherwise)
     
     Returns:
         t: array of time values (years)
@@ -23,11 +56,132 @@ def generate_compound_interest_data(principal: float = 1000.0, rate: float = 0.0
     A_true = principal * np.exp(rate * t)
     
     # Add Gaussian noise
-    noise = np.random.normal(0, noise_level * A_true)
+    noise = (rng if rng is not None else np.random).normal(0, noise_level * A_true)
     A_noisy = A_true + noise
     
     return t, A_noisy, A_true
 
+# Ground-truth laws for synthetic data: name -> function of t, default parameters and equation
+def _law_compound_interest(t, principal, rate):
+    return principal * np.exp(rate * t)
+
+def _law_linear(t, intercept, slope):
+    return intercept + slope * t
+
+def _law_quadratic(t, a, b, c):
+    return a + b * t + c * t ** 2
+
+def _law_power(t, scale, exponent):
+    return scale * t ** exponent
+
+def _law_logistic(t, capacity, rate, midpoint):
+    return capacity / (1 + np.exp(-rate * (t - midpoint)))
+
+def _law_damped_oscillation(t, offset, amplitude, decay, frequency):
+    return offset + amplitude * np.exp(-decay * t) * np.cos(frequency * t)
+
+def _law_logarithmic(t, a, b):
+    return a + b * np.log(t + 1)
+
+GROUND_TRUTH_LAWS = {
+    'compound_interest': (_law_compound_interest, {'principal': 1000.0, 'rate': 0.08},
+                          "{principal} * exp({rate} * t)"),
+    'linear': (_law_linear, {'intercept': 1000.0, 'slope': 250.0}, "{intercept} + {slope} * t"),
+    'quadratic': (_law_quadratic, {'a': 1000.0, 'b': 50.0, 'c': 8.0}, "{a} + {b} * t + {c} * t**2"),
+    'power': (_law_power, {'scale': 100.0, 'exponent': 1.5}, "{scale} * t**{exponent}"),
+    'logistic': (_law_logistic, {'capacity': 10000.0, 'rate': 0.3, 'midpoint': 15.0},
+                 "{capacity} / (1 + exp(-{rate} * (t - {midpoint})))"),
+    'damped_oscillation': (_law_damped_oscillation,
+                           {'offset': 1000.0, 'amplitude': 500.0, 'decay': 0.1, 'frequency': 0.8},
+                           "{offset} + {amplitude} * exp(-{decay} * t) * cos({frequency} * t)"),
+    'logarithmic': (_law_logarithmic, {'a': 1000.0, 'b': 800.0}, "{a} + {b} * log(t + 1)"),
+}
+
+def law_equation(law: str, params: Optional[Dict] = None) -> str:
+    """The ground-truth equation of a law, in the equation language, with its parameters filled in."""
+    _, defaults, template = GROUND_TRUTH_LAWS[law]
+    return template.format(**dict(defaults, **(params or {})))
+
+REPLICATE_BLOCK = 1024      # time points per noise Generator; fixed so chunk_points does not change the data
+
+def iter_replicate_chunks(law: str = 'compound_interest', params: Optional[Dict] = None,
+                          num_replicates: int = 100, num_points: int = 20, t_max: float = 30.0,
+                          noise_level: float = 0.15, seed: Optional[int] = None,
+                          chunk_points: int = 65536) -> Iterator[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+    """
+    Stream noisy replicates of a ground-truth law in chunks of time points.
+    
+    The noise of points [b * REPLICATE_BLOCK, (b + 1) * REPLICATE_BLOCK) is
+    drawn for all replicates in one (R, block) call from its own Generator,
+    seeded by the b-th child of SeedSequence(seed). The blocks do not move with
+    chunk_points and rows are filled in order, so the data depend neither on
+    chunk_points nor on num_replicates. Memory stays bounded by
+    (chunk_points + REPLICATE_BLOCK) * num_replicates.
+    
+    Yields:
+        t: (n,) time values of the chunk
+        A_noisy: (R, n) replicates with Gaussian noise of noise_level * |A_true|
+        A_true: (n,) noiseless values
+    """
+    func, defaults, _ = GROUND_TRUTH_LAWS[law]
+    params = dict(defaults, **(params or {}))
+    root = np.random.SeedSequence(seed)
+    step = t_max / (num_points - 1) if num_points > 1 else 0.0
+    block_start, block = None, None
+    for start in range(0, max(num_points, 1), chunk_points):
+        stop = min(start + chunk_points, num_points)
+        index = np.arange(start, stop)
+        t = index * step
+        A_true = func(t, **params)
+        noise = np.empty((num_replicates, len(index)))
+        pos = start
+        while pos < stop:
+            if block_start is None or not block_start <= pos < block_start + block.shape[1]:
+                # Same as root.spawn()'s b-th child, without spawning the blocks before it
+                b = pos // REPLICATE_BLOCK
+                child = np.random.SeedSequence(root.entropy, spawn_key=root.spawn_key + (b,),
+                                               pool_size=root.pool_size)
+                block_start = b * REPLICATE_BLOCK
+                width = min(REPLICATE_BLOCK, num_points - block_start)
+                block = np.random.default_rng(child).standard_normal((num_replicates, width))
+            take = min(stop, block_start + block.shape[1]) - pos
+            noise[:, pos - start:pos - start + take] = block[:, pos - block_start:pos - block_start + take]
+            pos += take
+        yield t, A_true + noise * (noise_level * np.abs(A_true)), A_true
+
+def generate_replicates(law: str = 'compound_interest', params: Optional[Dict] = None,
+                        num_replicates: int = 100, num_points: int = 20, t_max: float = 30.0,
+                        noise_level: float = 0.15, seed: Optional[int] = None,
+                        chunk_points: int = 65536) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Generate an (R, N) block of noisy replicates of a ground-truth law.
+    
+    The block is the concatenation of iter_replicate_chunks, so a seed gives
+    the same data for any chunk_points, whether it is generated whole or
+    streamed. With the default law and parameters each row is a
+    compound-interest series like generate_compound_interest_data's.
+    
+    Args:
+        law: Key of GROUND_TRUTH_LAWS
+        params: Parameters overriding the law's defaults
+        num_replicates: Number of replicates R
+        num_points: Number of time points N, evenly spaced on [0, t_max]
+        t_max: Last time value
+        noise_level: Standard deviation of noise as fraction of the true value
+        seed: Seed of the np.random.SeedSequence behind every replicate
+        chunk_points: Time points generated per chunk (does not change the data)
+    
+    Returns:
+        t: (N,) time values
+        A_noisy: (R, N) noisy replicates
+        A_true: (N,) true values
+    """
+    chunks = list(iter_replicate_chunks(law, params, num_replicates, num_points, t_max,
+                                        noise_level, seed, chunk_points))
+    if len(chunks) == 1:
+        return chunks[0]
+    return tuple(np.concatenate(parts, axis=-1) for parts in zip(*chunks))
+
 def plot_introduction(t: np.ndarray, A_true: np.ndarray, principal: float, rate: float):
     """Display the true compound interest law."""
     fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(14, 5))
@@ -65,6 +219,14 @@ def plot_noisy_data(t: np.ndarray, A_noisy: np.ndarray):
 def plot_iteration(t: np.ndarray, A_noisy: np.ndarray, predictions: np.ndarray, 
                    equation: str, r_squared: float, iteration: int):
     """Plot the current hypothesis against data."""
+    plt.figure(figsize=(10, 6))
+    _draw_iteration(plt.gca(), t, A_noisy, predictions, equation, r_squared, iteration)
+    plt.tight_layout()
+    plt.show()
+
+def _draw_iteration(ax, t: np.ndarray, A_noisy: np.ndarray, predictions: np.ndarray,
+                    equation: str, r_squared: float, iteration: int):
+    """Draw an iteration's hypothesis against the data on ax."""
     # Determine color based on fit quality
     if r_squared > 0.95:
         color = 'green'
@@ -73,20 +235,274 @@ def plot_iteration(t: np.ndarray, A_noisy: np.ndarray, predictions: np.ndarray,
     else:
         color = 'red'
     
-    plt.figure(figsize=(10, 6))
-    plt.scatter(t, A_noisy, c='darkgreen', s=100, alpha=0.4, 
-                edgecolors='black', label='Measured Data', zorder=3)
-    plt.plot(t, predictions, color=color, linewidth=3, 
-             label=f'Prediction: {equation}', zorder=2)
+    ax.scatter(t, A_noisy, c='darkgreen', s=100, alpha=0.4, 
+               edgecolors='black', label='Measured Data', zorder=3)
+    ax.plot(t, predictions, color=color, linewidth=3, 
+            label=f'Prediction: {equation}', zorder=2)
     
-    plt.xlabel('Time t (years)', fontsize=12)
-    plt.ylabel('Amount A ($)', fontsize=12)
-    plt.title(f'Iteration {iteration} - R² = {r_squared:.4f}', 
-              fontsize=14, fontweight='bold')
-    plt.grid(True, alpha=0.3)
-    plt.legend(fontsize=11)
-    plt.tight_layout()
-    plt.show()
+    ax.set_xlabel('Time t (years)', fontsize=12)
+    ax.set_ylabel('Amount A ($)', fontsize=12)
+    ax.set_title(f'Iteration {iteration} - R² = {r_squared:.4f}', 
+                 fontsize=14, fontweight='bold')
+    ax.grid(True, alpha=0.3)
+    ax.legend(fontsize=11)
+
+RENDER_MODES = ('live', 'off', 'file', 'reuse')
+
+class IterationRenderer:
+    """
+    Renders run_autonomous_discovery's per-iteration plots in one of four modes.
+    
+    'live' calls plot_iteration (a new figure and plt.show() per iteration),
+    'off' skips figure creation entirely, 'file' hands the data to a background
+    thread that draws on a pyplot-free Figure with the Agg canvas and saves
+    iteration_NNN.png into render_dir, and 'reuse' redraws a single figure in
+    place (a display handle in notebooks, the interactive window otherwise).
+    """
+    
+    def __init__(self, mode: str = 'live', render_dir: str = 'discovery_plots'):
+        if mode not in RENDER_MODES:
+            raise ValueError(f"Unknown render mode: {mode}")
+        self.mode = mode
+        self.render_dir = render_dir
+        self._queue = None
+        self._worker = None
+        self._figure = None
+        self._handle = None
+        self.errors = []        # (iteration, exception) for plots the file writer could not save
+        if mode == 'file':
+            os.makedirs(render_dir, exist_ok=True)
+            self._queue = queue.Queue()
+            self._worker = threading.Thread(target=self._save_loop, daemon=True)
+            self._worker.start()
+    
+    def plot(self, t: np.ndarray, A_noisy: np.ndarray, predictions: np.ndarray,
+             equation: str, r_squared: float, iteration: int):
+        if self.mode == 'live':
+            plot_iteration(t, A_noisy, predictions, equation, r_squared, iteration)
+        elif self.mode == 'file':
+            self._queue.put((np.array(t), np.array(A_noisy), np.array(predictions), equation, r_squared, iteration))
+        elif self.mode == 'reuse':
+            self._redraw(t, A_noisy, predictions, equation, r_squared, iteration)
+    
+    def _save_loop(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            # A failed plot must not end the thread, or later plots pile up unsaved
+            try:
+                fig = Figure(figsize=(10, 6))
+                FigureCanvasAgg(fig)
+                _draw_iteration(fig.add_subplot(), *item)
+                fig.tight_layout()
+                fig.savefig(os.path.join(self.render_dir, f"iteration_{item[-1]:03d}.png"))
+            except Exception as e:
+                self.errors.append((item[-1], e))
+                print(f"⚠️ Could not save the plot of iteration {item[-1]}: {e}")
+    
+    def _redraw(self, t, A_noisy, predictions, equation, r_squared, iteration):
+        if self._figure is None:
+            self._figure = plt.figure(figsize=(10, 6))
+            try:
+                from IPython import get_ipython
+                from IPython.display import display
+                in_notebook = get_ipython() is not None
+            except ImportError:
+                in_notebook = False
+            if in_notebook:
+                self._handle = display(self._figure, display_id=True)
+                plt.close(self._figure)     # keep the inline backend from showing it again
+            else:
+                plt.ion()
+                plt.show()
+        fig = self._figure
+        fig.clf()
+        _draw_iteration(fig.add_subplot(), t, A_noisy, predictions, equation, r_squared, iteration)
+        fig.tight_layout()
+        if self._handle is not None:
+            self._handle.update(fig)
+        else:
+            fig.canvas.draw_idle()
+            fig.canvas.flush_events()
+    
+    def close(self):
+        """Wait for pending files to be written; failures are listed in errors."""
+        if self._worker is not None:
+            self._queue.put(None)
+            self._worker.join()
+            self._worker = None
+
+class EquationError(ValueError):
+    """
+    Structured error for an equation that cannot be used.
+    
+    Attributes:
+        equation: The normalized equation string
+        kind: 'syntax', 'unsupported' or 'evaluation'
+        message: Human-readable reason
+    """
+    def __init__(self, equation: str, kind: str, message: str):
+        super().__init__(f"{kind} error in '{equation}': {message}")
+        self.equation = equation
+        self.kind = kind
+        self.message = message
+    
+    def to_dict(self) -> Dict[str, str]:
+        return {'equation': self.equation, 'kind': self.kind, 'message': self.message}
+
+# Whitelisted vocabulary of the equation language
+EQUATION_FUNCTIONS = {
+    'exp': np.exp, 'log': np.log, 'ln': np.log, 'log10': np.log10, 'log2': np.log2,
+    'sqrt': np.sqrt, 'abs': np.abs, 'floor': np.floor, 'ceil': np.ceil,
+    'sin': np.sin, 'cos': np.cos, 'tan': np.tan,
+    'arcsin': np.arcsin, 'arccos': np.arccos, 'arctan': np.arctan,
+    'asin': np.arcsin, 'acos': np.arccos, 'atan': np.arctan,
+    'sinh': np.sinh, 'cosh': np.cosh, 'tanh': np.tanh,
+}
+EQUATION_CONSTANTS = {'e': np.e, 'pi': np.pi, 'π': np.pi}
+_MODULE_PREFIXES = {'np', 'numpy', 'math'}
+_BINARY_OPS = (ast.Add, ast.Sub, ast.Mult, ast.Div, ast.Pow)
+_UNARY_OPS = (ast.UAdd, ast.USub)
+
+@dataclass(frozen=True)
+class CompiledEquation:
+    """
+    An equation parsed into a whitelisted AST and compiled to a vectorized NumPy function.
+    
+    Every numeric literal is a parameter: constants holds their values in source
+    order and func(t, params) evaluates the expression for any parameter values,
+    including arrays of shape (K, 1) to evaluate K parameter sets against t at once.
+    exponents lists the indices of literals that are the exponent of a '**'.
+    """
+    text: str
+    constants: Tuple[float, ...]
+    exponents: Tuple[int, ...]
+    size: int
+    func: Callable
+    
+    def __call__(self, t: np.ndarray, params=None) -> np.ndarray:
+        t = np.asarray(t, dtype=float)
+        params = self.constants if params is None else params
+        try:
+            with np.errstate(all='ignore'):
+                result = np.asarray(self.func(t, params), dtype=float)
+        except Exception as e:
+            raise EquationError(self.text, 'evaluation', str(e)) from e
+        shape = np.broadcast(result, t).shape
+        if result.shape != shape:
+            # A constant expression such as 'A = 1000'; callers may write to the result
+            return np.array(np.broadcast_to(result, shape))
+        return result.copy() if result is t else result
+
+class _EquationCompiler(ast.NodeTransformer):
+    """Validates an expression AST and turns numeric literals into parameters _p[i]."""
+    
+    def __init__(self, equation: str):
+        self.equation = equation
+        self.constants = []
+        self.exponents = []
+    
+    def _reject(self, what: str):
+        raise EquationError(self.equation, 'unsupported', what)
+    
+    def visit_Expression(self, node):
+        node.body = self.visit(node.body)
+        return node
+    
+    def visit_BinOp(self, node):
+        if not isinstance(node.op, _BINARY_OPS):
+            self._reject(f"operator {type(node.op).__name__}")
+        right = node.right.operand if isinstance(node.right, ast.UnaryOp) else node.right
+        if isinstance(node.op, ast.Pow) and isinstance(right, ast.Constant):
+            node.left = self.visit(node.left)
+            self.exponents.append(len(self.constants))
+            node.right = self.visit(node.right)
+            return node
+        return self.generic_visit(node)
+    
+    def visit_UnaryOp(self, node):
+        if not isinstance(node.op, _UNARY_OPS):
+            self._reject(f"operator {type(node.op).__name__}")
+        return self.generic_visit(node)
+    
+    def visit_Constant(self, node):
+        if isinstance(node.value, bool) or not isinstance(node.value, (int, float)):
+            self._reject(f"literal {node.value!r}")
+        self.constants.append(float(node.value))
+        index = ast.Constant(len(self.constants) - 1)
+        return ast.copy_location(ast.Subscript(value=ast.Name('_p', ast.Load()), slice=index, ctx=ast.Load()), node)
+    
+    def visit_Name(self, node):
+        if node.id != 't' and node.id not in EQUATION_CONSTANTS:
+            self._reject(f"name '{node.id}'")
+        return node
+    
+    def visit_Call(self, node):
+        func = node.func
+        if isinstance(func, ast.Attribute) and isinstance(func.value, ast.Name) and func.value.id in _MODULE_PREFIXES:
+            name = func.attr
+        elif isinstance(func, ast.Name):
+            name = func.id
+        else:
+            self._reject("call target")
+        if name not in EQUATION_FUNCTIONS:
+            self._reject(f"function '{name}'")
+        if node.keywords or len(node.args) != 1:
+            self._reject(f"call of '{name}' with other than one argument")
+        node.func = ast.copy_location(ast.Name(name, ast.Load()), func)
+        node.args = [self.visit(node.args[0])]
+        return node
+    
+    def generic_visit(self, node):
+        if not isinstance(node, (ast.BinOp, ast.UnaryOp, ast.operator, ast.unaryop, ast.expr_context)):
+            self._reject(f"syntax {type(node).__name__}")
+        return super().generic_visit(node)
+
+def normalize_equation(equation_str: str) -> str:
+    """
+    Normalize an equation string from an LLM to a Python expression in t.
+    
+    Strips markdown/LaTeX delimiters and an 'A =' or 'A(t) =' prefix, maps
+    mathematical symbols (×, ·, ÷, −, ^, ², ³) to operators, makes implicit
+    multiplication after numbers explicit (0.08t -> 0.08*t) and collapses whitespace.
+    """
+    eq = equation_str.strip().strip('`$').strip()
+    for symbol, replacement in (('×', '*'), ('·', '*'), ('÷', '/'), ('−', '-'),
+                                ('^', '**'), ('²', '**2'), ('³', '**3')):
+        eq = eq.replace(symbol, replacement)
+    eq = re.sub(r'^A\s*(\(\s*t\s*\))?\s*=', '', eq)
+    eq = re.sub(r'(?<![\w.])(\d+\.?\d*(?:[eE][+-]?\d+)?)(?![\d.]|[eE][+-]?\d)\s*(?=[A-Za-zπ(])', r'\1*', eq)
+    return ' '.join(eq.split())
+
+@functools.lru_cache(maxsize=1024)
+def _compile_normalized(text: str) -> CompiledEquation:
+    try:
+        tree = ast.parse(text, mode='eval')
+    except SyntaxError as e:
+        raise EquationError(text, 'syntax', e.msg) from None
+    size = sum(1 for _ in ast.walk(tree.body))
+    compiler = _EquationCompiler(text)
+    body = compiler.visit(tree).body
+    
+    lam = ast.Expression(ast.Lambda(
+        args=ast.arguments(posonlyargs=[], args=[ast.arg('t'), ast.arg('_p')],
+                           kwonlyargs=[], kw_defaults=[], defaults=[]),
+        body=body))
+    ast.fix_missing_locations(lam)
+    namespace = {'__builtins__': {}, **EQUATION_FUNCTIONS, **EQUATION_CONSTANTS}
+    func = eval(compile(lam, '<equation>', 'eval'), namespace)
+    return CompiledEquation(text, tuple(compiler.constants), tuple(compiler.exponents), size, func)
+
+def compile_equation(equation_str: str) -> CompiledEquation:
+    """
+    Parse, validate and compile an equation, cached by its normalized text.
+    
+    Raises:
+        EquationError: If the equation is not a valid expression in t over the
+            whitelisted functions (EQUATION_FUNCTIONS) and constants (EQUATION_CONSTANTS)
+    """
+    return _compile_normalized(normalize_equation(equation_str))
 
 def evaluate_equation(equation_str: str, t: np.ndarray) -> np.ndarray:
     """
@@ -97,61 +513,190 @@ def evaluate_equation(equation_str: str, t: np.ndarray) -> np.ndarray:
         t: Array of time values
         
     Returns:
-        Array of predicted values
+        Array of predicted values, or None if the equation is invalid
+        (use compile_equation to get the EquationError)
     """
     try:
-        # Clean up the equation
-        eq = equation_str.strip()
-        
-        # Replace mathematical notation FIRST (before stripping prefixes)
-        eq = eq.replace('×', '*')  # Replace multiplication symbol
-        eq = eq.replace('÷', '/')  # Replace division symbol
-        eq = eq.replace('π', 'np.pi')
-        eq = eq.replace('pi', 'np.pi')
-        eq = eq.replace('^', '**')
-        eq = eq.replace('e**', 'np.exp')  # e^x becomes np.exp(x)
+        return compile_equation(equation_str)(t)
+    except EquationError:
+        return None
+
+def predict(equation_str: str, constants: Optional[Tuple[float, ...]], t: np.ndarray) -> Optional[np.ndarray]:
+    """
+    Evaluate an equation with other values for its literals (e.g. refine_constants'
+    full-precision 'constants'), or as typed if constants is None.
+    
+    Returns:
+        Array of predicted values, or None if the equation is invalid
+    """
+    try:
+        return compile_equation(equation_str)(t, constants)
+    except EquationError:
+        return None
+
+class _ConstantSubstituter(ast.NodeTransformer):
+    """Replaces numeric literals, in the compiler's order, with new values."""
+    
+    def __init__(self, values):
+        self.values = iter(values)
+    
+    def visit_Constant(self, node):
+        value = next(self.values)
+        if isinstance(node.value, int) and value == node.value:
+            value = node.value
+        if value < 0:
+            # Negative values as unary minus, so ast.unparse parenthesises them where needed
+            return ast.copy_location(ast.UnaryOp(ast.USub(), ast.Constant(-value)), node)
+        return ast.copy_location(ast.Constant(value), node)
+    
+    def visit_UnaryOp(self, node):
+        self.generic_visit(node)
+        if isinstance(node.op, ast.USub) and isinstance(node.operand, ast.UnaryOp) \
+                and isinstance(node.operand.op, ast.USub):
+            return node.operand.operand
+        return node
+    
+    def visit_BinOp(self, node):
+        self.generic_visit(node)
+        # a + -b → a - b, a - -b*x → a + b*x
+        if isinstance(node.op, (ast.Add, ast.Sub)):
+            right = node.right
+            lead = right.left if isinstance(right, ast.BinOp) and isinstance(right.op, (ast.Mult, ast.Div)) else right
+            if isinstance(lead, ast.UnaryOp) and isinstance(lead.op, ast.USub):
+                if lead is right:
+                    node.right = lead.operand
+                else:
+                    right.left = lead.operand
+                node.op = ast.Sub() if isinstance(node.op, ast.Add) else ast.Add()
+        return node
+
+def substitute_constants(compiled: CompiledEquation, constants, digits: int = 6) -> str:
+    """Return the equation text with its numeric literals replaced by constants (rounded for display)."""
+    tree = ast.parse(compiled.text, mode='eval')
+    values = [float(f"{c:.{digits}g}") for c in constants]
+    return ast.unparse(_ConstantSubstituter(values).visit(tree))
+
+def refine_constants(compiled: CompiledEquation, t: np.ndarray, y: np.ndarray,
+                     max_iter: int = 50, fit_exponents: bool = False) -> Dict:
+    """
+    Re-fit the numeric literals of an equation to the data by least squares.
+    
+    The structure proposed by the LLM is kept and its constants are treated as
+    free parameters, starting from the values the LLM typed. Levenberg-Marquardt
+    steps are vectorized: the finite-difference Jacobian and a sweep of damping
+    factors are each evaluated as one batch of parameter sets.
+    
+    Args:
+        compiled: Equation from compile_equation
+        t: Array of time values
+        y: Array of measured values
+        max_iter: Maximum number of Levenberg-Marquardt steps
+        fit_exponents: Also fit literals that are the exponent of '**' (t**2 stays a square by default)
         
-        # Handle mathematical functions - must be done carefully to avoid replacing substrings
-        eq = eq.replace('sqrt', 'np.sqrt')
-        eq = eq.replace('arcsin', 'np.arcsin')
-        eq = eq.replace('arccos', 'np.arccos')
-        eq = eq.replace('arctan', 'np.arctan')
-        eq = eq.replace('sinh', 'np.sinh')
-        eq = eq.replace('cosh', 'np.cosh')
-        eq = eq.replace('tanh', 'np.tanh')
-        eq = eq.replace('sin', 'np.sin')
-        eq = eq.replace('cos', 'np.cos')
-        eq = eq.replace('tan', 'np.tan')
-        eq = eq.replace('exp', 'np.exp')
-        eq = eq.replace('ln', 'np.log')  # ln is natural log
-        eq = eq.replace('log10', 'np.log10')
-        eq = eq.replace('log2', 'np.log2')
-        eq = eq.replace('log', 'np.log')  # Keep as last log replacement
-        eq = eq.replace('abs', 'np.abs')
-        eq = eq.replace('floor', 'np.floor')
-        eq = eq.replace('ceil', 'np.ceil')
+    Returns:
+        Dictionary with 'constants', 'predictions', 'equation' (text with refitted constants),
+        'sse' and 'iterations'
+    """
+    t = np.asarray(t, dtype=float)
+    P, predictions, sse, iterations = _refine_weighted(compiled, t, np.asarray(y, dtype=float),
+                                                       np.ones((1, t.shape[0]), dtype=bool), max_iter, fit_exponents)
+    return {
+        'constants': tuple(P[0]),
+        'predictions': np.array(predictions[0], dtype=float),
+        'equation': substitute_constants(compiled, P[0]),
+        'sse': float(sse[0]),
+        'iterations': int(iterations[0])
+    }
+
+def _refine_weighted(compiled: CompiledEquation, t: np.ndarray, y: np.ndarray, weights: np.ndarray,
+                     max_iter: int = 50, fit_exponents: bool = False) -> Tuple[np.ndarray, ...]:
+    """
+    refine_constants for F fits at once, each on the points where its row of weights (F, N) is True.
+    
+    Every fit keeps its own parameters, damping and stopping state, but the
+    Jacobians, damping sweeps and linear solves of all fits still running are
+    batched together. Returns the constants (F, C), predictions over all of t
+    (F, N), the SSE over each fit's points (F,) and the steps taken (F,).
+    """
+    F, N = weights.shape
+    p = np.array(compiled.constants, dtype=float)
+    free = np.array([j for j in range(len(p)) if fit_exponents or j not in compiled.exponents], dtype=int)
+    
+    def batch_eval(P):
+        """Evaluate parameter sets (..., C) against t in one call, (..., N)."""
+        flat = P.reshape(int(np.prod(P.shape[:-1])), P.shape[-1])
+        params = [flat[:, j:j+1] for j in range(flat.shape[1])]
+        return np.broadcast_to(compiled(t, params), (flat.shape[0], N)).reshape(P.shape[:-1] + (N,))
+    
+    def batch_sse(predictions, w):
+        with np.errstate(over='ignore', invalid='ignore'):
+            sse = np.sum(np.where(w, y - predictions, 0.0) ** 2, axis=-1)
+        return np.where(np.isfinite(sse), sse, np.inf)
+    
+    P = np.tile(p, (F, 1))
+    predictions = np.array(batch_eval(P))
+    sse = batch_sse(predictions, weights)
+    iterations = np.zeros(F, dtype=int)
+    damping = np.full(F, 1e-3)
+    factors = np.array([1e-2, 1e-1, 1.0, 1e1, 1e2])
+    active = np.isfinite(sse) & (free.size > 0)
+    for step in range(1, max_iter + 1):
+        fits = np.flatnonzero(active)
+        if not fits.size:
+            break
+        iterations[fits] = step
+        w = weights[fits]
         
-        # Remove 'A =' or 'A=' prefix if present
-        if eq.startswith('A ='):
-            eq = eq[3:].strip()
-        elif eq.startswith('A='):
-            eq = eq[2:].strip()
+        # Forward-difference Jacobians of the residuals, one batch for all fits and free constants
+        p_free = P[fits][:, free]
+        h = 1e-6 * np.maximum(np.abs(p_free), 1e-3)                         # (A, F')
+        Q = np.repeat(P[fits][:, None, :], free.size, axis=1)
+        Q[:, np.arange(free.size), free] += h
+        with np.errstate(over='ignore', invalid='ignore'):
+            J = np.where(w[:, None, :], (batch_eval(Q) - predictions[fits][:, None, :]) / h[:, :, None], 0.0)
+        finite = np.all(np.isfinite(J), axis=(1, 2))
+        active[fits[~finite]] = False
+        fits, w, J = fits[finite], w[finite], J[finite]
+        if not fits.size:
+            continue
         
-        # Create a safe namespace with numpy functions
-        namespace = {
-            't': t, 
-            'np': np, 
-            'e': np.e,  # Euler's number
-            '__builtins__': {}
-        }
+        JtJ = J @ J.transpose(0, 2, 1)                                      # (A, F', F')
+        g = np.einsum('afn,an->af', J, np.where(w, y - predictions[fits], 0.0))
+        scale = np.einsum('aii->ai', JtJ) + 1e-12
         
-        # Evaluate
-        result = eval(eq, namespace)
+        # Solve for a sweep of damping factors per fit and keep each fit's best step
+        lams = damping[fits][:, None] * factors                             # (A, L)
+        M = JtJ[:, None] + lams[:, :, None, None] * (scale[:, None, :, None] * np.eye(free.size))
+        rhs = np.broadcast_to(g[:, None, :, None], M.shape[:-1] + (1,))
+        try:
+            steps = np.linalg.solve(M, rhs)[..., 0]
+        except np.linalg.LinAlgError:
+            steps = np.zeros(M.shape[:-1])
+            for index in np.ndindex(M.shape[:2]):
+                try:
+                    steps[index] = np.linalg.solve(M[index], rhs[index])[:, 0]
+                except np.linalg.LinAlgError:
+                    pass
+        trial_P = np.repeat(P[fits][:, None, :], len(factors), axis=1)
+        trial_P[:, :, free] += steps
+        trial = batch_eval(trial_P)                                         # (A, L, N)
+        trial_sse = batch_sse(trial, w[:, None, :])
+        best = np.argmin(trial_sse, axis=1)
+        best_sse = trial_sse[np.arange(fits.size), best]
         
-        return np.array(result)
-    except Exception as e:
-        print(f"⚠️  Error evaluating equation '{equation_str}': {e}")
-        return None
+        worse = best_sse >= sse[fits]
+        damping[fits[worse]] *= 1e3
+        active[fits[worse][damping[fits[worse]] > 1e12]] = False
+        better = ~worse
+        accepted = fits[better]
+        improvement = (sse[accepted] - best_sse[better]) / np.maximum(sse[accepted], 1e-300)
+        P[accepted] = trial_P[better, best[better]]
+        predictions[accepted] = trial[better, best[better]]
+        sse[accepted] = best_sse[better]
+        damping[accepted] = np.maximum(damping[accepted] * factors[best[better]] / 10, 1e-12)
+        active[accepted[improvement < 1e-10]] = False
+    
+    return P, predictions, sse, iterations
 
 def calculate_r_squared(y_true: np.ndarray, y_pred: np.ndarray) -> float:
     """Calculate R² (coefficient of determination)."""
@@ -159,88 +704,655 @@ def calculate_r_squared(y_true: np.ndarray, y_pred: np.ndarray) -> float:
     ss_tot = np.sum((y_true - np.mean(y_true)) ** 2)
     return 1 - (ss_res / ss_tot)
 
-def call_claude(prompt: str, api_key: str, model: str) -> str:
-    """Call Anthropic Claude API."""
-    response = requests.post(
-        "https://api.anthropic.com/v1/messages",
-        headers={
-            "x-api-key": api_key,
-            "anthropic-version": "2023-06-01",
-            "content-type": "application/json",
-        },
-        json={
-            "model": model,
-            "max_tokens": 2000,
-            "messages": [{"role": "user", "content": prompt}]
-        }
-    )
-    
-    if response.status_code == 200:
-        return response.json()["content"][0]["text"]
-    else:
-        raise Exception(f"Claude API error: {response.status_code} - {response.text}")
-
-def call_openai(prompt: str, api_key: str, model: str) -> str:
-    """Call OpenAI API."""
-    response = requests.post(
-        "https://api.openai.com/v1/chat/completions",
-        headers={
-            "Authorization": f"Bearer {api_key}",
-            "Content-Type": "application/json",
-        },
-        json={
-            "model": model,
-            "messages": [{"role": "user", "content": prompt}],
-            "max_completion_tokens": 2000,
-        }
-    )
-    
-    if response.status_code == 200:
-        return response.json()["choices"][0]["message"]["content"]
-    else:
-        raise Exception(f"OpenAI API error: {response.status_code} - {response.text}")
-
-def call_ollama(prompt: str, base_url: str, model: str) -> str:
-    """Call local Ollama API."""
-    response = requests.post(
-        f"{base_url}/api/generate",
-        json={
-            "model": model,
-            "prompt": prompt,
-            "stream": False,
-        }
-    )
-    
-    if response.status_code == 200:
-        return response.json()["response"]
+def score_replicates(equation: str, t: np.ndarray, A_replicates: np.ndarray) -> Dict[str, np.ndarray]:
+    """
+    Score one equation against R replicates (R, N) at once.
+    
+    The equation is compiled and evaluated once; R² and RMSE are computed per
+    replicate row in a single vectorized pass.
+    
+    Returns:
+        Dictionary of (R,) arrays 'r_squared' and 'rmse'
+    """
+    predictions = compile_equation(equation)(t)
+    Y = np.atleast_2d(np.asarray(A_replicates, dtype=float))
+    residuals = Y - predictions
+    sse = np.einsum('rn,rn->r', residuals, residuals)
+    centered = Y - Y.mean(axis=1, keepdims=True)
+    ss_tot = np.einsum('rn,rn->r', centered, centered)
+    return {'r_squared': 1 - sse / ss_tot, 'rmse': np.sqrt(sse / Y.shape[1])}
+
+def score_candidates(y_true: np.ndarray, predictions: np.ndarray, complexity=None) -> Dict[str, np.ndarray]:
+    """
+    Score K candidate prediction vectors against the data in one vectorized pass.
+    
+    AIC and BIC use the Gaussian log-likelihood n*ln(SSE/n) and penalise each
+    candidate by its complexity, typically the expression size of its equation
+    (CompiledEquation.size). Rows with non-finite predictions get R² = -inf and
+    infinite errors and criteria.
+    
+    Args:
+        y_true: Measured values (N,)
+        predictions: Candidate predictions (K, N)
+        complexity: Complexity per candidate (K,), defaults to 1
+        
+    Returns:
+        Dictionary of (K,) arrays: 'r_squared', 'rmse', 'mae', 'aic' and 'bic'
+    """
+    y_true = np.asarray(y_true, dtype=float)
+    P = np.atleast_2d(np.asarray(predictions, dtype=float))
+    n = y_true.shape[0]
+    k = np.ones(P.shape[0]) if complexity is None else np.asarray(complexity, dtype=float)
+    
+    residuals = P - y_true                                      # (K, N)
+    with np.errstate(invalid='ignore', over='ignore'):
+        sse = np.einsum('kn,kn->k', residuals, residuals)
+        mae = np.abs(residuals).mean(axis=1)
+    finite = np.isfinite(sse)
+    sse = np.where(finite, sse, np.inf)
+    ss_tot = np.sum((y_true - y_true.mean()) ** 2)
+    
+    with np.errstate(divide='ignore'):
+        log_likelihood_term = n * np.log(np.maximum(sse, 1e-300) / n)
+    return {
+        'r_squared': np.where(finite, 1 - sse / ss_tot, -np.inf),
+        'rmse': np.sqrt(sse / n),
+        'mae': np.where(finite, mae, np.inf),
+        'aic': log_likelihood_term + 2 * k,
+        'bic': log_likelihood_term + k * np.log(n)
+    }
+
+def rank_results(results: List[Dict], y_true: np.ndarray, rank_by: str = 'r_squared') -> List[Dict]:
+    """
+    Attach 'rmse', 'mae', 'aic' and 'bic' to scored results and sort them, best valid fit first.
+    
+    All valid predictions are scored as one (K, N) matrix by score_candidates;
+    results without predictions go last. rank_by is 'r_squared' or
+    'validated_r_squared' (higher is better, the latter set by validate_results),
+    'aic' or 'bic' (lower is better).
+    """
+    if rank_by not in ('r_squared', 'validated_r_squared', 'aic', 'bic'):
+        raise ValueError(f"Unknown rank_by: {rank_by}")
+    valid = [r for r in results if r['predictions'] is not None]
+    invalid = [r for r in results if r['predictions'] is None]
+    for r in invalid:
+        r.update({'rmse': None, 'mae': None, 'aic': None, 'bic': None})
+    if not valid:
+        return invalid
+    
+    scores = score_candidates(y_true, np.stack([r['predictions'] for r in valid]),
+                              [r.get('size', 1) for r in valid])
+    for j, r in enumerate(valid):
+        r.update({name: float(scores[name][j]) for name in ('rmse', 'mae', 'aic', 'bic')})
+    if rank_by == 'validated_r_squared':
+        key = -np.array([r['validated_r_squared'] for r in valid], dtype=float)
     else:
-        raise Exception(f"Ollama API error: {response.status_code} - {response.text}")
+        key = -scores['r_squared'] if rank_by == 'r_squared' else scores[rank_by]
+    order = np.argsort(key, kind='stable')
+    return [valid[j] for j in order] + invalid
+
+# Validation: held-out R² over fold masks, so overfit candidates do not win on training fit
+VALIDATION_MODES = ('holdout', 'kfold')
+
+def validation_masks(num_points: int, mode: str = 'kfold', folds: int = 5,
+                     holdout_fraction: float = 0.25, seed: Optional[int] = 0) -> np.ndarray:
+    """
+    Boolean (F, N) masks of the held-out points of each validation fold.
+    
+    'kfold' splits a seeded permutation of the points into F = folds disjoint
+    folds, so every point is held out exactly once. 'holdout' returns a single
+    mask holding out holdout_fraction of the points (at least one, and always
+    leaving three to fit on).
+    """
+    if mode not in VALIDATION_MODES:
+        raise ValueError(f"Unknown validation mode: {mode}. Use one of {VALIDATION_MODES}")
+    order = np.random.default_rng(seed).permutation(num_points)
+    if mode == 'holdout':
+        num_held = min(max(1, int(round(holdout_fraction * num_points))), num_points - 3)
+        masks = np.zeros((1, num_points), dtype=bool)
+        masks[0, order[:num_held]] = True
+        return masks
+    folds = min(folds, num_points)
+    fold_of = np.empty(num_points, dtype=int)
+    fold_of[order] = np.arange(num_points) % folds
+    return fold_of[None, :] == np.arange(folds)[:, None]
+
+def validate_results(results: List[Dict], t: np.ndarray, y: np.ndarray, masks: np.ndarray,
+                     refine: bool = True) -> List[Dict]:
+    """
+    Attach held-out scores to scored results, refitting each candidate on all folds in one batched solve.
+    
+    The constants of each candidate's (cached) compiled equation are refitted
+    on the training points of every fold at once: one batched
+    Levenberg-Marquardt solve per candidate fits all F folds together. The
+    predictions of all K candidates over all F folds are then stacked into one
+    (K, F, N) block and the held-out errors are summed through the fold masks.
+    Without refine (or without constants) a candidate's predictions are the
+    same for every fold.
+    
+    Adds 'validated_r_squared' (pooled over the held-out points of all folds)
+    and 'fold_r_squared' (per fold) to each result; both are None for results
+    without predictions.
+    """
+    t = np.asarray(t, dtype=float)
+    y = np.asarray(y, dtype=float)
+    masks = np.atleast_2d(masks)
+    valid = [r for r in results if r['predictions'] is not None]
+    for r in results:
+        if r['predictions'] is None:
+            r.update({'validated_r_squared': None, 'fold_r_squared': None})
+    if not valid:
+        return results
+    
+    blocks = []
+    for r in valid:
+        compiled = compile_equation(r['equation'])
+        if refine and compiled.constants:
+            # One Levenberg-Marquardt solve fits the candidate on the training points of all F folds
+            blocks.append(_refine_weighted(compiled, t, y, ~masks)[1])                       # (F, N)
+        else:
+            blocks.append(np.broadcast_to(compiled(t), masks.shape))
+    P = np.stack(blocks)                                                                     # (K, F, N)
+    
+    with np.errstate(invalid='ignore', over='ignore'):
+        residuals = np.where(masks, P - y, 0.0)
+        fold_sse = np.einsum('kfn,kfn->kf', residuals, residuals)
+    fold_sse = np.where(np.isfinite(fold_sse), fold_sse, np.inf)
+    held = masks.any(axis=0)
+    counts = masks.sum(axis=0)
+    ss_tot = np.sum(counts[held] * (y[held] - y[held].mean()) ** 2)
+    fold_means = (masks @ y) / masks.sum(axis=1)
+    fold_ss_tot = np.sum(np.where(masks, y - fold_means[:, None], 0.0) ** 2, axis=1)
+    
+    validated = 1 - fold_sse.sum(axis=1) / ss_tot
+    with np.errstate(divide='ignore', invalid='ignore'):
+        fold_r_squared = 1 - fold_sse / fold_ss_tot
+    for j, r in enumerate(valid):
+        r['validated_r_squared'] = float(validated[j]) if np.isfinite(validated[j]) else -np.inf
+        r['fold_r_squared'] = [float(v) for v in fold_r_squared[j]]
+    return results
+
+# Local symbolic regression: batched least squares over a library of basis functions
+def _basis_library(t: np.ndarray) -> Tuple[List[str], np.ndarray, np.ndarray]:
+    """
+    Basis functions of t written in the equation language.
+    
+    Rates and frequencies are scaled to the span of t so the library suits any
+    time axis. Returns the expression strings, their values (K, N) and the
+    number of nonlinear constants inside each expression (K,).
+    """
+    span = max(float(np.ptp(t)), 1e-12)
+    names, inner = ["t", "t**2", "t**3"], [0, 0, 0]
+    if np.all(t >= 0):
+        names.append("sqrt(t)"); inner.append(0)
+    if np.all(t > -1):
+        names += ["log(t + 1)", "1/(t + 1)"]; inner += [1, 1]
+    for c in np.geomspace(0.25, 8, 12):
+        names += [f"exp({c / span:.4g}*t)", f"exp({-c / span:.4g}*t)"]; inner += [1, 1]
+    for m in (0.5, 1, 2, 3, 4):
+        w = 2 * np.pi * m / span
+        names += [f"sin({w:.4g}*t)", f"cos({w:.4g}*t)"]; inner += [1, 1]
+    
+    with np.errstate(all='ignore'):
+        values = np.stack([compile_equation(name)(t) for name in names])
+    keep = np.all(np.isfinite(values), axis=1) & (np.std(values, axis=1) > 0)
+    return [n for n, k in zip(names, keep) if k], values[keep], np.array(inner)[keep]
+
+def _format_linear_model(intercept: Optional[float], coefs, names) -> str:
+    """c0 + c1*f1 + ..., without the c0 term if intercept is None."""
+    text = "" if intercept is None else f"{intercept:.6g}"
+    for c, name in zip(coefs, names):
+        if not text:
+            text = f"{c:.6g}*{name}"
+        else:
+            text += f" - {-c:.6g}*{name}" if c < 0 else f" + {c:.6g}*{name}"
+    return text
 
-def call_llm(prompt: str, config: Dict) -> str:
+def _linear_terms(constants, structure, t: np.ndarray):
     """
-    Call the configured LLM provider.
+    Split refitted constants of a _format_linear_model text back into its terms.
+    
+    constants are refine_constants' values for the literals of the text (c0, c1,
+    the literals of f1, c2, ...). structure is (sign written in front of c0, or
+    0 without c0; signs written in front of c1, c2, ...; (name, nonlinear
+    constants) of f1, f2, ...). Returns c0 and one (coefficient, basis text,
+    parameters, contribution over t) tuple per term.
+    """
+    intercept_sign, signs, bases = structure
+    intercept = intercept_sign * constants[0] if intercept_sign else 0.0
+    pos = 1 if intercept_sign else 0
+    terms = []
+    for sign, (name, inner) in zip(signs, bases):
+        compiled = compile_equation(name)
+        values = list(constants[pos + 1:pos + 1 + len(compiled.constants)])
+        coef = sign * constants[pos]
+        pos += 1 + len(compiled.constants)
+        terms.append((coef, substitute_constants(compiled, values), (name, inner), coef * compiled(t, values)))
+    return intercept, terms
+
+def _linear_model_variants(intercept: float, terms, A: np.ndarray, tol: float = 1e-6) -> List[Tuple]:
+    """
+    Simpler versions of a refitted linear model, as (equation, number of parameters, structure).
+    
+    A term whose contribution barely varies over t (a rate refitted to about 0,
+    or a negligible coefficient) is folded into c0, and a c0 negligible next to
+    the data is dropped. If the remaining parts cancel each other (one is
+    larger than the whole model), the model without each part is offered too.
+    """
+    def rms(values):
+        return float(np.sqrt(np.mean(np.square(values))))
+    
+    kept = [term for term in terms if np.std(term[3]) > tol * max(float(np.std(A)), 1e-300)]
+    intercept += sum(float(np.mean(term[3])) for term in terms if not any(term is k for k in kept))
+    use_intercept = abs(intercept) > tol * max(float(np.max(np.abs(A))), 1e-300)
+    
+    def model(subset, with_intercept):
+        if not subset:
+            return f"{intercept:.6g}", 1, (-1.0 if intercept < 0 else 1.0, [], [])
+        text = _format_linear_model(intercept if with_intercept else None,
+                                    [term[0] for term in subset], [term[1] for term in subset])
+        structure = ((-1.0 if intercept < 0 else 1.0) if with_intercept else 0,
+                     [-1.0 if term[0] < 0 else 1.0 for term in subset], [term[2] for term in subset])
+        return text, int(with_intercept) + sum(1 + term[2][1] for term in subset), structure
+    
+    variants = []
+    if len(kept) < len(terms) or not use_intercept:
+        variants.append(model(kept, use_intercept))
+    parts = [term[3] for term in kept] + ([np.full(len(A), intercept)] if use_intercept else [])
+    if len(parts) > 1 and max(rms(part) for part in parts) > rms(sum(parts)):
+        variants += [model(kept[:j] + kept[j+1:], use_intercept) for j in range(len(kept))]
+        if use_intercept and kept:
+            variants.append(model(kept, False))
+    return variants
+
+def symbolic_search(t: np.ndarray, A: np.ndarray, max_terms: int = 2, top_n: int = 5,
+                    refine_top: int = 10) -> Dict:
+    """
+    Search equations of the form c0 + c1*f1(t) [+ c2*f2(t)] over a basis library.
+    
+    All single bases and all pairs are fitted at once: with centered, normalised
+    bases the least-squares coefficients follow in closed form from the Gram
+    matrix (a 2x2 solve per pair, done with array arithmetic), so thousands of
+    candidates are scored in a few milliseconds. Candidates are ranked by BIC,
+    and the best refine_top get their constants, including rates and
+    frequencies, polished by refine_constants.
+    
+    Args:
+        t: Array of time values
+        A: Array of measured values
+        max_terms: 1 for single-basis models, 2 to include pairs
+        top_n: Number of equations to return
+        refine_top: Number of leading candidates whose constants are refitted
+        
+    Returns:
+        Dictionary with 'candidates' (list of dicts with 'equation', 'r_squared',
+        'bic' and 'num_params', best first), 'num_scored' and 'elapsed' (seconds)
+    """
+    start = time.perf_counter()
+    t = np.asarray(t, dtype=float)
+    A = np.asarray(A, dtype=float)
+    n = len(t)
+    names, F, inner = _basis_library(t)
+    K = len(names)
+    
+    # Center and normalise the bases; G is then their correlation matrix
+    f_mean = F.mean(axis=1)
+    Fc = F - f_mean[:, None]
+    f_norm = np.linalg.norm(Fc, axis=1)
+    Fc /= f_norm[:, None]
+    y_mean = A.mean()
+    yc = A - y_mean
+    syy = yc @ yc
+    G = Fc @ Fc.T
+    b = Fc @ yc
+    
+    # One-term models
+    models = [((i,), np.array([b[i]])) for i in range(K)]
+    sse = [syy - b ** 2]
+    if max_terms >= 2:
+        I, J = np.triu_indices(K, 1)
+        det = 1 - G[I, J] ** 2
+        ok = det > 1e-8
+        I, J, det = I[ok], J[ok], det[ok]
+        c1 = (b[I] - G[I, J] * b[J]) / det
+        c2 = (b[J] - G[I, J] * b[I]) / det
+        sse.append(syy - c1 * b[I] - c2 * b[J])
+        models += [((i, j), np.array([ci, cj])) for i, j, ci, cj in zip(I, J, c1, c2)]
+    sse = np.maximum(np.concatenate(sse), 1e-300)
+    num_params = np.array([1 + len(idx) + int(inner[list(idx)].sum()) for idx, _ in models])
+    bic = n * np.log(sse / n) + num_params * np.log(n)
+    
+    candidates, structures = [], []
+    for m in np.argsort(bic)[:max(refine_top, top_n)]:
+        idx, coefs = models[m]
+        coefs = coefs / f_norm[list(idx)]
+        intercept = y_mean - coefs @ f_mean[list(idx)]
+        equation = _format_linear_model(intercept, coefs, [names[i] for i in idx])
+        candidates.append({'equation': equation, 'r_squared': float(1 - sse[m] / syy),
+                           'bic': float(bic[m]), 'num_params': int(num_params[m])})
+        values = np.append(intercept, coefs)
+        signs = np.where(values < 0, -1.0, 1.0)
+        structures.append((signs[0], list(signs[1:]), [(names[i], int(inner[i])) for i in idx]))
+    
+    def fit(refined, num_params):
+        return {'equation': refined['equation'], 'r_squared': float(1 - refined['sse'] / syy),
+                'bic': float(n * np.log(max(refined['sse'], 1e-300) / n) + num_params * np.log(n)),
+                'num_params': num_params}
+    
+    for k, structure in enumerate(structures[:refine_top]):
+        compiled = compile_equation(candidates[k]['equation'])
+        refined = refine_constants(compiled, t, A)
+        if np.isfinite(refined['sse']) and refined['sse'] < (1 - candidates[k]['r_squared']) * syy:
+            candidates[k] = fit(refined, candidates[k]['num_params'])
+        else:
+            refined = {'constants': compiled.constants}
+        # Refitting can leave redundant terms (a rate near 0, or parts that cancel);
+        # keep simplifying while BIC prefers the simpler model
+        simplified = True
+        while simplified:
+            simplified = False
+            intercept, terms = _linear_terms(refined['constants'], structure, t)
+            for text, num_params, simpler_structure in _linear_model_variants(intercept, terms, A):
+                if num_params >= candidates[k]['num_params']:
+                    continue
+                simpler = refine_constants(compile_equation(text), t, A)
+                if np.isfinite(simpler['sse']) and fit(simpler, num_params)['bic'] <= candidates[k]['bic']:
+                    candidates[k], refined, structure = fit(simpler, num_params), simpler, simpler_structure
+                    simplified = True
+    candidates.sort(key=lambda c: c['bic'])
+    # Different starting points can refine to the same equation; equal R² alone does not make two equations equal
+    def same_equation(cand):
+        compiled = compile_equation(cand['equation'])
+        return substitute_constants(compiled, compiled.constants, digits=4)
+    unique = list({same_equation(c): c for c in reversed(candidates)}.values())[::-1]
+    
+    return {
+        'candidates': unique[:top_n],
+        'num_scored': len(models),
+        'elapsed': time.perf_counter() - start
+    }
+
+def local_response(candidates: List[Dict], iteration: int) -> str:
+    """
+    Format a symbolic_search candidate as an LLM-style response, for the 'local' provider.
+    
+    Iteration k proposes the k-th best candidate (cycling), so the loop still explores.
+    """
+    rank = (iteration - 1) % len(candidates)
+    cand = candidates[rank]
+    confidence = "High" if cand['r_squared'] > 0.95 else "Medium" if cand['r_squared'] > 0.8 else "Low"
+    return (f"REASONING: Built-in symbolic regression over power, exponential, logarithmic and "
+            f"trigonometric bases; candidate {rank + 1} of {len(candidates)} by BIC "
+            f"(R²={cand['r_squared']:.4f} on the data).\n"
+            f"EQUATION: {cand['equation']}\n"
+            f"CONFIDENCE: {confidence}")
+
+# Provider failures the local symbolic search stands in for (after post_json's retries are exhausted)
+PROVIDER_UNAVAILABLE = (requests.ConnectionError, requests.Timeout)
+
+def _local_fallback(error: Optional[BaseException], seeds: Optional[List[Dict]], iteration: int) -> Optional[str]:
+    """
+    The local search's response in place of a provider that is unreachable or timed out.
+    
+    Returns None (the caller reports the error) without local candidates or for other errors.
+    """
+    if seeds is None or not isinstance(error, PROVIDER_UNAVAILABLE):
+        return None
+    print(f"⚠️ Provider unreachable ({error}), using the local symbolic search instead")
+    return local_response(seeds, iteration)
+
+# Streamed evaluation: score the equation while the rest of the response arrives (see discovery_streaming)
+def stream_and_evaluate(prompt: str, config: Dict, t: np.ndarray, A_noisy: np.ndarray,
+                        on_chunk: Optional[Callable[[str], None]] = None) -> Dict:
+    """
+    Stream a response and score its equation while the rest is still being generated.
+    
+    The equation is handed to a worker thread the moment its line completes, so
+    evaluation (and constant refinement) overlaps the remaining REASONING or
+    CONFIDENCE text. If the complete response parses to a different equation
+    (e.g. one spanning several lines), the early job is cancelled or waited for
+    and the final equation is scored instead; time_to_first_score then refers
+    to the returned equation.
     
     Args:
         prompt: The prompt to send
-        config: Configuration dictionary
+        config: Configuration dictionary (see call_llm)
+        t: Array of time values
+        A_noisy: Array of measured amounts
+        on_chunk: Optional callback receiving every text chunk (e.g. print)
         
     Returns:
-        LLM response text
+        evaluate_response's dictionary plus 'response', 'time_to_first_score'
+        (seconds from the request until the returned equation's R² was available),
+        'response_time' (seconds until the stream ended) and 'usage' (see call_llm)
     """
-    provider = config["provider"].lower()
+    refine = config.get('refine_constants', True)
+    parser = IncrementalParser()
+    usage = {}
+    start = time.perf_counter()
     
-    if provider == "claude":
-        return call_claude(prompt, config["anthropic_api_key"], config["claude_model"])
-    elif provider == "openai":
-        return call_openai(prompt, config["openai_api_key"], config["openai_model"])
-    elif provider == "ollama":
-        return call_ollama(prompt, config["ollama_base_url"], config["ollama_model"])
-    else:
-        raise ValueError(f"Unknown provider: {provider}")
+    def score(equation):
+        """The scored equation, the seconds spent and the time since the request it was ready."""
+        score_start = time.perf_counter()
+        result = score_equation(equation, t, A_noisy, refine)
+        end = time.perf_counter()
+        return result, end - score_start, end - start
+    
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        early = None
+        for chunk in stream_llm(prompt, config, usage):
+            if on_chunk is not None:
+                on_chunk(chunk)
+            equation = parser.feed(chunk)
+            if equation is not None:
+                early = pool.submit(score, equation)
+        response_time = time.perf_counter() - start
+        
+        parse_start = time.perf_counter()
+        parsed = parse_llm_response(parser.text)
+        parse_time = time.perf_counter() - parse_start
+        if early is not None and parsed['equation'] == parser.equation:
+            scored, evaluate_time, first_score = early.result()
+        else:
+            # The early equation is discarded; let its job finish first so the two never run together
+            evaluate_time = 0.0
+            if early is not None and not early.cancel():
+                evaluate_time += early.result()[1]
+            scored, final_time, first_score = score(parsed['equation'])
+            evaluate_time += final_time
+    
+    result = {'reasoning': parsed['reasoning'], 'confidence': parsed['confidence']}
+    result.update(scored)
+    result.update({
+        'response': parser.text,
+        'time_to_first_score': first_score,
+        'response_time': response_time,
+        'usage': usage,
+        'timings': {'parse': parse_time, 'evaluate': evaluate_time}
+    })
+    return result
+
+def generate_candidates(prompt: str, config: Dict, num_candidates: int,
+                        t: Optional[np.ndarray] = None, A_noisy: Optional[np.ndarray] = None) -> List[Dict]:
+    """
+    Request several candidate equations for the same prompt concurrently.
+    
+    Each candidate prompt gets a short suffix asking for a distinct functional form,
+    and all requests go out at once through a thread pool over call_llm, so a round
+    takes as long as the slowest response rather than the sum of all of them.
+    With config['stream'] and the data given, every candidate is streamed and
+    scored as it arrives (see stream_and_evaluate).
+    
+    Args:
+        prompt: The prompt built for this iteration
+        config: Configuration dictionary ('max_concurrent_requests' caps the pool size)
+        num_candidates: Number of candidate equations to request
+        t: Array of time values (only needed for streaming)
+        A_noisy: Array of measured amounts (only needed for streaming)
+        
+    Returns:
+        List of dicts with 'candidate', 'prompt', 'response', 'error' and 'usage' (see call_llm),
+        in request order; streamed candidates also carry their scored 'result', failed
+        ones the raised 'exception'
+    """
+    prompts = [
+        prompt + f"\nYou are candidate {k} of {num_candidates}. Propose a functional form "
+                 f"that another candidate is unlikely to choose.\n"
+        for k in range(1, num_candidates + 1)
+    ]
+    max_workers = min(num_candidates, config.get('max_concurrent_requests', num_candidates))
+    
+    streaming = config.get('stream', False) and t is not None
+    
+    usages = [{} for _ in prompts]
+    
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        if streaming:
+            futures = [pool.submit(stream_and_evaluate, p, config, t, A_noisy) for p in prompts]
+        else:
+            futures = [pool.submit(call_llm, p, config, usage) for p, usage in zip(prompts, usages)]
+    
+    candidates = []
+    for k, (p, future, usage) in enumerate(zip(prompts, futures, usages), start=1):
+        try:
+            if streaming:
+                result = future.result()
+                candidates.append({'candidate': k, 'prompt': p, 'response': result['response'],
+                                   'error': None, 'usage': result['usage'], 'result': result})
+            else:
+                candidates.append({'candidate': k, 'prompt': p, 'response': future.result(),
+                                   'error': None, 'usage': usage})
+        except Exception as e:
+            candidates.append({'candidate': k, 'prompt': p, 'response': None, 'error': str(e), 'usage': usage,
+                               'exception': e})
+    return candidates
+
+def evaluate_response(response: str, t: np.ndarray, A_noisy: np.ndarray, refine: bool = True) -> Dict:
+    """
+    Parse an LLM response, evaluate its equation and score it against the data.
+    
+    With refine=True the numeric constants of the equation are re-fitted to the
+    data (see refine_constants), so a correct structure with rough constants
+    scores as well as it can.
+    
+    Returns:
+        Dictionary with 'reasoning', 'equation', 'confidence', 'r_squared',
+        'predictions' (None and R² = 0 if the equation could not be evaluated),
+        'error' (EquationError.to_dict() or None), 'raw_r_squared' (score of the
+        constants as typed), 'refined_equation' and 'refined_constants' (None
+        if not refined) and 'timings' (seconds spent to 'parse' and 'evaluate')
+    """
+    start = time.perf_counter()
+    parsed = parse_llm_response(response)
+    parse_time = time.perf_counter() - start
+    result = {'reasoning': parsed['reasoning'], 'confidence': parsed['confidence']}
+    result.update(score_equation(parsed['equation'], t, A_noisy, refine))
+    result['timings'] = {'parse': parse_time, 'evaluate': time.perf_counter() - start - parse_time}
+    return result
+
+def score_equation(equation: str, t: np.ndarray, A_noisy: np.ndarray, refine: bool = True) -> Dict:
+    """
+    Evaluate an equation string and score it against the data (the scoring half of evaluate_response).
+    
+    Returns:
+        Dictionary with 'equation', 'r_squared', 'predictions', 'error',
+        'raw_r_squared', 'refined_equation', 'refined_constants' (the refitted
+        values of the equation's literals, in full precision) and 'size'
+        (expression size, None if invalid)
+    """
+    compiled, predictions, error = None, None, None
+    try:
+        compiled = compile_equation(equation)
+        predictions = compiled(t)
+    except EquationError as e:
+        error = e.to_dict()
+    r_squared = calculate_r_squared(A_noisy, predictions) if predictions is not None else 0.0
+    result = {
+        'equation': equation,
+        'r_squared': r_squared,
+        'predictions': predictions,
+        'error': error,
+        'raw_r_squared': r_squared,
+        'refined_equation': None,
+        'refined_constants': None,
+        'size': compiled.size if predictions is not None else None
+    }
+    
+    if refine and predictions is not None and compiled.constants:
+        refined = refine_constants(compiled, t, A_noisy)
+        refined_r_squared = calculate_r_squared(A_noisy, refined['predictions'])
+        if refined_r_squared > r_squared:
+            result.update({
+                'r_squared': refined_r_squared,
+                'predictions': refined['predictions'],
+                'refined_equation': refined['equation'],
+                'refined_constants': tuple(float(c) for c in refined['constants'])
+            })
+    return result
+
+# Telemetry: per-iteration timings, token usage and estimated cost
+TIMING_STAGES = ('prompt', 'request', 'parse', 'evaluate', 'plot')
+
+def summarize_usage(usages: List[Dict]) -> Dict:
+    """
+    Sum the usage dicts of an iteration's calls.
+    
+    Only completed calls (finished by _finish_usage) count as 'calls' and
+    towards the tokens; calls that raised are counted in 'failed_calls'. Their
+    spend is unknown, so cost is None if any call failed or had no known price.
+    """
+    completed = [u for u in usages if 'cost' in u]
+    costs = [u['cost'] for u in completed]
+    failed = len(usages) - len(completed)
+    return {
+        'calls': len(completed),
+        'failed_calls': failed,
+        'cached_calls': sum(bool(u.get('cached')) for u in completed),
+        'input_tokens': sum(u.get('input_tokens', 0) for u in completed),
+        'output_tokens': sum(u.get('output_tokens', 0) for u in completed),
+        'cost': None if failed or any(c is None for c in costs) else float(sum(costs))
+    }
+
+def telemetry_table(iterations: List[Dict]) -> List[Dict]:
+    """
+    One flat row per iteration with R², stage timings, tokens and cost, ready for export.
+    
+    overlap_s is the part of parse_s and evaluate_s that ran inside request_s
+    (streamed responses are scored while they arrive), so the stages minus the
+    overlap add up to total_s.
+    """
+    rows = []
+    for it in iterations:
+        timings = it.get('timings') or {}
+        usage = it.get('usage') or {}
+        row = {'iteration': it['iteration'], 'r_squared': it['r_squared']}
+        row.update({f"{stage}_s": timings.get(stage) for stage in TIMING_STAGES + ('overlap', 'total')})
+        row.update({key: usage.get(key) for key in
+                    ('calls', 'failed_calls', 'cached_calls', 'input_tokens', 'output_tokens', 'cost')})
+        rows.append(row)
+    return rows
+
+def export_telemetry(iterations: List[Dict], path: str):
+    """Write the telemetry table to a .csv or .json file."""
+    rows = telemetry_table(iterations)
+    if path.endswith('.json'):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(rows, f, indent=2, default=_json_default)
+        return
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0].keys()) if rows else ['iteration'])
+        writer.writeheader()
+        writer.writerows(rows)
 
 def display_summary(iterations: List[Dict], t: np.ndarray, 
-                    A_noisy: np.ndarray, A_true: np.ndarray, principal: float, rate: float):
-    """Display final summary of the discovery process."""
+                    A_noisy: np.ndarray, A_true: np.ndarray, principal: float, rate: float,
+                    render: str = 'live', render_dir: str = 'discovery_plots'):
+    """
+    Display final summary of the discovery process.
+    
+    render selects how the final comparison plot is shown: 'live' and 'reuse'
+    call plt.show(), 'file' saves summary.png into render_dir and 'off' skips it.
+    """
     print("\n" + "=" * 80)
     print("🎉 DISCOVERY COMPLETE!")
     print("=" * 80)
@@ -250,10 +1362,36 @@ def display_summary(iterations: List[Dict], t: np.ndarray,
     print("-" * 80)
     for iter_data in iterations:
         print(f"Iteration {iter_data['iteration']}: {iter_data['equation']}")
+        if iter_data.get('refined_equation'):
+            print(f"  Refitted: {iter_data['refined_equation']}")
+            print(f"  R² = {iter_data['raw_r_squared']:.4f} → {iter_data['r_squared']:.4f}, "
+                  f"Confidence = {iter_data['confidence']}")
+            continue
         print(f"  R² = {iter_data['r_squared']:.4f}, Confidence = {iter_data['confidence']}")
     print("-" * 80)
     print()
     
+    # Where the time and money went
+    rows = [row for row in telemetry_table(iterations) if row['total_s'] is not None]
+    if rows:
+        stage_totals = {stage: sum(row[f"{stage}_s"] or 0.0 for row in rows) for stage in TIMING_STAGES}
+        overlap = sum(row['overlap_s'] or 0.0 for row in rows)
+        total = sum(row['total_s'] for row in rows)
+        print("⏱️ TIME & SPEND:")
+        print(f"  Wall time: {total:.2f}s over {len(rows)} iterations")
+        print("  " + ", ".join(f"{stage} {seconds:.2f}s ({seconds / total:.0%})"
+                               for stage, seconds in stage_totals.items() if total > 0))
+        if overlap > 0:
+            print(f"  ({overlap:.2f}s of parse and evaluate overlapped the streamed requests)")
+        costs = [row['cost'] for row in rows]
+        cost = "unknown" if any(c is None for c in costs) else f"${sum(costs):.4f}"
+        failed = sum(row['failed_calls'] or 0 for row in rows)
+        print(f"  Tokens: {sum(row['input_tokens'] or 0 for row in rows)} in, "
+              f"{sum(row['output_tokens'] or 0 for row in rows)} out "
+              f"({sum(row['cached_calls'] or 0 for row in rows)} of {sum(row['calls'] or 0 for row in rows)} "
+              f"calls from cache{f', {failed} failed' if failed else ''}), estimated cost {cost}")
+        print()
+    
     # Find best iteration (with valid predictions)
     valid_iterations = [it for it in iterations if it['predictions'] is not None]
     
@@ -261,21 +1399,33 @@ def display_summary(iterations: List[Dict], t: np.ndarray,
         print("❌ No valid equations were found. All attempts failed to evaluate.")
         return
     
-    best_iter = max(valid_iterations, key=lambda x: x['r_squared'])
-    print(f"🏆 BEST EQUATION: {best_iter['equation']}")
-    print(f"   R² = {best_iter['r_squared']:.4f}")
+    scores = score_candidates(A_noisy, np.stack([it['predictions'] for it in valid_iterations]),
+                              [it.get('size') or 1 for it in valid_iterations])
+    best = int(np.argmax(scores['r_squared']))
+    best_iter = valid_iterations[best]
+    print(f"🏆 BEST EQUATION: {best_iter.get('refined_equation') or best_iter['equation']}")
+    print(f"   R² = {best_iter['r_squared']:.4f}, RMSE = {scores['rmse'][best]:.2f}, "
+          f"AIC = {scores['aic'][best]:.1f}, BIC = {scores['bic'][best]:.1f}")
     print()
     
     print(f"🎯 TRUE LAW: A = {principal:.0f} * exp({rate:.2f} * t)")
     print()
     
+    if render == 'off':
+        return
+    
     # Final comparison plot
-    fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(14, 6))
+    if render == 'file':
+        fig = Figure(figsize=(14, 6))
+        FigureCanvasAgg(fig)
+        ax1, ax2 = fig.subplots(1, 2)
+    else:
+        fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(14, 6))
     
     ax1.scatter(t, A_noisy, c='darkgreen', s=100, alpha=0.6, 
                 edgecolors='black', label='Measured Data', zorder=3)
     ax1.plot(t, best_iter['predictions'], 'g-', linewidth=3, 
-             label=f"Discovered: {best_iter['equation']}", zorder=2)
+             label=f"Discovered: {best_iter.get('refined_equation') or best_iter['equation']}", zorder=2)
     ax1.plot(t, A_true, 'b--', linewidth=2, alpha=0.7,
              label='True Law', zorder=1)
     ax1.set_xlabel('Time t (years)', fontsize=12)
@@ -295,8 +1445,12 @@ def display_summary(iterations: List[Dict], t: np.ndarray,
     ax2.grid(True, alpha=0.3)
     ax2.set_ylim([0, 1.05])
     
-    plt.tight_layout()
-    plt.show()
+    fig.tight_layout()
+    if render == 'file':
+        os.makedirs(render_dir, exist_ok=True)
+        fig.savefig(os.path.join(render_dir, "summary.png"))
+    else:
+        plt.show()
 
 def parse_llm_response(response: str) -> Dict[str, str]:
     """
@@ -320,10 +1474,91 @@ def parse_llm_response(response: str) -> Dict[str, str]:
 
 
 
+# Prompt construction: data binning, summary statistics and a token budget
+MIN_PROMPT_ROWS = 8     # data rows kept even when the budget is tight
+
+def bin_data(t: np.ndarray, A: np.ndarray, num_bins: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Reduce the data to num_bins equal-count bins along t, returning the bin means.
+    
+    Data with no more than num_bins points is returned sorted but otherwise unchanged.
+    """
+    order = np.argsort(t, kind='stable')
+    t, A = np.asarray(t, dtype=float)[order], np.asarray(A, dtype=float)[order]
+    if len(t) <= num_bins:
+        return t, A
+    starts = np.linspace(0, len(t), num_bins + 1).astype(int)[:-1]
+    counts = np.diff(np.append(starts, len(t)))
+    return np.add.reduceat(t, starts) / counts, np.add.reduceat(A, starts) / counts
+
+def _fit_line(x: np.ndarray, y: np.ndarray) -> Tuple[float, float, float]:
+    """Least-squares slope, intercept and R² of y against x."""
+    slope, intercept = np.polyfit(x, y, 1)
+    return slope, intercept, calculate_r_squared(y, slope * x + intercept)
+
+def summarize_data(t: np.ndarray, A: np.ndarray, num_bins: int = 20) -> str:
+    """
+    Compact summary statistics of the data for the prompt.
+    
+    Covers the ranges, linear and log-linear fits, ratios of consecutive bin
+    means and the first differences dA/dt, all computed in vectorized passes
+    so the cost stays linear in the number of points.
+    """
+    t = np.asarray(t, dtype=float)
+    A = np.asarray(A, dtype=float)
+    lines = [f"- {len(t)} points, t from {t.min():.4g} to {t.max():.4g}, A from {A.min():.4g} to {A.max():.4g}"]
+    
+    slope, intercept, r2 = _fit_line(t, A)
+    lines.append(f"- Linear fit: A ≈ {slope:.4g}*t + {intercept:.4g} (R²={r2:.4f})")
+    if np.all(A > 0):
+        slope, intercept, r2 = _fit_line(t, np.log(A))
+        lines.append(f"- Log-linear fit: ln(A) ≈ {slope:.4g}*t + {intercept:.4g} (R²={r2:.4f})")
+    
+    tb, Ab = bin_data(t, A, num_bins)
+    if len(tb) > 2:
+        with np.errstate(divide='ignore', invalid='ignore'):
+            ratios = Ab[1:] / Ab[:-1]
+            diffs = np.diff(Ab) / np.diff(tb)
+        ratios, diffs = ratios[np.isfinite(ratios)], diffs[np.isfinite(diffs)]
+        if len(ratios):
+            lines.append(f"- Ratios of consecutive bin means: mean {ratios.mean():.4g}, std {ratios.std():.3g}")
+        if len(diffs):
+            lines.append(f"- First differences dA/dt: {diffs[0]:.4g} at the start, {diffs[-1]:.4g} at the end, "
+                         f"mean {diffs.mean():.4g}")
+    return "\n".join(lines)
+
+def _format_attempts(previous_iterations: List[Dict], top_k: int) -> str:
+    """PREVIOUS ATTEMPTS lines, with refitted constants and runner-up candidates."""
+    text = ""
+    for prev in previous_iterations:
+        validated = ""
+        if prev.get('validated_r_squared') is not None:
+            validated = f", validated R²={prev['validated_r_squared']:.4f}"
+        if prev.get('refined_equation'):
+            text += (f"Iteration {prev['iteration']}: {prev['equation']} (R²={prev['raw_r_squared']:.4f}) "
+                     f"→ refitted constants: {prev['refined_equation']} (R²={prev['r_squared']:.4f}{validated})\n")
+        else:
+            text += f"Iteration {prev['iteration']}: {prev['equation']} (R²={prev['r_squared']:.4f}{validated})\n"
+        # Runner-up candidates of a concurrent round, best first
+        for alt in prev.get('candidates', [])[1:top_k]:
+            text += f"  Alternative: {alt['equation']} (R²={alt['r_squared']:.4f})\n"
+    return text
+
+def _format_data(t: np.ndarray, A: np.ndarray) -> str:
+    return "\n".join([f"t={time:.1f}, A={amount:.2f}" for time, amount in zip(t, A)])
+
 def build_prompt(t: np.ndarray, A: np.ndarray, iteration: int, previous_iterations: List[Dict], config: Dict) -> str:
     """
     Build the prompt for the LLM.
     
+    Without config['prompt_token_budget'] every data point and every previous
+    attempt is included. With a budget (in estimated tokens), the prompt carries
+    summary statistics of the data, only the best config['prompt_top_attempts']
+    (default 5) previous attempts by R², and as many binned data rows as fit in
+    the remaining budget, so its size no longer grows with the number of points
+    or iterations. Equations in config['symbolic_candidates'] (see
+    symbolic_search) are listed as seeds.
+    
     Args:
         t: Array of time values
         A: Array of amounts
@@ -334,55 +1569,335 @@ def build_prompt(t: np.ndarray, A: np.ndarray, iteration: int, previous_iteratio
     Returns:
         Formatted prompt string
     """
-    # Format the data
-    data_str = "\n".join([f"t={time:.1f}, A={amount:.2f}" for time, amount in zip(t, A)])
+    budget = config.get('prompt_token_budget')
+    top_k = config.get('feedback_top_k', 3)
     
-    prompt = f"""You are a scientific AI agent discovering mathematical laws from experimental data.
-
-EXPERIMENTAL DATA:
-{data_str}
-
-IMPORTANT: Discover the relationship purely from the data patterns.
-Think step-by-step: examine how A changes as t changes, look for linear, polynomial, exponential, or other relationships.
-
-"""
-    
-    # Add previous attempts if any
-    if previous_iterations:
-        prompt += "PREVIOUS ATTEMPTS:\n"
-        for prev in previous_iterations:
-            prompt += f"Iteration {prev['iteration']}: {prev['equation']} (R²={prev['r_squared']:.4f})\n"
-        prompt += "\n"
+    attempts = previous_iterations
+    if budget is not None:
+        # Best attempts by R², shown in iteration order
+        best = sorted(previous_iterations, key=lambda p: p['r_squared'], reverse=True)
+        attempts = sorted(best[:config.get('prompt_top_attempts', 5)], key=lambda p: p['iteration'])
+    seeds = config.get('symbolic_candidates')
+    if seeds:
+        attempts_str = "LOCAL SEARCH CANDIDATES (built-in symbolic regression, best first):\n"
+        attempts_str += "".join(f"- {c['equation']} (R²={c['r_squared']:.4f})\n" for c in seeds) + "\n"
+    else:
+        attempts_str = ""
+    if attempts:
+        attempts_str += "PREVIOUS ATTEMPTS:\n" + _format_attempts(attempts, top_k) + "\n"
     
-    prompt += f"""Your task for iteration {iteration}:
+    task = f"""Your task for iteration {iteration}:
 1. Analyze the relationship between t and A in the data
 2. Propose a mathematical equation: A = [function of t]
 3. Explain your reasoning - what patterns do you see?
 4. Use mathematical notation
 """
     
-    prompt += """
+    task += """
 Respond in this EXACT format:
 REASONING: [Your step-by-step analysis]
 EQUATION: [Just the expression]
 CONFIDENCE: [Low/Medium/High]
 """
-    return prompt
+    
+    guidance = """IMPORTANT: Discover the relationship purely from the data patterns.
+Think step-by-step: examine how A changes as t changes, look for linear, polynomial, exponential, or other relationships.
 
+"""
+    header = "You are a scientific AI agent discovering mathematical laws from experimental data.\n\n"
+    
+    if budget is None:
+        data_section = f"EXPERIMENTAL DATA:\n{_format_data(t, A)}\n\n"
+    else:
+        summary = f"SUMMARY STATISTICS:\n{summarize_data(t, A)}\n\n"
+        fixed = estimate_tokens(header + summary + guidance + attempts_str + task)
+        row_tokens = estimate_tokens(_format_data(t[:1], A[:1]) + "\n")
+        num_rows = max(MIN_PROMPT_ROWS, (budget - fixed - 20) // row_tokens)
+        tb, Ab = bin_data(t, A, num_rows)
+        if len(tb) < len(t):
+            label = f"EXPERIMENTAL DATA ({len(tb)} bin averages of {len(t)} points):"
+        else:
+            label = "EXPERIMENTAL DATA:"
+        data_section = f"{label}\n{_format_data(tb, Ab)}\n\n{summary}"
+    
+    return header + data_section + guidance + attempts_str + task
 
-def run_autonomous_discovery(t: np.ndarray, A_noisy: np.ndarray, config: Dict) -> List[Dict]:
+
+# Iteration records: slotted scores plus references into a per-run, compressed text store
+class TextStore:
+    """
+    Prompts and responses of the iteration records of one run.
+    
+    Texts are compressed with zlib and interned by content hash, so repeated
+    texts (a replayed prompt, the same local response) are stored once. Each
+    run_autonomous_discovery (and load_checkpoint) call creates its own store,
+    which the records of that run reference and which is freed with them.
+    clear() drops every text at once (e.g. to keep only the scores of a long
+    batch); records of the store then read None for their prompt, response
+    and reasoning. Ids are never reused, so a cleared id cannot resolve to a
+    later text.
+    """
+    
+    def __init__(self):
+        self._texts: Dict[int, bytes] = {}
+        self._ids: Dict[bytes, int] = {}
+        self._next_id = itertools.count()
+        self._lock = threading.Lock()
+    
+    def put(self, text: Optional[str]) -> Optional[int]:
+        """Store a text and return its id (None stays None)."""
+        if text is None:
+            return None
+        data = text.encode('utf-8')
+        digest = hashlib.blake2b(data, digest_size=16).digest()
+        with self._lock:
+            text_id = self._ids.get(digest)
+            if text_id is None:
+                text_id = self._ids[digest] = next(self._next_id)
+                self._texts[text_id] = zlib.compress(data)
+            return text_id
+    
+    def get(self, text_id: Optional[int]) -> Optional[str]:
+        """The text stored under an id (None if it was cleared)."""
+        data = self._texts.get(text_id) if text_id is not None else None
+        return zlib.decompress(data).decode('utf-8') if data is not None else None
+    
+    def clear(self):
+        """Drop all stored texts."""
+        with self._lock:
+            self._texts.clear()
+            self._ids.clear()
+    
+    def stats(self) -> Dict:
+        """Number of distinct texts and their compressed size in bytes."""
+        with self._lock:
+            return {'texts': len(self._texts), 'bytes': sum(len(data) for data in self._texts.values())}
+
+class IterationRecord:
+    """
+    One completed discovery iteration, compact enough to keep thousands of them.
+    
+    Scores, timings and the equation live in slots; prompt, response and
+    reasoning are ids into the run's TextStore (record.store); predictions are not stored
+    but recomputed on access through the compile cache, from the equation with
+    its full-precision refitted constants (refined_equation is rounded for
+    display) or as typed, against the time array the record was created with
+    (shared, not copied). Records read like the iteration dicts they replace:
+    record['r_squared'], record.get('candidates', []), keys(), items() and
+    dict(record) all work, and to_dict gives the checkpoint form. As with
+    those dicts, `key in record` is False for 'candidates' when there are
+    none, for 'predictions' when they cannot be computed, and for fields
+    that are None.
+    """
+    
+    FIELDS = ('iteration', 'prompt', 'response', 'reasoning', 'equation', 'confidence', 'r_squared',
+              'validated_r_squared', 'predictions', 'error', 'raw_r_squared', 'refined_equation',
+              'refined_constants', 'time_to_first_score', 'size', 'rmse', 'aic', 'bic', 'timings', 'usage', 'candidates')
+    __slots__ = ('iteration', 'equation', 'confidence', 'r_squared', 'validated_r_squared', 'error',
+                 'raw_r_squared', 'refined_equation', 'refined_constants', 'time_to_first_score', 'size', 'rmse', 'aic', 'bic',
+                 'timings', 'usage', 'candidates', '_prompt', '_response', '_reasoning', '_t', 'store')
+    
+    def __init__(self, t: Optional[np.ndarray] = None, store: Optional[TextStore] = None, **fields):
+        unknown = set(fields) - set(self.FIELDS)
+        if unknown:
+            raise TypeError(f"Unknown iteration fields: {', '.join(sorted(unknown))}")
+        self._t = t
+        self.store = store if store is not None else TextStore()
+        for key in self.FIELDS:
+            if key != 'predictions':
+                setattr(self, key, fields.get(key))
+        if self.candidates is None:
+            self.candidates = ()
+    
+    @classmethod
+    def from_dict(cls, data: Dict, t: Optional[np.ndarray] = None,
+                  store: Optional[TextStore] = None) -> 'IterationRecord':
+        """Build a record from an iteration dict (its 'predictions', if any, are dropped)."""
+        return cls(t, store, **{key: value for key, value in data.items() if key != 'predictions'})
+    
+    @property
+    def prompt(self) -> Optional[str]:
+        return self.store.get(self._prompt)
+    
+    @prompt.setter
+    def prompt(self, text: Optional[str]):
+        self._prompt = self.store.put(text)
+    
+    @property
+    def response(self) -> Optional[str]:
+        return self.store.get(self._response)
+    
+    @response.setter
+    def response(self, text: Optional[str]):
+        self._response = self.store.put(text)
+    
+    @property
+    def reasoning(self) -> Optional[str]:
+        return self.store.get(self._reasoning)
+    
+    @reasoning.setter
+    def reasoning(self, text: Optional[str]):
+        self._reasoning = self.store.put(text)
+    
+    @property
+    def predictions(self) -> Optional[np.ndarray]:
+        """Predictions over t, or None if the equation failed or no t was given."""
+        if self.error is not None or self._t is None:
+            return None
+        if self.refined_constants is None:
+            return evaluate_equation(self.refined_equation or self.equation, self._t)
+        return predict(self.equation, self.refined_constants, self._t)
+    
+    def __getitem__(self, key: str):
+        if key not in self.FIELDS:
+            raise KeyError(key)
+        return getattr(self, key)
+    
+    def __setitem__(self, key: str, value):
+        if key not in self.FIELDS or key == 'predictions':
+            raise KeyError(key)
+        setattr(self, key, value)
+    
+    def __contains__(self, key) -> bool:
+        if key == 'predictions':
+            return self.error is None and self._t is not None
+        return key in self.FIELDS and self.get(key) is not None
+    
+    def __iter__(self):
+        return iter(self.FIELDS)
+    
+    def __len__(self) -> int:
+        return len(self.FIELDS)
+    
+    def get(self, key: str, default=None):
+        value = getattr(self, key, None) if key in self.FIELDS else None
+        return default if value is None or (key == 'candidates' and not value) else value
+    
+    def keys(self):
+        return self.FIELDS
+    
+    def items(self):
+        return [(key, self[key]) for key in self.FIELDS]
+    
+    def to_dict(self, predictions: bool = False) -> Dict:
+        """The record as an iteration dict; predictions are left out unless asked for."""
+        data = {key: getattr(self, key) for key in self.FIELDS if key != 'predictions'}
+        if predictions:
+            data['predictions'] = self.predictions
+        if not data['candidates']:
+            del data['candidates']
+        return data
+    
+    def __reduce__(self):
+        # Texts are inlined, since the text store ids are only valid in this process
+        return (IterationRecord.from_dict, (self.to_dict(), self._t))
+    
+    def __repr__(self) -> str:
+        return (f"IterationRecord(iteration={self.iteration}, equation={self.equation!r}, "
+                f"r_squared={self.r_squared!r})")
+
+# Checkpoints: one JSON line per completed iteration, appended as the run goes
+def _json_default(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    raise TypeError(f"Cannot serialise {type(value).__name__}")
+
+def append_checkpoint(path: str, iteration_data: Dict):
+    """
+    Append an iteration record to a JSONL checkpoint and flush it to disk.
+    
+    Predictions are not stored; load_checkpoint recomputes them from the equation.
+    """
+    if isinstance(iteration_data, IterationRecord):
+        record = iteration_data.to_dict()
+    else:
+        record = {key: value for key, value in iteration_data.items() if key != 'predictions'}
+    line = json.dumps(record, default=_json_default, ensure_ascii=False) + "\n"
+    # Start on a fresh line if a crash left a partial record behind
+    if os.path.exists(path) and os.path.getsize(path) > 0:
+        with open(path, 'rb') as f:
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) != b"\n":
+                line = "\n" + line
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write(line)
+        f.flush()
+        os.fsync(f.fileno())
+
+def load_checkpoint(path: str, t: Optional[np.ndarray] = None) -> List[IterationRecord]:
+    """
+    Read the iteration records of a JSONL checkpoint, in order.
+    
+    A truncated last line (from a crash mid-write) is ignored. If t is given,
+    each record's predictions are recomputed from its refitted or raw equation.
+    """
+    iterations = []
+    store = TextStore()
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            iterations.append(IterationRecord.from_dict(record, t, store))
+    return iterations
+
+def resume_autonomous_discovery(t: np.ndarray, A_noisy: np.ndarray, config: Dict,
+                                checkpoint: Optional[str] = None) -> List[Dict]:
+    """
+    Continue a discovery run from its checkpoint without repeating completed iterations.
+    
+    Args:
+        t: Array of time values
+        A_noisy: Array of measured amounts (the same data as the original run)
+        config: Configuration dictionary; new iterations keep appending to config['checkpoint']
+        checkpoint: Path of the checkpoint to resume from (defaults to config['checkpoint'])
+        
+    Returns:
+        List of iteration results, the recovered ones followed by the new ones
+    """
+    checkpoint = checkpoint or config['checkpoint']
+    iterations = load_checkpoint(checkpoint, t) if os.path.exists(checkpoint) else []
+    print(f"♻️ Recovered {len(iterations)} iterations from {checkpoint}")
+    if any((it['r_squared'] if it.get('validated_r_squared') is None else it['validated_r_squared']) > 0.99
+           for it in iterations if it.get('predictions') is not None):
+        print("🎉 This run already found an excellent fit. Nothing to resume.")
+        return iterations
+    return run_autonomous_discovery(t, A_noisy, dict(config, checkpoint=config.get('checkpoint', checkpoint)),
+                                    previous_iterations=iterations)
+
+def run_autonomous_discovery(t: np.ndarray, A_noisy: np.ndarray, config: Dict,
+                             previous_iterations: Optional[List[Dict]] = None) -> List[Dict]:
     """
     Run the autonomous scientific discovery process.
     
     Args:
         t: Array of time values
         A_noisy: Array of measured amounts (with noise)
-        config: Configuration dictionary
+        config: Configuration dictionary. Optional 'render' selects how the
+            per-iteration plots are shown: 'live' (default), 'off', 'file'
+            (saved into config['render_dir'] by a background thread) or
+            'reuse' (one figure updated in place); see IterationRenderer.
+            With 'checkpoint' (a file path) every iteration is appended to a
+            JSONL log as it completes (see resume_autonomous_discovery).
+            With 'validation' ('holdout' or 'kfold', see validation_masks and
+            the 'validation_folds', 'holdout_fraction' and 'validation_seed'
+            keys) every candidate also gets a held-out R², candidates are
+            ranked by it, and the run stops on it instead of the training R².
+            Holdout points are left out of the prompt and of every fit; with
+            'kfold' the prompt shows all points, since each is held out once
+        previous_iterations: Completed iterations to continue from
         
     Returns:
-        List of iteration results
+        List of iteration results (IterationRecord, read like dicts)
     """
-    iterations = []
+    iterations = list(previous_iterations or [])
+    # Texts of this run's records; a resumed run keeps adding to the store of its recovered records
+    store = next((it.store for it in iterations if isinstance(it, IterationRecord)), None) or TextStore()
+    first_iteration = iterations[-1]['iteration'] + 1 if iterations else 1
+    checkpoint = config.get('checkpoint')
     
     print("=" * 80)
     print("STARTING AUTONOMOUS SCIENTIFIC DISCOVERY")
@@ -392,88 +1907,394 @@ def run_autonomous_discovery(t: np.ndarray, A_noisy: np.ndarray, config: Dict) -
         print(f"Model: {config['claude_model']}")
     elif config['provider'] == 'openai':
         print(f"Model: {config['openai_model']}")
+    elif config['provider'] == 'local':
+        print("Model: built-in symbolic regression")
     else:
         print(f"Model: {config['ollama_model']}")
     print(f"Max Iterations: {config['max_iterations']}")
+    if config.get('num_candidates', 1) > 1:
+        print(f"Candidates per Iteration: {config['num_candidates']}")
     print("=" * 80)
     print()
     
-    for i in range(1, config['max_iterations'] + 1):
-        print(f"\n{'='*80}")
-        print(f"ITERATION {i}")
-        print(f"{'='*80}\n")
-        
-        # Build prompt
-        prompt = build_prompt(t, A_noisy, i, iterations, config)
-        
-        print("📝 PROMPT SENT TO LLM:")
-        print("-" * 80)
-        print(prompt)
-        print("-" * 80)
-        print()
-        
-        # Call LLM
-        print("🤔 Waiting for LLM response...")
-        try:
-            response = call_llm(prompt, config)
-        except Exception as e:
-            print(f"❌ Error calling LLM: {e}")
-            continue
-        
-        print("\n🧠 LLM RESPONSE:")
-        print("-" * 80)
-        print(response)
-        print("-" * 80)
-        print()
-        
-        # Parse response
-        parsed = parse_llm_response(response)
-        
-        print("📊 PARSED COMPONENTS:")
-        print(f"Equation: {parsed['equation']}")
-        print(f"Confidence: {parsed['confidence']}")
-        print()
-        
-        # Evaluate equation
-        predictions = evaluate_equation(parsed['equation'], t)
-        
-        if predictions is not None:
-            r_squared = calculate_r_squared(A_noisy, predictions)
-            print(f"✅ R² Score: {r_squared:.4f}")
+    # Validation folds; holdout points are hidden from the prompt and all fitting
+    validation = config.get('validation')
+    masks = None
+    t_fit, A_fit = t, A_noisy
+    if validation is not None:
+        masks = validation_masks(len(t), validation, config.get('validation_folds', 5),
+                                 config.get('holdout_fraction', 0.25), config.get('validation_seed', 0))
+        if validation == 'holdout':
+            t_fit, A_fit = t[~masks[0]], A_noisy[~masks[0]]
+            print(f"🧪 Validation: holding out {int(masks[0].sum())} of {len(t)} points")
+        else:
+            print(f"🧪 Validation: {len(masks)}-fold cross-validation")
+    
+    # Local symbolic search: prompt seeds, the 'local' provider, and the offline fallback
+    local = config['provider'] == 'local'
+    seeds = None
+    if local or config.get('symbolic_seed', False) or config.get('local_fallback', False):
+        search = symbolic_search(t_fit, A_fit, top_n=config.get('symbolic_top_n', 5))
+        seeds = search['candidates']
+        print(f"🔎 Local symbolic search scored {search['num_scored']} candidates in {search['elapsed']:.2f}s, "
+              f"best: {seeds[0]['equation']} (R²={seeds[0]['r_squared']:.4f})")
+        if config.get('symbolic_seed', False):
+            config = dict(config, symbolic_candidates=seeds)
+    
+    # Plots are rendered as they come in; close() waits for the file writer even if the loop fails
+    renderer = IterationRenderer(config.get('render', 'live'), config.get('render_dir', 'discovery_plots'))
+    try:
+        for i in range(first_iteration, config['max_iterations'] + 1):
+            print(f"\n{'='*80}")
+            print(f"ITERATION {i}")
+            print(f"{'='*80}\n")
+            iteration_start = time.perf_counter()
+            
+            # Build prompt
+            prompt = build_prompt(t_fit, A_fit, i, iterations, config)
+            
+            print("📝 PROMPT SENT TO LLM:")
+            print("-" * 80)
+            print(prompt)
+            print("-" * 80)
+            print()
+            
+            # Call LLM
+            prompt_time = time.perf_counter() - iteration_start
+            request_start = time.perf_counter()
+            usages = []
+            num_candidates = config.get('num_candidates', 1)
+            if local:
+                response = local_response(seeds, i)
+                print("\n🧠 LOCAL SEARCH RESPONSE:")
+                print("-" * 80)
+                print(response)
+                print("-" * 80)
+                print()
+                candidates = [{'candidate': 1, 'prompt': prompt, 'response': response, 'error': None}]
+            elif num_candidates > 1:
+                print(f"🤔 Requesting {num_candidates} candidate equations in parallel...")
+                candidates = generate_candidates(prompt, config, num_candidates, t_fit, A_fit)
+                usages = [cand['usage'] for cand in candidates]
+                failed = [cand for cand in candidates if cand['error'] is not None]
+                for cand in failed:
+                    print(f"❌ Candidate {cand['candidate']}: error calling LLM: {cand['error']}")
+                candidates = [cand for cand in candidates if cand['error'] is None]
+                if not candidates:
+                    response = _local_fallback(failed[0]['exception'], seeds, i)
+                    if response is None:
+                        continue
+                    candidates = [{'candidate': 1, 'prompt': prompt, 'response': response, 'error': None}]
+            elif config.get('stream', False):
+                print("\n🧠 LLM RESPONSE (streaming):")
+                print("-" * 80)
+                try:
+                    result = stream_and_evaluate(prompt, config, t_fit, A_fit,
+                                                 on_chunk=lambda chunk: print(chunk, end="", flush=True))
+                except Exception as e:
+                    print()
+                    usages = [{}]
+                    response = _local_fallback(e, seeds, i)
+                    if response is None:
+                        print(f"❌ Error calling LLM: {e}")
+                        continue
+                    candidates = [{'candidate': 1, 'prompt': prompt, 'response': response, 'error': None}]
+                else:
+                    print()
+                    print("-" * 80)
+                    print()
+                    usages = [result['usage']]
+                    candidates = [{'candidate': 1, 'prompt': prompt, 'response': result['response'],
+                                   'error': None, 'result': result}]
+            else:
+                print("🤔 Waiting for LLM response...")
+                usages = [{}]
+                try:
+                    response = call_llm(prompt, config, usages[0])
+                except Exception as e:
+                    response = _local_fallback(e, seeds, i)
+                    if response is None:
+                        print(f"❌ Error calling LLM: {e}")
+                        continue
+                
+                print("\n🧠 LLM RESPONSE:")
+                print("-" * 80)
+                print(response)
+                print("-" * 80)
+                print()
+                candidates = [{'candidate': 1, 'prompt': prompt, 'response': response, 'error': None}]
+            
+            request_time = time.perf_counter() - request_start
+            
+            # Parse and evaluate every response (streamed ones already are), best valid fit first
+            results = []
+            for cand in candidates:
+                result = cand.get('result')
+                if result is None:
+                    result = evaluate_response(cand['response'], t_fit, A_fit, config.get('refine_constants', True))
+                    result['response'] = cand['response']
+                results.append(result)
+            rank_start = time.perf_counter()
+            if masks is not None:
+                validate_results(results, t, A_noisy, masks, config.get('refine_constants', True))
+            results = rank_results(results, A_fit,
+                                   config.get('rank_by', 'r_squared' if masks is None else 'validated_r_squared'))
+            best = results[0]
+            if t_fit is not t and best['predictions'] is not None:
+                # Predictions over every point, held-out ones included, for plots and the summary
+                best['predictions'] = predict(best['equation'], best['refined_constants'], t)
+            # Streamed results were parsed and scored inside the request window
+            timings = {
+                'prompt': prompt_time,
+                'request': request_time,
+                'parse': sum(r['timings']['parse'] for r in results),
+                'evaluate': sum(r['timings']['evaluate'] for r in results) + time.perf_counter() - rank_start,
+                'plot': 0.0,
+                'overlap': sum(cand['result']['timings']['parse'] + cand['result']['timings']['evaluate']
+                               for cand in candidates if cand.get('result') is not None)
+            }
+            
+            if len(results) > 1:
+                print("\n🧪 CANDIDATES:")
+                for result in results:
+                    if result['bic'] is None:
+                        print(f"  R² = {result['r_squared']:.4f}: {result['equation']}")
+                    else:
+                        print(f"  R² = {result['r_squared']:.4f}, BIC = {result['bic']:.1f}: {result['equation']}")
+                print()
+            
+            print("📊 PARSED COMPONENTS:")
+            print(f"Equation: {best['equation']}")
+            print(f"Confidence: {best['confidence']}")
+            if best['refined_equation']:
+                print(f"Refitted: {best['refined_equation']}")
+            print()
             
-            # Store iteration results
-            iteration_data = {
+            # Store iteration results (predictions are recomputed from the equation on access)
+            iteration_data = IterationRecord.from_dict({
                 'iteration': i,
                 'prompt': prompt,
-                'response': response,
-                'reasoning': parsed['reasoning'],
-                'equation': parsed['equation'],
-                'confidence': parsed['confidence'],
-                'r_squared': r_squared,
-                'predictions': predictions
-            }
+                'response': best['response'],
+                'reasoning': best['reasoning'],
+                'equation': best['equation'],
+                'confidence': best['confidence'],
+                'r_squared': best['r_squared'],
+                'validated_r_squared': best.get('validated_r_squared'),
+                'error': best['error'],
+                'raw_r_squared': best['raw_r_squared'],
+                'refined_equation': best['refined_equation'],
+                'refined_constants': best['refined_constants'],
+                'time_to_first_score': best.get('time_to_first_score'),
+                'size': best['size'],
+                'rmse': best['rmse'],
+                'aic': best['aic'],
+                'bic': best['bic'],
+                'timings': timings,
+                'usage': summarize_usage(usages)
+            }, t, store)
+            if len(results) > 1:
+                iteration_data['candidates'] = [
+                    {'equation': r['equation'], 'confidence': r['confidence'], 'r_squared': r['r_squared']}
+                    for r in results
+                ]
             iterations.append(iteration_data)
             
-            # Plot results
-            plot_iteration(t, A_noisy, predictions, parsed['equation'], r_squared, i)
+            if config.get('stream', False):
+                first_scores = [r['time_to_first_score'] for r in results if r.get('time_to_first_score') is not None]
+                if first_scores:
+                    print(f"⏱️ Time to first score: {min(first_scores):.2f}s "
+                          f"(response complete after {max(r['response_time'] for r in results):.2f}s)")
+            
+            if best['predictions'] is not None:
+                if best['refined_equation']:
+                    print(f"✅ R² Score: {best['raw_r_squared']:.4f} → {best['r_squared']:.4f} (refitted constants)")
+                else:
+                    print(f"✅ R² Score: {best['r_squared']:.4f}")
+                if masks is not None:
+                    print(f"🧪 Validated R² ({validation}): {best['validated_r_squared']:.4f}")
+                
+                # Plot results
+                plot_start = time.perf_counter()
+                renderer.plot(t, A_noisy, best['predictions'], best['refined_equation'] or best['equation'],
+                              best['r_squared'], i)
+                timings['plot'] = time.perf_counter() - plot_start
+            else:
+                print(f"❌ Could not evaluate equation ({best['error']['kind']}): {best['error']['message']}")
+            
+            timings['total'] = time.perf_counter() - iteration_start
+            if checkpoint is not None:
+                append_checkpoint(checkpoint, iteration_data)
             
-            # Check if we've found a good solution
-            if r_squared > 0.99:
+            # Check if we've found a good solution (on held-out points when validating)
+            score = best['r_squared'] if masks is None else best['validated_r_squared']
+            if best['predictions'] is not None and score > 0.99:
                 print("\n🎉 Excellent fit found! Discovery complete.")
                 break
+    finally:
+        renderer.close()
+    return iterations
+
+# Batch discovery: many datasets over a process pool
+def dataset_grid(principals=(1000.0,), rates=(0.08,), noise_levels=(0.15,),
+                 num_points: int = 20, repeats: int = 1, seed: int = 0,
+                 laws=('compound_interest',)) -> List[Dict]:
+    """
+    Dataset specifications for run_batch_discovery, one per parameter combination and repeat.
+    
+    Each spec holds the generator arguments and its own random seed, so every
+    dataset is reproducible independently of the worker that generates it.
+    laws names GROUND_TRUTH_LAWS entries, or maps names to lists of parameter
+    overrides, e.g. {'logistic': [{'rate': 0.2}, {'rate': 0.5}], 'linear': None}
+    (None for the law's defaults). Compound interest, when listed by name,
+    spans principals x rates and is generated by generate_compound_interest_data;
+    the other laws by generate_replicates.
+    """
+    if not isinstance(laws, dict):
+        laws = {law: None for law in laws}
+    specs = []
+    for law, variants in laws.items():
+        if law not in GROUND_TRUTH_LAWS:
+            raise ValueError(f"Unknown law: {law}. Use one of {list(GROUND_TRUTH_LAWS)}")
+        if law == 'compound_interest' and variants is None:
+            variants = [{'principal': principal, 'rate': rate} for principal in principals for rate in rates]
+        for params in variants or [{}]:
+            params = dict(GROUND_TRUTH_LAWS[law][1], **params)
+            if law == 'compound_interest':
+                label = f"P={params['principal']:g} r={params['rate']:g}"
+            else:
+                label = law + " " + " ".join(f"{key}={value:g}" for key, value in params.items())
+            for noise_level in noise_levels:
+                for r in range(repeats):
+                    spec = {
+                        'name': f"{label} noise={noise_level:g} #{r + 1}",
+                        'law': law, 'params': params, 'noise_level': noise_level,
+                        'num_points': num_points, 'seed': seed + len(specs)
+                    }
+                    if law == 'compound_interest':
+                        spec.update(principal=params['principal'], rate=params['rate'])
+                    specs.append(spec)
+    return specs
+
+def _init_batch_worker(slots: Dict[str, object]):
+    _provider_slots.update(slots)
+
+def _dataset_checkpoint(path: str, index: int, name: Optional[str]) -> str:
+    """Per-dataset checkpoint path: the batch path with the dataset's index and name inserted."""
+    root, ext = os.path.splitext(path)
+    slug = re.sub(r'[^A-Za-z0-9.=-]+', '_', name or '').strip('_')
+    return f"{root}.{index:04d}{'-' + slug if slug else ''}{ext or '.jsonl'}"
+
+def _run_batch_dataset(spec: Dict, config: Dict, index: int = 0) -> Dict:
+    """Generate (or take) one dataset and run a quiet discovery on it, in a worker process."""
+    start = time.perf_counter()
+    result = {key: spec.get(key) for key in ('name', 'law', 'principal', 'rate', 'noise_level', 'num_points')}
+    if config.get('checkpoint'):
+        config = dict(config, checkpoint=_dataset_checkpoint(config['checkpoint'], index, spec.get('name')))
+        result['checkpoint'] = config['checkpoint']
+    try:
+        law = spec.get('law', 'compound_interest')
+        if 't' in spec:
+            t, A_noisy = np.asarray(spec['t'], dtype=float), np.asarray(spec['A_noisy'], dtype=float)
+        elif law == 'compound_interest':
+            params = spec.get('params') or {}
+            t, A_noisy, _ = generate_compound_interest_data(
+                spec.get('principal', params.get('principal', 1000.0)), spec.get('rate', params.get('rate', 0.08)),
+                spec.get('noise_level', 0.15), spec.get('num_points', 20), rng=np.random.default_rng(spec.get('seed')))
         else:
-            print("❌ Could not evaluate equation")
-            # Still store the iteration
-            iteration_data = {
-                'iteration': i,
-                'prompt': prompt,
-                'response': response,
-                'reasoning': parsed['reasoning'],
-                'equation': parsed['equation'],
-                'confidence': parsed['confidence'],
-                'r_squared': 0.0,
-                'predictions': None
-            }
-            iterations.append(iteration_data)
+            t, A_block, _ = generate_replicates(law, spec.get('params'), 1, spec.get('num_points', 20),
+                                                noise_level=spec.get('noise_level', 0.15), seed=spec.get('seed'))
+            A_noisy = A_block[0]
+        with contextlib.redirect_stdout(io.StringIO()):
+            iterations = run_autonomous_discovery(t, A_noisy, config)
+        valid = [it for it in iterations if it['predictions'] is not None]
+        best = max(valid, key=lambda it: it['r_squared']) if valid else None
+        result.update({
+            'best_equation': (best.get('refined_equation') or best['equation']) if best else None,
+            'r_squared': best['r_squared'] if best else None,
+            'iterations': len(iterations),
+            'error': None
+        })
+    except Exception as e:
+        result.update({'best_equation': None, 'r_squared': None, 'iterations': 0, 'error': f"{type(e).__name__}: {e}"})
+    result['elapsed'] = time.perf_counter() - start
+    return result
+
+def run_batch_discovery(datasets: List[Dict], config: Dict, max_workers: Optional[int] = None,
+                        max_concurrent_requests=None, success_threshold: float = 0.99) -> Dict:
+    """
+    Run run_autonomous_discovery over many datasets in a process pool.
+    
+    Every dataset runs quietly in a worker process (printing suppressed, plots
+    off unless config['render'] is 'file'). Concurrent LLM requests are bounded
+    per provider across all workers by semaphores from a multiprocessing
+    Manager, so a large pool cannot flood one API, and each worker's scheduler
+    gets an equal share of the per-minute rate limits (see get_scheduler).
+    With config['checkpoint'] every dataset gets its own checkpoint file (the
+    path with the dataset's index and name inserted, reported per row), and a
+    shared config['llm_cache'] is opened by every worker with a busy timeout.
+    
+    Args:
+        datasets: Dataset specs, e.g. from dataset_grid, or dicts with 'name', 't' and 'A_noisy'
+        config: Configuration dictionary for run_autonomous_discovery
+        max_workers: Number of worker processes (defaults to the CPU count)
+        max_concurrent_requests: Bound on in-flight requests, an int for the configured
+            provider or a dict {provider: limit}; None for no bound
+        success_threshold: R² a dataset's best equation must exceed to count as a success
+        
+    Returns:
+        Dictionary with 'results' (one row per dataset, in input order) and 'stats'
+    """
+    config = dict(config)
+    if config.get('render', 'live') != 'file':
+        config['render'] = 'off'
+    if isinstance(max_concurrent_requests, int):
+        max_concurrent_requests = {config['provider'].lower(): max_concurrent_requests}
+    max_workers = max_workers or os.cpu_count() or 1
+    config['rate_limit_share'] = config.get('rate_limit_share', 1.0) / min(max_workers, max(len(datasets), 1))
+    
+    start = time.perf_counter()
+    with multiprocessing.Manager() as manager:
+        slots = {provider: manager.BoundedSemaphore(limit)
+                 for provider, limit in (max_concurrent_requests or {}).items()}
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_batch_worker,
+                                 initargs=(slots,)) as pool:
+            futures = [pool.submit(_run_batch_dataset, spec, config, k) for k, spec in enumerate(datasets)]
+            results = []
+            for k, future in enumerate(futures, start=1):
+                results.append(future.result())
+                print(f"\r⏳ {k}/{len(futures)} datasets complete", end="", flush=True)
+    print()
     
-    return iterations
\ No newline at end of file
+    for row in results:
+        row['success'] = row['r_squared'] is not None and row['r_squared'] > success_threshold
+    scored = np.array([row['r_squared'] for row in results if row['r_squared'] is not None], dtype=float)
+    stats = {
+        'datasets': len(results),
+        'success_rate': float(np.mean([row['success'] for row in results])) if results else 0.0,
+        'failed_runs': sum(row['error'] is not None for row in results),
+        'mean_r_squared': float(scored.mean()) if scored.size else None,
+        'median_r_squared': float(np.median(scored)) if scored.size else None,
+        'mean_iterations': float(np.mean([row['iterations'] for row in results])) if results else 0.0,
+        'wall_time': time.perf_counter() - start
+    }
+    return {'results': results, 'stats': stats}
+
+def print_batch_results(batch: Dict):
+    """Print the results table and success statistics of run_batch_discovery."""
+    width = max([36] + [len(row['name'] or '') for row in batch['results']])
+    print("=" * 100)
+    print(f"{'Dataset':<{width}} {'R²':>8} {'Iter':>5} {'Time':>7}  Best equation")
+    print("-" * 100)
+    for row in batch['results']:
+        r_squared = f"{row['r_squared']:.4f}" if row['r_squared'] is not None else "-"
+        equation = row['best_equation'] or f"❌ {row['error'] or 'no valid equation'}"
+        mark = "✅" if row['success'] else "  "
+        print(f"{row['name'] or '':<{width}} {r_squared:>8} {row['iterations']:>5} {row['elapsed']:>6.1f}s  {mark} {equation}")
+    print("-" * 100)
+    stats = batch['stats']
+    print(f"Success rate: {stats['success_rate']:.1%} of {stats['datasets']} datasets "
+          f"({stats['failed_runs']} runs failed)")
+    if stats['mean_r_squared'] is not None:
+        print(f"R²: mean {stats['mean_r_squared']:.4f}, median {stats['median_r_squared']:.4f}")
+    print(f"Mean iterations: {stats['mean_iterations']:.1f}, wall time: {stats['wall_time']:.1f}s")
+    print("=" * 100)
@@ -0,0 +1,293 @@
+"""
+Request scheduling for the LLM providers used by discovery_methods.
+
+Each provider gets token buckets for its requests and tokens per minute, an
+in-flight limit and a priority queue (ProviderScheduler); batch worker
+processes additionally share per-provider request slots (see
+discovery_methods.run_batch_discovery). A request holds its dispatch slot for
+as long as it runs, except while discovery_transport.post_json backs off.
+"""
+import contextlib
+import heapq
+import itertools
+import threading
+import time
+from typing import List, Dict, Tuple, Optional
+
+# Per-provider request slots shared across batch worker processes (see discovery_methods.run_batch_discovery)
+_provider_slots: Dict[str, object] = {}
+
+def _provider_slot(provider: str):
+    """Context manager holding one of the provider's shared request slots, if any are set."""
+    slot = _provider_slots.get(provider)
+    return slot if slot is not None else contextlib.nullcontext()
+
+# Request scheduling: per-provider token buckets, an in-flight limit and a priority queue
+# Defaults are conservative entry-tier limits; override them with config['rate_limits']
+PROVIDER_RATE_LIMITS = {
+    'claude': {'requests_per_minute': 50, 'tokens_per_minute': 30000, 'max_in_flight': 8},
+    'openai': {'requests_per_minute': 500, 'tokens_per_minute': 30000, 'max_in_flight': 16},
+    'ollama': {'requests_per_minute': None, 'tokens_per_minute': None, 'max_in_flight': 1},
+}
+DEFAULT_EXPECTED_OUTPUT_TOKENS = 500    # output tokens reserved per request until the real usage is known
+
+class TokenBucket:
+    """
+    A bucket of `capacity` units refilling continuously at `rate` units per second.
+    
+    Not thread-safe on its own; ProviderScheduler calls it under its lock.
+    The level may go negative when a request turns out to use more tokens
+    than were reserved, which delays the following requests accordingly.
+    """
+    
+    def __init__(self, capacity: float, rate: float):
+        self.capacity = float(capacity)
+        self.rate = float(rate)
+        self.level = self.capacity
+        self.updated = time.monotonic()
+    
+    def _refill(self, now: float):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+    
+    def wait_time(self, amount: float, now: float) -> float:
+        """Seconds until `amount` units are available (a request above capacity waits for a full bucket)."""
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        return 0.0 if self.level >= amount else (amount - self.level) / self.rate
+    
+    def take(self, amount: float, now: float):
+        """Remove `amount` units (a negative amount returns them)."""
+        self._refill(now)
+        self.level = min(self.capacity, self.level - amount)
+    
+    def drain(self, now: float):
+        """Empty the bucket, so it refills from zero."""
+        self._refill(now)
+        self.level = min(self.level, 0.0)
+    
+    def resized(self, per_minute: Optional[float], now: float) -> Optional['TokenBucket']:
+        """A bucket for a new per-minute limit that keeps this one's level (clamped to the new capacity)."""
+        if not per_minute:
+            return None
+        self._refill(now)
+        bucket = TokenBucket(per_minute, per_minute / 60)
+        bucket.level = min(self.level, bucket.capacity)
+        bucket.updated = now
+        return bucket
+
+class ProviderScheduler:
+    """
+    Admission control for one provider's requests within this process.
+    
+    A request is dispatched once it is at the head of the priority queue
+    (lower priority values first, FIFO within a priority), fewer than
+    max_in_flight requests are running, and both the request bucket and the
+    token bucket (estimated prompt plus expected output tokens) can cover it.
+    Reserved tokens are corrected with the actual usage when the request ends.
+    A 429 from the provider pauses dispatching for its Retry-After delay and
+    drains the request bucket, so the next requests ramp back up slowly.
+    A limit of None disables that check.
+    """
+    
+    def __init__(self, provider: str, requests_per_minute: Optional[float] = None,
+                 tokens_per_minute: Optional[float] = None, max_in_flight: Optional[int] = None):
+        self.provider = provider
+        self._cond = threading.Condition()
+        self._queue: List[Tuple[int, int]] = []
+        self._order = itertools.count()
+        self._in_flight = 0
+        self._paused_until = 0.0
+        self._requests: Optional[TokenBucket] = None
+        self._tokens: Optional[TokenBucket] = None
+        self._stats = {'requests': 0, 'wait_time': 0.0, 'max_wait': 0.0, 'max_queued': 0, 'throttled': 0}
+        self.configure(requests_per_minute, tokens_per_minute, max_in_flight)
+    
+    def configure(self, requests_per_minute: Optional[float] = None, tokens_per_minute: Optional[float] = None,
+                  max_in_flight: Optional[int] = None):
+        """
+        Replace the limits. New buckets start full; existing ones keep their
+        current level, clamped to the new capacity, so switching between
+        configs cannot refill a bucket early.
+        """
+        with self._cond:
+            now = time.monotonic()
+            self.limits = {'requests_per_minute': requests_per_minute, 'tokens_per_minute': tokens_per_minute,
+                           'max_in_flight': max_in_flight}
+            self._requests = self._resize(self._requests, requests_per_minute, now)
+            self._tokens = self._resize(self._tokens, tokens_per_minute, now)
+            self._cond.notify_all()
+    
+    @staticmethod
+    def _resize(bucket: Optional[TokenBucket], per_minute: Optional[float], now: float) -> Optional[TokenBucket]:
+        if bucket is not None:
+            return bucket.resized(per_minute, now)
+        return TokenBucket(per_minute, per_minute / 60) if per_minute else None
+    
+    def _wait_time(self, tokens: float, now: float) -> Optional[float]:
+        """Seconds until the head request may go, or None to wait for a running request to finish."""
+        max_in_flight = self.limits['max_in_flight']
+        if max_in_flight is not None and self._in_flight >= max_in_flight:
+            return None
+        waits = [self._paused_until - now, 0.0]
+        if self._requests is not None:
+            waits.append(self._requests.wait_time(1, now))
+        if self._tokens is not None:
+            waits.append(self._tokens.wait_time(tokens, now))
+        return max(waits)
+    
+    def acquire(self, tokens: float = 0, priority: int = 0):
+        """Block until this request may be sent, then count it as in flight."""
+        start = time.monotonic()
+        entry = (priority, next(self._order))
+        with self._cond:
+            heapq.heappush(self._queue, entry)
+            self._stats['max_queued'] = max(self._stats['max_queued'], len(self._queue))
+            while True:
+                wait = self._wait_time(tokens, time.monotonic()) if self._queue[0] == entry else None
+                if wait is not None and wait <= 0:
+                    break
+                self._cond.wait(timeout=wait)
+            heapq.heappop(self._queue)
+            now = time.monotonic()
+            if self._requests is not None:
+                self._requests.take(1, now)
+            if self._tokens is not None:
+                self._tokens.take(tokens, now)
+            self._in_flight += 1
+            waited = now - start
+            self._stats['requests'] += 1
+            self._stats['wait_time'] += waited
+            self._stats['max_wait'] = max(self._stats['max_wait'], waited)
+            # The next request in line re-checks the limits
+            self._cond.notify_all()
+    
+    def release(self, reserved_tokens: float = 0, used_tokens: Optional[float] = None):
+        """Mark a request as finished, settling its token reservation against the actual usage."""
+        with self._cond:
+            self._in_flight -= 1
+            if used_tokens is not None and self._tokens is not None:
+                self._tokens.take(used_tokens - reserved_tokens, time.monotonic())
+            self._cond.notify_all()
+    
+    def backoff(self, delay: float):
+        """Pause dispatching for `delay` seconds after the provider answered 429."""
+        with self._cond:
+            now = time.monotonic()
+            self._paused_until = max(self._paused_until, now + delay)
+            if self._requests is not None:
+                self._requests.drain(now)
+            self._stats['throttled'] += 1
+            self._cond.notify_all()
+    
+    @contextlib.contextmanager
+    def slot(self, tokens: float = 0, priority: int = 0, usage: Optional[Dict] = None):
+        """Hold a dispatch slot for the duration of one request; usage (see call_llm) settles the tokens."""
+        self.acquire(tokens, priority)
+        try:
+            yield
+        finally:
+            used = None
+            if usage is not None and 'input_tokens' in usage:
+                used = usage['input_tokens'] + usage.get('output_tokens', 0)
+            self.release(tokens, used)
+    
+    def get_stats(self) -> Dict:
+        """Requests dispatched, total and longest queueing 'wait_time', 429s ('throttled'), and current load."""
+        with self._cond:
+            return dict(self._stats, in_flight=self._in_flight, queued=len(self._queue), limits=dict(self.limits))
+
+_schedulers: Dict[Tuple, ProviderScheduler] = {}
+_schedulers_lock = threading.Lock()
+
+def get_scheduler(provider: str, config: Optional[Dict] = None) -> ProviderScheduler:
+    """
+    Return the process-wide scheduler of a provider for the config's limits.
+    
+    config['rate_limits'] maps a provider to overrides of PROVIDER_RATE_LIMITS
+    ('requests_per_minute', 'tokens_per_minute', 'max_in_flight'; None disables
+    one). config['rate_limit_share'] scales the per-minute limits, for runs
+    that split one account's quota over several processes. Schedulers are
+    keyed by provider and effective limits, so callers with different limits
+    in one process (a batch share and a direct call) never reconfigure each
+    other; a 429 still pauses all of the provider's schedulers.
+    """
+    config = config or {}
+    limits = dict(PROVIDER_RATE_LIMITS.get(provider, {}))
+    limits.update(config.get('rate_limits', {}).get(provider, {}))
+    share = config.get('rate_limit_share', 1.0)
+    for key in ('requests_per_minute', 'tokens_per_minute'):
+        if limits.get(key):
+            limits[key] *= share
+    key = (provider,) + tuple(sorted(limits.items()))
+    with _schedulers_lock:
+        scheduler = _schedulers.get(key)
+        if scheduler is None:
+            scheduler = _schedulers[key] = ProviderScheduler(provider, **limits)
+        return scheduler
+
+def _provider_schedulers(provider: str) -> List[ProviderScheduler]:
+    with _schedulers_lock:
+        return [scheduler for key, scheduler in _schedulers.items() if key[0] == provider]
+
+def get_scheduler_stats() -> Dict[str, Dict]:
+    """
+    Scheduler statistics per provider (see ProviderScheduler.get_stats).
+    
+    A provider used with several sets of limits gets one entry per set, keyed
+    'provider[k]' in creation order.
+    """
+    with _schedulers_lock:
+        schedulers = list(_schedulers.values())
+    stats = {}
+    for scheduler in schedulers:
+        same = [other for other in schedulers if other.provider == scheduler.provider]
+        name = scheduler.provider if len(same) == 1 else f"{scheduler.provider}[{same.index(scheduler)}]"
+        stats[name] = scheduler.get_stats()
+    return stats
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count of a prompt (about four characters per token)."""
+    return -(-len(text) // 4)
+
+# The dispatch slot held by the request running on this thread, given up while post_json backs off
+_active_request = threading.local()
+
+@contextlib.contextmanager
+def _scheduled_request(prompt: str, config: Dict, usage: Optional[Dict] = None):
+    """Wait for the provider's scheduler (and any cross-process slot), holding both during the request."""
+    provider = config["provider"].lower()
+    tokens = estimate_tokens(prompt) + config.get("expected_output_tokens", DEFAULT_EXPECTED_OUTPUT_TOKENS)
+    priority = config.get("request_priority", 0)
+    scheduler = get_scheduler(provider, config)
+    with scheduler.slot(tokens, priority, usage), _provider_slot(provider):
+        outer = getattr(_active_request, 'slot', None)
+        _active_request.slot = (scheduler, tokens, priority, _provider_slots.get(provider))
+        try:
+            yield
+        finally:
+            _active_request.slot = outer
+
+@contextlib.contextmanager
+def _yield_request_slot():
+    """
+    Give up this thread's dispatch slot for the duration of the block, then wait for it again.
+    
+    The reserved tokens are returned (a rejected request uses none) and taken
+    again with a new request when the slot is re-acquired. Without a slot this
+    does nothing.
+    """
+    held = getattr(_active_request, 'slot', None)
+    if held is None:
+        yield
+        return
+    scheduler, tokens, priority, shared = held
+    if shared is not None:
+        shared.release()
+    scheduler.release(tokens, 0)
+    try:
+        yield
+    finally:
+        scheduler.acquire(tokens, priority)
+        if shared is not None:
+            shared.acquire()
@@ -0,0 +1,201 @@
+"""
+Streaming clients for the LLM providers used by discovery_methods.
+
+stream_llm yields the configured provider's response as it is generated,
+through the same response cache, scheduler and usage accounting as
+call_llm; IncrementalParser spots the EQUATION section as soon as it is
+complete, so discovery_methods.stream_and_evaluate can score it early.
+"""
+import json
+import re
+from typing import Dict, Iterator, Optional
+
+import requests
+
+from discovery_cache import CacheMissError, get_response_cache
+from discovery_scheduler import _scheduled_request
+from discovery_transport import (DEFAULT_TIMEOUT, DEFAULT_MAX_RETRIES, post_json, _fill_usage, _finish_usage,
+                                 _model_name)
+
+# Streaming: incremental provider output, parsed as it arrives
+def _iter_sse_data(response: requests.Response) -> Iterator[str]:
+    """Yield the data payloads of a server-sent event stream."""
+    for line in response.iter_lines():
+        if line.startswith(b"data:"):
+            yield line[5:].decode("utf-8").strip()
+
+def stream_claude(prompt: str, api_key: str, model: str, base_url: str = "https://api.anthropic.com",
+                  timeout: float = DEFAULT_TIMEOUT, max_retries: int = DEFAULT_MAX_RETRIES,
+                  usage: Optional[Dict] = None) -> Iterator[str]:
+    """Stream text deltas from the Anthropic Claude API (token counts go into usage, if given)."""
+    response = post_json(
+        "claude",
+        f"{base_url}/v1/messages",
+        headers={
+            "x-api-key": api_key,
+            "anthropic-version": "2023-06-01",
+            "content-type": "application/json",
+        },
+        payload={
+            "model": model,
+            "max_tokens": 2000,
+            "messages": [{"role": "user", "content": prompt}],
+            "stream": True
+        },
+        timeout=timeout,
+        max_retries=max_retries,
+        stream=True
+    )
+    if response.status_code != 200:
+        raise Exception(f"Claude API error: {response.status_code} - {response.text}")
+    input_tokens = output_tokens = 0
+    with response:
+        for data in _iter_sse_data(response):
+            event = json.loads(data)
+            if event.get("type") == "content_block_delta":
+                yield event["delta"].get("text", "")
+            elif event.get("type") == "message_start":
+                input_tokens = event["message"].get("usage", {}).get("input_tokens", 0)
+            elif event.get("type") == "message_delta":
+                output_tokens = event.get("usage", {}).get("output_tokens", output_tokens)
+            elif event.get("type") == "error":
+                raise Exception(f"Claude API error: {event['error']}")
+    _fill_usage(usage, input_tokens, output_tokens)
+
+def stream_openai(prompt: str, api_key: str, model: str, base_url: str = "https://api.openai.com",
+                  timeout: float = DEFAULT_TIMEOUT, max_retries: int = DEFAULT_MAX_RETRIES,
+                  usage: Optional[Dict] = None) -> Iterator[str]:
+    """Stream text deltas from the OpenAI API (token counts go into usage, if given)."""
+    response = post_json(
+        "openai",
+        f"{base_url}/v1/chat/completions",
+        headers={
+            "Authorization": f"Bearer {api_key}",
+            "Content-Type": "application/json",
+        },
+        payload={
+            "model": model,
+            "messages": [{"role": "user", "content": prompt}],
+            "max_completion_tokens": 2000,
+            "stream": True,
+            "stream_options": {"include_usage": True}
+        },
+        timeout=timeout,
+        max_retries=max_retries,
+        stream=True
+    )
+    if response.status_code != 200:
+        raise Exception(f"OpenAI API error: {response.status_code} - {response.text}")
+    with response:
+        for data in _iter_sse_data(response):
+            if data == "[DONE]":
+                break
+            chunk = json.loads(data)
+            if chunk.get("usage"):
+                _fill_usage(usage, chunk["usage"].get("prompt_tokens"), chunk["usage"].get("completion_tokens"))
+            choices = chunk.get("choices") or [{}]
+            yield choices[0].get("delta", {}).get("content") or ""
+
+def stream_ollama(prompt: str, base_url: str, model: str,
+                  timeout: float = DEFAULT_TIMEOUT, max_retries: int = DEFAULT_MAX_RETRIES,
+                  usage: Optional[Dict] = None) -> Iterator[str]:
+    """Stream text chunks from the local Ollama API (newline-delimited JSON; token counts go into usage)."""
+    response = post_json(
+        "ollama",
+        f"{base_url}/api/generate",
+        payload={
+            "model": model,
+            "prompt": prompt,
+            "stream": True,
+        },
+        timeout=timeout,
+        max_retries=max_retries,
+        stream=True
+    )
+    if response.status_code != 200:
+        raise Exception(f"Ollama API error: {response.status_code} - {response.text}")
+    with response:
+        for line in response.iter_lines():
+            if not line:
+                continue
+            chunk = json.loads(line.decode("utf-8"))
+            if "error" in chunk:
+                raise Exception(f"Ollama API error: {chunk['error']}")
+            yield chunk.get("response", "")
+            if chunk.get("done"):
+                _fill_usage(usage, chunk.get("prompt_eval_count"), chunk.get("eval_count"))
+                break
+
+def stream_llm(prompt: str, config: Dict, usage: Optional[Dict] = None) -> Iterator[str]:
+    """
+    Stream the configured provider's response as text chunks.
+    
+    Uses the same config keys, response cache and usage dict as call_llm: a
+    cached response is yielded as a single chunk, and a streamed one is
+    recorded once complete.
+    """
+    mode = config.get("llm_cache_mode", "readwrite")
+    cache = get_response_cache(config)
+    provider, model = config["provider"].lower(), _model_name(config)
+    if cache is not None:
+        response = cache.get(provider, model, prompt)
+        if response is not None:
+            _finish_usage(usage, config, cached=True)
+            yield response
+            return
+        if mode == "replay":
+            raise CacheMissError(f"No recorded {provider} response for this prompt in {cache.path}")
+    elif mode == "replay":
+        raise ValueError("llm_cache_mode 'replay' needs an 'llm_cache' file")
+    
+    # The stream_* generators fill this dict, which also settles the scheduler's token reservation
+    usage = usage if usage is not None else {}
+    timeout = config.get("request_timeout", DEFAULT_TIMEOUT)
+    max_retries = config.get("max_retries", DEFAULT_MAX_RETRIES)
+    if provider == "claude":
+        chunks = stream_claude(prompt, config["anthropic_api_key"], config["claude_model"],
+                               config.get("anthropic_base_url", "https://api.anthropic.com"), timeout, max_retries,
+                               usage)
+    elif provider == "openai":
+        chunks = stream_openai(prompt, config["openai_api_key"], config["openai_model"],
+                               config.get("openai_base_url", "https://api.openai.com"), timeout, max_retries,
+                               usage)
+    elif provider == "ollama":
+        chunks = stream_ollama(prompt, config["ollama_base_url"], config["ollama_model"], timeout, max_retries,
+                               usage)
+    else:
+        raise ValueError(f"Unknown provider: {provider}")
+    
+    parts = []
+    with _scheduled_request(prompt, config, usage):
+        for chunk in chunks:
+            parts.append(chunk)
+            yield chunk
+    _finish_usage(usage, config, cached=False)
+    if cache is not None:
+        cache.put(provider, model, prompt, "".join(parts))
+
+class IncrementalParser:
+    """
+    Accumulates streamed text and reports the EQUATION section as soon as it is complete.
+    
+    The equation is complete once its line ends (a newline after some content) or
+    the CONFIDENCE section starts, whichever comes first. Blank space after the
+    EQUATION: label, including newlines, is skipped, so an equation on the line
+    below the label is found too.
+    """
+    
+    def __init__(self):
+        self.text = ""
+        self.equation = None
+    
+    def feed(self, chunk: str) -> Optional[str]:
+        """Add a chunk; returns the equation the first time it becomes complete, else None."""
+        self.text += chunk
+        if self.equation is not None:
+            return None
+        match = re.search(r'EQUATION:\s*(\S.*?)(?:CONFIDENCE:|\n)', self.text, re.DOTALL)
+        if match and match.group(1).strip():
+            self.equation = match.group(1).strip()
+            return self.equation
+        return None
@@ -0,0 +1,354 @@
+"""
+Provider client layer for discovery_methods.
+
+Pooled keep-alive HTTP sessions, timeouts, retries with backoff and a bounded
+per-attempt latency log (post_json, get_call_stats), the Claude, OpenAI and
+Ollama request functions, cost estimates, and call_llm, which puts the
+response cache (discovery_cache) and the scheduler (discovery_scheduler) in
+front of them.
+"""
+import collections
+import random
+import threading
+import time
+from typing import List, Dict, Tuple, Optional
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from discovery_cache import CACHE_MODES, CacheMissError, get_response_cache
+from discovery_scheduler import _provider_schedulers, _scheduled_request, _yield_request_slot
+
+# Provider client layer: pooled keep-alive sessions, timeouts, retries and latency log
+DEFAULT_TIMEOUT = 120.0     # seconds per HTTP request
+DEFAULT_MAX_RETRIES = 3     # retries after the first attempt on 429/5xx and connection errors
+DEFAULT_BACKOFF = 1.0       # seconds, doubled on every retry
+CALL_LOG_SIZE = 10000       # most recent HTTP attempts kept for get_call_stats
+
+_sessions: Dict[str, requests.Session] = {}
+_sessions_lock = threading.Lock()
+_call_log: collections.deque = collections.deque(maxlen=CALL_LOG_SIZE)
+_call_totals: Dict[str, Dict] = {}
+_call_log_lock = threading.Lock()
+
+def get_session(url: str) -> requests.Session:
+    """Return the shared keep-alive session for the scheme and host of url."""
+    parts = urlsplit(url)
+    key = f"{parts.scheme}://{parts.netloc}"
+    with _sessions_lock:
+        session = _sessions.get(key)
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=32)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            _sessions[key] = session
+        return session
+
+def close_sessions():
+    """Close all pooled sessions (their connections are reopened on the next call)."""
+    with _sessions_lock:
+        for session in _sessions.values():
+            session.close()
+        _sessions.clear()
+
+def get_call_stats() -> List[Dict]:
+    """
+    Return one record per HTTP attempt made to a provider, oldest first.
+    
+    Only the most recent CALL_LOG_SIZE attempts are kept, so long-running
+    processes do not grow the log without bound; get_call_totals counts all.
+    Each record has 'provider', 'url', 'status' (None on connection errors),
+    'latency' (seconds), 'attempt' (0 for the first try) and 'error'.
+    """
+    with _call_log_lock:
+        return list(_call_log)
+
+def get_call_totals() -> Dict[str, Dict]:
+    """
+    Return running totals per provider since the last reset_call_stats.
+    
+    Each entry has 'attempts', 'retries', 'errors' (connection errors, 429 and
+    5xx responses) and 'latency' (summed seconds).
+    """
+    with _call_log_lock:
+        return {provider: dict(totals) for provider, totals in _call_totals.items()}
+
+def reset_call_stats():
+    """Clear the per-attempt latency log and the running totals."""
+    with _call_log_lock:
+        _call_log.clear()
+        _call_totals.clear()
+
+def _retry_delay(response, attempt: int, backoff: float) -> float:
+    """Seconds to wait before the next attempt: Retry-After if given, else exponential backoff with jitter."""
+    if response is not None:
+        retry_after = response.headers.get("Retry-After")
+        if retry_after is not None:
+            try:
+                return max(0.0, float(retry_after))
+            except ValueError:
+                pass
+    return backoff * (2 ** attempt) + random.uniform(0, backoff)
+
+def post_json(provider: str, url: str, payload: Dict, headers: Dict = None,
+              timeout: float = DEFAULT_TIMEOUT, max_retries: int = DEFAULT_MAX_RETRIES,
+              backoff: float = DEFAULT_BACKOFF, stream: bool = False) -> requests.Response:
+    """
+    POST a JSON payload over the pooled session, retrying transient failures.
+    
+    429 and 5xx responses, timeouts and connection errors are retried up to
+    max_retries times with exponential backoff (honouring Retry-After); a 429
+    also pauses the provider's schedulers (see ProviderScheduler.backoff), and
+    the dispatch slot of the calling request is given up during the backoff
+    sleep (see _yield_request_slot). Every
+    attempt is timed and appended to the call log (see get_call_stats). With
+    stream=True the body is left unread and the latency covers the headers only.
+    
+    Returns:
+        The final response; raises the last connection error if no response arrived
+    """
+    session = get_session(url)
+    for attempt in range(max_retries + 1):
+        response, error = None, None
+        start = time.perf_counter()
+        try:
+            response = session.post(url, json=payload, headers=headers, timeout=timeout, stream=stream)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            error = e
+        latency = time.perf_counter() - start
+        
+        status = response.status_code if response is not None else None
+        with _call_log_lock:
+            _call_log.append({
+                'provider': provider, 'url': url, 'status': status,
+                'latency': latency, 'attempt': attempt,
+                'error': str(error) if error is not None else None
+            })
+            totals = _call_totals.setdefault(provider, {'attempts': 0, 'retries': 0, 'errors': 0, 'latency': 0.0})
+            totals['attempts'] += 1
+            totals['retries'] += attempt > 0
+            totals['errors'] += error is not None or status == 429 or status >= 500
+            totals['latency'] += latency
+        
+        retryable = error is not None or status == 429 or status >= 500
+        if not retryable:
+            return response
+        delay = _retry_delay(response, attempt, backoff)
+        if status == 429:
+            for scheduler in _provider_schedulers(provider):
+                scheduler.backoff(delay)
+        if attempt == max_retries:
+            if response is not None:
+                return response
+            raise error
+        # Other requests may go while this one backs off
+        with _yield_request_slot():
+            time.sleep(delay)
+
+# USD per million (input, output) tokens, matched by longest model-name prefix; local models are free
+MODEL_PRICING = {
+    'claude-opus-4': (15.0, 75.0),
+    'claude-sonnet-4': (3.0, 15.0),
+    'claude-3-7-sonnet': (3.0, 15.0),
+    'claude-3-5-sonnet': (3.0, 15.0),
+    'claude-haiku-4': (1.0, 5.0),
+    'claude-3-5-haiku': (0.8, 4.0),
+    'gpt-4o-mini': (0.15, 0.6),
+    'gpt-4o': (2.5, 10.0),
+    'gpt-4.1-nano': (0.1, 0.4),
+    'gpt-4.1-mini': (0.4, 1.6),
+    'gpt-4.1': (2.0, 8.0),
+    'gpt-5-nano': (0.05, 0.4),
+    'gpt-5-mini': (0.25, 2.0),
+    'gpt-5': (1.25, 10.0),
+    'o4-mini': (1.1, 4.4),
+    'o3': (2.0, 8.0),
+}
+
+def estimate_cost(provider: str, model: str, input_tokens: int, output_tokens: int,
+                  pricing: Optional[Dict[str, Tuple[float, float]]] = None) -> Optional[float]:
+    """Estimated USD cost of a call, or None if the model has no known price."""
+    if provider in ('ollama', 'local'):
+        return 0.0
+    pricing = MODEL_PRICING if pricing is None else pricing
+    matches = [prefix for prefix in pricing if model.startswith(prefix)]
+    if not matches:
+        return None
+    input_price, output_price = pricing[max(matches, key=len)]
+    return (input_tokens * input_price + output_tokens * output_price) / 1e6
+
+def _fill_usage(usage: Optional[Dict], input_tokens, output_tokens):
+    """Record a provider's reported token counts into the caller's usage dict, if one was passed."""
+    if usage is not None:
+        usage['input_tokens'] = int(input_tokens or 0)
+        usage['output_tokens'] = int(output_tokens or 0)
+
+def call_claude(prompt: str, api_key: str, model: str, base_url: str = "https://api.anthropic.com",
+                timeout: float = DEFAULT_TIMEOUT, max_retries: int = DEFAULT_MAX_RETRIES,
+                usage: Optional[Dict] = None) -> str:
+    """Call Anthropic Claude API (token counts go into usage, if given)."""
+    response = post_json(
+        "claude",
+        f"{base_url}/v1/messages",
+        headers={
+            "x-api-key": api_key,
+            "anthropic-version": "2023-06-01",
+            "content-type": "application/json",
+        },
+        payload={
+            "model": model,
+            "max_tokens": 2000,
+            "messages": [{"role": "user", "content": prompt}]
+        },
+        timeout=timeout,
+        max_retries=max_retries
+    )
+    
+    if response.status_code == 200:
+        data = response.json()
+        _fill_usage(usage, data.get("usage", {}).get("input_tokens"), data.get("usage", {}).get("output_tokens"))
+        return data["content"][0]["text"]
+    else:
+        raise Exception(f"Claude API error: {response.status_code} - {response.text}")
+
+def call_openai(prompt: str, api_key: str, model: str, base_url: str = "https://api.openai.com",
+                timeout: float = DEFAULT_TIMEOUT, max_retries: int = DEFAULT_MAX_RETRIES,
+                usage: Optional[Dict] = None) -> str:
+    """Call OpenAI API (token counts go into usage, if given)."""
+    response = post_json(
+        "openai",
+        f"{base_url}/v1/chat/completions",
+        headers={
+            "Authorization": f"Bearer {api_key}",
+            "Content-Type": "application/json",
+        },
+        payload={
+            "model": model,
+            "messages": [{"role": "user", "content": prompt}],
+            "max_completion_tokens": 2000,
+        },
+        timeout=timeout,
+        max_retries=max_retries
+    )
+    
+    if response.status_code == 200:
+        data = response.json()
+        _fill_usage(usage, (data.get("usage") or {}).get("prompt_tokens"),
+                    (data.get("usage") or {}).get("completion_tokens"))
+        return data["choices"][0]["message"]["content"]
+    else:
+        raise Exception(f"OpenAI API error: {response.status_code} - {response.text}")
+
+def call_ollama(prompt: str, base_url: str, model: str,
+                timeout: float = DEFAULT_TIMEOUT, max_retries: int = DEFAULT_MAX_RETRIES,
+                usage: Optional[Dict] = None) -> str:
+    """Call local Ollama API (token counts go into usage, if given)."""
+    response = post_json(
+        "ollama",
+        f"{base_url}/api/generate",
+        payload={
+            "model": model,
+            "prompt": prompt,
+            "stream": False,
+        },
+        timeout=timeout,
+        max_retries=max_retries
+    )
+    
+    if response.status_code == 200:
+        data = response.json()
+        _fill_usage(usage, data.get("prompt_eval_count"), data.get("eval_count"))
+        return data["response"]
+    else:
+        raise Exception(f"Ollama API error: {response.status_code} - {response.text}")
+
+def _call_provider(prompt: str, config: Dict, usage: Optional[Dict] = None) -> str:
+    """Send the prompt to the configured provider over the network, through its scheduler."""
+    provider = config["provider"].lower()
+    timeout = config.get("request_timeout", DEFAULT_TIMEOUT)
+    max_retries = config.get("max_retries", DEFAULT_MAX_RETRIES)
+    usage = usage if usage is not None else {}
+    
+    with _scheduled_request(prompt, config, usage):
+        if provider == "claude":
+            return call_claude(prompt, config["anthropic_api_key"], config["claude_model"],
+                               config.get("anthropic_base_url", "https://api.anthropic.com"), timeout, max_retries,
+                               usage)
+        elif provider == "openai":
+            return call_openai(prompt, config["openai_api_key"], config["openai_model"],
+                               config.get("openai_base_url", "https://api.openai.com"), timeout, max_retries,
+                               usage)
+        elif provider == "ollama":
+            return call_ollama(prompt, config["ollama_base_url"], config["ollama_model"], timeout, max_retries,
+                               usage)
+        else:
+            raise ValueError(f"Unknown provider: {provider}")
+
+
+def _model_name(config: Dict) -> str:
+    provider = config["provider"].lower()
+    return config.get({"claude": "claude_model", "openai": "openai_model"}.get(provider, "ollama_model"), "")
+
+def call_llm(prompt: str, config: Dict, usage: Optional[Dict] = None) -> str:
+    """
+    Call the configured LLM provider, going through the response cache if one is set.
+    
+    Args:
+        prompt: The prompt to send
+        config: Configuration dictionary. Optional keys: 'request_timeout' (seconds),
+            'max_retries', 'anthropic_base_url' and 'openai_base_url'; 'llm_cache'
+            (cache file path), 'llm_cache_mode' ('readwrite' by default, 'replay' to
+            serve recorded responses without any network, or 'off'),
+            'llm_cache_max_age' (seconds) and 'llm_cache_max_bytes'; 'pricing'
+            overrides MODEL_PRICING; 'rate_limits', 'rate_limit_share',
+            'expected_output_tokens' and 'request_priority' (lower goes first)
+            control the provider's scheduler (see get_scheduler)
+        usage: Optional dict that receives 'provider', 'model', 'input_tokens',
+            'output_tokens', 'cost' (estimated USD) and 'cached'
+        
+    Returns:
+        LLM response text
+    
+    Raises:
+        CacheMissError: In replay mode, when the prompt was never recorded
+    """
+    mode = config.get("llm_cache_mode", "readwrite")
+    if mode not in CACHE_MODES:
+        raise ValueError(f"Unknown llm_cache_mode: {mode}")
+    cache = get_response_cache(config)
+    if cache is None:
+        if mode == "replay":
+            raise ValueError("llm_cache_mode 'replay' needs an 'llm_cache' file")
+        response = _call_provider(prompt, config, usage)
+        _finish_usage(usage, config, cached=False)
+        return response
+    
+    provider, model = config["provider"].lower(), _model_name(config)
+    response = cache.get(provider, model, prompt)
+    if response is not None:
+        _finish_usage(usage, config, cached=True)
+        return response
+    if mode == "replay":
+        raise CacheMissError(f"No recorded {provider} response for this prompt in {cache.path}")
+    response = _call_provider(prompt, config, usage)
+    _finish_usage(usage, config, cached=False)
+    cache.put(provider, model, prompt, response)
+    return response
+
+def _finish_usage(usage: Optional[Dict], config: Dict, cached: bool):
+    """Complete a usage dict with provider, model and estimated cost (cached responses cost nothing)."""
+    if usage is None:
+        return
+    if cached:
+        usage['input_tokens'] = usage['output_tokens'] = 0
+    provider, model = config["provider"].lower(), _model_name(config)
+    usage.setdefault('input_tokens', 0)
+    usage.setdefault('output_tokens', 0)
+    usage.update({
+        'provider': provider,
+        'model': model,
+        'cached': cached,
+        'cost': estimate_cost(provider, model, usage['input_tokens'], usage['output_tokens'], config.get('pricing'))
+    })
@@ -8,6 +8,7 @@ lab_utils_common
 """
 import copy
 import math
+import time
 import numpy as np
 import matplotlib.pyplot as plt
 from matplotlib.patches import FancyArrowPatch
@@ -75,20 +76,96 @@ def compute_gradient(X, y, w, b):
       dj_dw (ndarray Shape (n,)): The gradient of the cost w.r.t. the parameters w.
       dj_db (scalar):             The gradient of the cost w.r.t. the parameter b.
     """
-    m,n = X.shape           #(number of examples, number of features)
-    dj_dw = np.zeros((n,))
-    dj_db = 0.
-
-    for i in range(m):
-        err = (np.dot(X[i], w) + b) - y[i]
-        for j in range(n):
-            dj_dw[j] = dj_dw[j] + err * X[i,j]
-        dj_db = dj_db + err
-    dj_dw = dj_dw/m
-    dj_db = dj_db/m
+    m = X.shape[0]
+    err   = (X @ w + b) - y              #(m,n)(n,)=(m,)
+    dj_dw = (X.T @ err)/m                #(n,m)(m,)=(n,)
+    dj_db = np.sum(err)/m                # scalar
 
     return dj_db,dj_dw
 
+class dataset_summary:
+    ''' Sufficient statistics of a univariate linear regression dataset
+    on init:
+        reduces x,y once to the count, the means and the centered second
+        moments. Raw sums (sum_x, sum_x2, sum_y, sum_xy, sum_y2) are derived
+        from these. Large datasets can be added chunk by chunk with update().
+    afterwards:
+        cost(w,b) and gradient(w,b) are O(1) and accept arrays of w,b.
+        compute_cost/compute_gradient take (x, y, w, b) like the
+        f_compute_cost/f_compute_gradient callables of the plotting
+        routines and ignore x,y; compute_gradient returns (dj_dw, dj_db).
+    '''
+
+    def __init__(self, x=None, y=None):
+        self.m      = 0
+        self.x_mean = 0.
+        self.y_mean = 0.
+        self.sxx    = 0.     # sum((x-x_mean)^2)
+        self.sxy    = 0.     # sum((x-x_mean)*(y-y_mean))
+        self.syy    = 0.     # sum((y-y_mean)^2)
+        if x is not None:
+            self.update(x, y)
+
+    def update(self, x, y):
+        ''' merges a chunk of examples into the summary (pairwise update, numerically stable) '''
+        x = np.asarray(x, dtype=float).reshape(-1)
+        y = np.asarray(y, dtype=float).reshape(-1)
+        m_b = x.shape[0]
+        if m_b == 0:
+            return self
+        x_mean_b = np.mean(x)
+        y_mean_b = np.mean(y)
+        dx = x - x_mean_b
+        dy = y - y_mean_b
+
+        m       = self.m + m_b
+        delta_x = x_mean_b - self.x_mean
+        delta_y = y_mean_b - self.y_mean
+        weight  = self.m * m_b / m
+        self.sxx    = self.sxx + np.dot(dx, dx) + delta_x * delta_x * weight
+        self.sxy    = self.sxy + np.dot(dx, dy) + delta_x * delta_y * weight
+        self.syy    = self.syy + np.dot(dy, dy) + delta_y * delta_y * weight
+        self.x_mean = self.x_mean + delta_x * m_b / m
+        self.y_mean = self.y_mean + delta_y * m_b / m
+        self.m      = m
+        return self
+
+    @property
+    def sum_x(self):  return self.m * self.x_mean
+    @property
+    def sum_y(self):  return self.m * self.y_mean
+    @property
+    def sum_x2(self): return self.sxx + self.m * self.x_mean**2
+    @property
+    def sum_xy(self): return self.sxy + self.m * self.x_mean * self.y_mean
+    @property
+    def sum_y2(self): return self.syy + self.m * self.y_mean**2
+
+    def cost(self, w, b):
+        ''' cost J(w,b); w,b may be scalars or broadcastable arrays '''
+        w = np.asarray(w, dtype=float)
+        b = np.asarray(b, dtype=float)
+        # sum((w*x+b-y)^2) = m*(w*x_mean+b-y_mean)^2 + w^2*sxx - 2*w*sxy + syy
+        offset = w * self.x_mean + b - self.y_mean
+        cost = (self.m * offset**2 + (w**2) * self.sxx - 2 * w * self.sxy + self.syy) / (2 * self.m)
+        return np.maximum(cost, 0)     # clip round-off below the minimum
+
+    def gradient(self, w, b):
+        ''' gradient (dj_dw, dj_db) at (w,b); w,b may be scalars or broadcastable arrays '''
+        w = np.asarray(w, dtype=float)
+        b = np.asarray(b, dtype=float)
+        dj_db = w * self.x_mean + b - self.y_mean
+        dj_dw = (w * self.sxx - self.sxy) / self.m + dj_db * self.x_mean
+        return dj_dw, dj_db
+
+    def compute_cost(self, x, y, w, b):
+        ''' drop-in f_compute_cost, x and y are ignored '''
+        return self.cost(w, b)
+
+    def compute_gradient(self, x, y, w, b):
+        ''' drop-in f_compute_gradient, x and y are ignored '''
+        return self.gradient(w, b)
+
 def predict_logistic(X, w, b):
     """ performs prediction """
     return sigmoid(X @ w + b)
@@ -99,7 +176,7 @@ def predict_linear(X, w, b):
 
 def compute_cost_logistic(X, y, w, b, lambda_=0, safe=False):
     """
-    Computes cost using logistic loss, non-matrix version
+    Computes cost using logistic loss, vectorized over examples
 
     Args:
       X (ndarray): Shape (m,n)  matrix of examples with n features
@@ -112,22 +189,18 @@ def compute_cost_logistic(X, y, w, b, lambda_=0, safe=False):
       cost (scalar): cost
     """
 
-    m,n = X.shape
-    cost = 0.0
-    for i in range(m):
-        z_i    = np.dot(X[i],w) + b                                             #(n,)(n,) or (n,) ()
-        if safe:  #avoids overflows
-            cost += -(y[i] * z_i ) + log_1pexp(z_i)
-        else:
-            f_wb_i = sigmoid(z_i)                                                   #(n,)
-            cost  += -y[i] * np.log(f_wb_i) - (1 - y[i]) * np.log(1 - f_wb_i)       # scalar
+    m = X.shape[0]
+    z = X @ w + b                                                               #(m,n)(n,)=(m,)
+    if safe:  #avoids overflows
+        cost = np.sum(-(y * z) + log_1pexp(z))                                  # scalar
+    else:
+        f_wb = sigmoid(z)                                                       #(m,)
+        cost = np.sum(-y * np.log(f_wb) - (1 - y) * np.log(1 - f_wb))           # scalar
     cost = cost/m
 
     reg_cost = 0
     if lambda_ != 0:
-        for j in range(n):
-            reg_cost += (w[j]**2)                                               # scalar
-        reg_cost = (lambda_/(2*m))*reg_cost
+        reg_cost = (lambda_/(2*m))*np.sum(w**2)                                 # scalar
 
     return cost + reg_cost
 
@@ -211,10 +284,212 @@ def compute_gradient_matrix(X, y, w, b, logistic=False, lambda_=0):
 
     return dj_db, dj_dw                                           # scalar, (n,1)
 
-def gradient_descent(X, y, w_in, b_in, alpha, num_iters, logistic=False, lambda_=0, verbose=True, Trace=True):
+def compute_cost_gradient_matrix(X, y, w, b, logistic=False, lambda_=0, safe=True):
+    """
+    Computes the cost and the gradient together from a single prediction
+
+    Args:
+      X : (ndarray, Shape (m,n))          matrix of examples
+      y : (ndarray  Shape (m,) or (m,1))  target value of each example
+      w : (ndarray  Shape (n,) or (n,1))  Values of parameters of the model
+      b : (scalar )                       Values of parameter of the model
+      logistic: (boolean)                 linear if false, logistic if true
+      lambda_:  (float)                   applies regularization if non-zero
+      safe : (boolean)                    True-selects under/overflow safe logistic cost
+    Returns
+      total_cost: (scalar)                cost, as compute_cost_matrix
+      dj_db: (scalar)                     The gradient of the cost w.r.t. the parameter b
+      dj_dw: (array_like Shape (n,1))     The gradient of the cost w.r.t. the parameters w
+    """
+    m = X.shape[0]
+    y = y.reshape(-1,1)             # ensure 2D
+    w = w.reshape(-1,1)             # ensure 2D
+
+    z = X @ w + b                                                               # (m,n)(n,1) = (m,1)
+    if logistic:
+        f_wb = sigmoid(z)                                                       # (m,1)
+        if safe:  #safe from overflow
+            cost = np.sum(-(y * z) + log_1pexp(z))/m                            # scalar
+        else:
+            cost = -np.sum(y * np.log(f_wb) + (1-y) * np.log(1-f_wb))/m         # scalar
+    else:
+        f_wb = z
+        cost = (1/(2*m)) * np.sum((f_wb - y)**2)                                # scalar
+
+    err   = f_wb - y                                              # (m,1)
+    dj_dw = (1/m) * (X.T @ err)                                   # (n,m)(m,1) = (n,1)
+    dj_db = (1/m) * np.sum(err)                                   # scalar
+
+    total_cost = cost + (lambda_/(2*m)) * np.sum(w**2)            # scalar
+    dj_dw += (lambda_/m) * w        # regularize                  # (n,1)
+
+    return total_cost, dj_db, dj_dw                               # scalar, scalar, (n,1)
+
+class history_recorder:
+    ''' Cost and parameter history backed by preallocated NumPy arrays
+    on init:
+        capacity: (int)   maximum number of stored records, memory stays bounded by it
+        strategy: (str)   which iterations are kept
+            'all'       the first capacity iterations
+            'every'     every k-th iteration (k = every) until full
+            'decimate'  the whole run at uniform spacing; when full, every other
+                        record is dropped and the spacing doubles
+            'log'       geometrically spaced iterations (factor ratio), dense early;
+                        when full, every other record is dropped and ratio squared
+            'reservoir' a uniform random sample of the whole run (seed)
+        ratio:     (float) spacing factor of 'log'; by default derived from capacity
+                          and num_iters so that the kept records span the whole run
+        num_iters: (int)   expected number of calls to record, if known
+        keep_last: (bool) always include the most recent record
+    record(i, cost, w, b) is called once per iteration.
+    J_hist (k,), p_hist (k,n+1) with columns w..., b, and iters (k,) are returned
+    in iteration order and can be handed straight to the plotting routines.
+    '''
+
+    strategies = ('all', 'every', 'decimate', 'log', 'reservoir')
+
+    def __init__(self, capacity=100000, strategy='all', every=1, ratio=None, seed=None, keep_last=True,
+                 num_iters=None):
+        if strategy not in self.strategies:
+            raise ValueError(f"Unknown strategy: {strategy}")
+        self.capacity  = int(capacity)
+        self.strategy  = strategy
+        self.every     = int(every)
+        if ratio is None:
+            ratio = self.log_ratio(self.capacity, num_iters) if num_iters else 1.05
+        self.ratio     = ratio
+        self.keep_last = keep_last
+        self.count     = 0          # stored records
+        self.seen      = 0          # calls to record
+        self.stride    = self.every if strategy == 'every' else 1
+        self._next     = 0          # next call index kept by 'log'
+        self._rng      = np.random.default_rng(seed)
+        self._iters    = None
+        self._J        = None
+        self._p        = None
+        self._last     = None
+
+    @staticmethod
+    def _log_count(ratio, num_iters, limit):
+        ''' calls kept by 'log' out of num_iters, counting stops past limit '''
+        # every call is kept while k*(ratio-1) <= 1, skip that dense start
+        k = min(num_iters, max(0, math.floor(1/(ratio - 1)) - 1)) if ratio > 1 else num_iters
+        count = k
+        while k < num_iters and count <= limit:
+            count += 1
+            k = max(k + 1, math.ceil(k * ratio))
+        return count
+
+    @classmethod
+    def log_ratio(cls, capacity, num_iters):
+        ''' smallest 'log' ratio that keeps at most capacity of num_iters calls '''
+        if num_iters <= capacity:
+            return 1.0
+        lo, hi = 1.0, float(num_iters)
+        for _ in range(50):
+            mid = math.sqrt(lo * hi)
+            if cls._log_count(mid, num_iters, capacity) <= capacity:
+                hi = mid
+            else:
+                lo = mid
+        return hi
+
+    def _alloc(self, n):
+        self._iters = np.empty(self.capacity, dtype=np.int64)
+        self._J     = np.empty(self.capacity)
+        self._p     = np.empty((self.capacity, n+1))
+
+    def _halve(self):
+        ''' drops every other stored record '''
+        keep = (self.count + 1) // 2
+        self._iters[:keep] = self._iters[:self.count:2]
+        self._J[:keep]     = self._J[:self.count:2]
+        self._p[:keep]     = self._p[:self.count:2]
+        self.count = keep
+
+    def _slot(self, k):
+        ''' storage slot for the k-th call to record, None if it is not kept '''
+        full = self.count >= self.capacity
+        if self.strategy == 'reservoir':
+            if not full:
+                return self.count
+            j = self._rng.integers(0, k+1)
+            return j if j < self.capacity else None
+        if self.strategy == 'decimate':
+            if k % self.stride != 0:
+                return None
+            if full:
+                self._halve()
+                self.stride = self.stride * 2
+                if k % self.stride != 0:
+                    return None
+            return self.count
+        if self.strategy == 'log':
+            if k < self._next:
+                return None
+            if full:
+                self._halve()
+                self.ratio = self.ratio**2
+            self._next = max(k + 1, math.ceil(k * self.ratio))
+            return self.count
+        if full:
+            return None
+        if self.strategy == 'every' and k % self.stride != 0:
+            return None
+        return self.count
+
+    def record(self, i, cost, w, b):
+        ''' records cost and parameters of iteration i if the strategy keeps it '''
+        if self._J is None:
+            self._alloc(np.size(w))
+        slot = self._slot(self.seen)
+        self.seen += 1
+        if slot is not None:
+            self._iters[slot] = i
+            self._J[slot]     = cost
+            self._p[slot,:-1] = np.ravel(w)
+            self._p[slot,-1]  = b
+            if slot == self.count:
+                self.count += 1
+        if self.keep_last:
+            self._last = (i, cost, w, b)
+
+    def _arrays(self):
+        if self._J is None:
+            return np.zeros(0, dtype=np.int64), np.zeros(0), np.zeros((0,2))
+        k = self.count
+        iters, J, p = self._iters[:k], self._J[:k], self._p[:k]
+        if self.strategy == 'reservoir':
+            order = np.argsort(iters, kind='stable')
+            iters, J, p = iters[order], J[order], p[order]
+        if self._last is not None and (k == 0 or self._last[0] != iters[-1]):
+            i, cost, w, b = self._last
+            iters = np.append(iters, i)
+            J     = np.append(J, cost)
+            p     = np.vstack([p, np.append(np.ravel(w), b)])
+        return iters, J, p
+
+    @property
+    def iters(self):
+        return self._arrays()[0]
+
+    @property
+    def J_hist(self):
+        return self._arrays()[1]
+
+    @property
+    def p_hist(self):
+        return self._arrays()[2]
+
+    def __len__(self):
+        return len(self._arrays()[1])
+
+def gradient_descent(X, y, w_in, b_in, alpha, num_iters, logistic=False, lambda_=0, verbose=True, Trace=True,
+                     tol_grad=None, tol_cost=None, max_time=None, return_info=False, history=None):
     """
     Performs batch gradient descent to learn theta. Updates theta by taking
-    num_iters gradient steps with learning rate alpha
+    up to num_iters gradient steps with learning rate alpha, stopping early
+    when one of the optional stopping criteria is met
 
     Args:
       X (ndarray):    Shape (m,n)         matrix of examples
@@ -224,33 +499,53 @@ def gradient_descent(X, y, w_in, b_in, alpha, num_iters, logistic=False, lambda_
       logistic: (boolean)                 linear if false, logistic if true
       lambda_:  (float)                   applies regularization if non-zero
       alpha (float):                      Learning rate
-      num_iters (int):                    number of iterations to run gradient descent
+      num_iters (int):                    maximum number of iterations to run gradient descent
+      tol_grad (float):                   stop when the gradient norm drops to or below this value
+      tol_cost (float):                   stop when the relative cost change of a step drops to or below this value
+      max_time (float):                   stop after this many seconds of wall-clock time
+      return_info (boolean):              if true, also return a dict describing the run
+      history (history_recorder):         records cost and parameters; default keeps up to
+                                          100,000 iterations when Trace is true
 
     Returns:
       w (ndarray): Shape (n,) or (n,1)    Updated values of parameters; matches incoming shape
       b (scalar):                         Updated value of parameter
+      J_history (list):                   cost after each iteration; when a history recorder is
+                                          passed, its ndarray history.J_hist (recorded iterations only)
+      info (dict):                        only if return_info; 'iterations' actually run,
+                                          'stop_reason' ('num_iters', 'tol_grad', 'tol_cost' or
+                                          'max_time'), final 'cost' and 'elapsed' seconds
     """
-    # An array to store cost J and w's at each iteration primarily for graphing later
-    J_history = []
+    # Preallocated store for cost J and w's at each iteration primarily for graphing later
+    own_history = history is None
+    if history is None and Trace:
+        history = history_recorder(capacity=min(num_iters, 100000), keep_last=False)  # prevent resource exhaustion
     w = copy.deepcopy(w_in)  #avoid modifying global w within function
     b = b_in
     w = w.reshape(-1,1)      #prep for matrix operations
     y = y.reshape(-1,1)
-    last_cost = np.Inf
+    last_cost = np.inf
+    stop_reason = "num_iters"
+    iters_run = 0
+    start = time.perf_counter()
 
-    for i in range(num_iters):
+    # Cost at the starting point and gradient for the first step
+    prev_cost, dj_db, dj_dw = compute_cost_gradient_matrix(X, y, w, b, logistic, lambda_)
+    ccost = prev_cost
 
-        # Calculate the gradient and update the parameters
-        dj_db,dj_dw = compute_gradient_matrix(X, y, w, b, logistic, lambda_)
+    for i in range(num_iters):
 
         # Update Parameters using w, b, alpha and gradient
         w = w - alpha * dj_dw
         b = b - alpha * dj_db
 
-        # Save cost J at each iteration
-        ccost = compute_cost_matrix(X, y, w, b, logistic, lambda_)
-        if Trace and i<100000:      # prevent resource exhaustion
-            J_history.append( ccost )
+        # Cost J at the new parameters and the gradient for the next step share one prediction
+        ccost, dj_db, dj_dw = compute_cost_gradient_matrix(X, y, w, b, logistic, lambda_)
+        iters_run = i + 1
+
+        # Save cost J and parameters at each iteration
+        if history is not None:
+            history.record(i, ccost, w, b)
 
         # Print cost every at intervals 10 times or as many iterations if < 10
         if i% math.ceil(num_iters / 10) == 0:
@@ -262,7 +557,204 @@ def gradient_descent(X, y, w_in, b_in, alpha, num_iters, logistic=False, lambda_
                 print(f" alpha now {alpha}")
             last_cost = ccost
 
-    return w.reshape(w_in.shape), b, J_history  #return final w,b and J history for graphing
+        # Stopping criteria
+        if tol_grad is not None and np.sqrt(dj_db**2 + np.sum(dj_dw**2)) <= tol_grad:
+            stop_reason = "tol_grad"
+        elif tol_cost is not None and abs(prev_cost - ccost) <= tol_cost * abs(prev_cost):
+            stop_reason = "tol_cost"
+        elif max_time is not None and time.perf_counter() - start >= max_time:
+            stop_reason = "max_time"
+        if stop_reason != "num_iters":
+            if verbose: print(f"Stopped after {iters_run} iterations ({stop_reason}): Cost {ccost}")
+            break
+        prev_cost = ccost
+
+    w = w.reshape(w_in.shape)
+    if not own_history:
+        J_history = history.J_hist
+    else:
+        J_history = history.J_hist.tolist() if history is not None else []   # a list, as before recorders
+    if return_info:
+        info = dict(iterations=iters_run, stop_reason=stop_reason, cost=ccost,
+                    elapsed=time.perf_counter() - start)
+        return w, b, J_history, info
+    return w, b, J_history  #return final w,b and J history for graphing
+
+def iter_minibatches(X, y, batch_size, shuffle=True, rng=None):
+    """
+    Yields mini-batches of in-memory or memory-mapped arrays for one epoch
+
+    Args:
+      X (ndarray):    Shape (m,n)         matrix of examples, may be a np.memmap
+      y (ndarray):    Shape (m,) or (m,1) target value of each example
+      batch_size (int):                   examples per batch, 1 gives stochastic updates
+      shuffle (boolean):                  randomize the order of examples. In-memory arrays get a
+                                          full permutation; a np.memmap keeps contiguous batches and
+                                          only shuffles their order so reads stay sequential
+      rng (Generator):                    random source for shuffling
+    Yields:
+      X_batch, y_batch (ndarray):         at most batch_size examples each
+    """
+    m = X.shape[0]
+    starts = np.arange(0, m, batch_size)
+    if shuffle:
+        rng = np.random.default_rng() if rng is None else rng
+        if not isinstance(X, np.memmap):
+            idx = rng.permutation(m)
+            for start in starts:
+                batch = idx[start:start+batch_size]
+                yield X[batch], y[batch]
+            return
+        starts = rng.permutation(starts)
+    for start in starts:
+        yield np.asarray(X[start:start+batch_size]), np.asarray(y[start:start+batch_size])
+
+def gradient_descent_minibatch(data, w_in, b_in, alpha, num_epochs, batch_size=32, logistic=False, lambda_=0,
+                               shuffle=True, seed=None, verbose=True, history=None, return_info=False):
+    """
+    Performs mini-batch or stochastic gradient descent over a chunked data source.
+    Each update uses one batch only, so the time per update does not grow with the
+    size of the dataset and the data never has to fit in memory at once.
+
+    Args:
+      data:                               one of
+                                          (X, y) arrays, e.g. a np.memmap, batched with iter_minibatches
+                                          a callable returning an iterable of (X_batch, y_batch) for one
+                                          epoch, e.g. a generator function reading chunks from disk
+                                          an iterable of (X_batch, y_batch), consumed once (one epoch)
+      w_in (ndarray): Shape (n,) or (n,1) Initial values of parameters of the model
+      b_in (scalar):                      Initial value of parameter of the model
+      alpha (float):                      Learning rate
+      num_epochs (int):                   number of passes over the data
+      batch_size (int):                   examples per update for (X, y) data, 1 gives SGD
+      logistic: (boolean)                 linear if false, logistic if true
+      lambda_:  (float)                   applies regularization if non-zero, per batch
+      shuffle (boolean):                  shuffle (X, y) data every epoch
+      seed (int):                         seed for shuffling
+      history (history_recorder):         records the batch cost before each update;
+                                          default keeps a decimated history of 10,000 updates
+      return_info (boolean):              if true, also return a dict describing the run
+
+    Returns:
+      w (ndarray): Shape (n,) or (n,1)    Updated values of parameters; matches incoming shape
+      b (scalar):                         Updated value of parameter
+      J_history (ndarray):                recorded batch costs (history.J_hist)
+      info (dict):                        only if return_info; 'epochs', 'updates', 'examples'
+                                          and 'elapsed' seconds
+    """
+    if isinstance(data, tuple):
+        X, y = data
+        rng = np.random.default_rng(seed)
+        epoch_batches = lambda: iter_minibatches(X, y, batch_size, shuffle, rng)
+    elif callable(data):
+        epoch_batches = data
+    else:
+        if num_epochs > 1:
+            raise ValueError("an iterable data source can be consumed once, pass a callable for multiple epochs")
+        epoch_batches = lambda: data
+
+    if history is None:
+        history = history_recorder(capacity=10000, strategy='decimate')
+    w = copy.deepcopy(w_in)  #avoid modifying global w within function
+    b = b_in
+    w = w.reshape(-1,1)      #prep for matrix operations
+    updates = 0
+    examples = 0
+    cost = np.inf
+    start = time.perf_counter()
+
+    for epoch in range(num_epochs):
+        for X_batch, y_batch in epoch_batches():
+            X_batch = np.asarray(X_batch, dtype=float)
+            if X_batch.ndim == 1:
+                X_batch = X_batch.reshape(-1, w.shape[0])
+            y_batch = np.asarray(y_batch, dtype=float).reshape(-1,1)
+
+            # Batch cost and gradient from one prediction, then update the parameters
+            cost, dj_db, dj_dw = compute_cost_gradient_matrix(X_batch, y_batch, w, b, logistic, lambda_)
+            history.record(updates, cost, w, b)
+            w = w - alpha * dj_dw
+            b = b - alpha * dj_db
+
+            updates  += 1
+            examples += X_batch.shape[0]
+
+        # Print at most 10 times
+        if verbose and epoch % math.ceil(num_epochs / 10) == 0:
+            print(f"Epoch {epoch:4d}: last batch cost {cost}   ")
+
+    w = w.reshape(w_in.shape)
+    if return_info:
+        info = dict(epochs=num_epochs, updates=updates, examples=examples,
+                    elapsed=time.perf_counter() - start)
+        return w, b, history.J_hist, info
+    return w, b, history.J_hist
+
+def gradient_descent_sweep(X, y, w_in, b_in, alphas, num_iters, logistic=False, lambda_=0, Trace=True):
+    """
+    Runs K gradient descent runs side by side, one per learning rate and/or
+    initial point. The parameter vectors are stacked into an (n,K) matrix so
+    each iteration is a single matrix multiply for all runs.
+
+    Args:
+      X (ndarray):    Shape (m,n) or (m,)   matrix of examples
+      y (ndarray):    Shape (m,) or (m,1)   target value of each example
+      w_in (ndarray): Shape (n,) or (n,K)   initial parameters, shared or one column per run
+      b_in (scalar or ndarray (K,)):        initial value(s) of parameter b
+      alphas (scalar or ndarray (K,)):      learning rate(s)
+      num_iters (int):                      number of iterations to run gradient descent
+      logistic: (boolean)                   linear if false, logistic if true
+      lambda_:  (float)                     applies regularization if non-zero
+      Trace (boolean):                      record histories (up to 100,000 iterations)
+
+    Returns:
+      W (ndarray): Shape (n,K)              final parameters of every run
+      B (ndarray): Shape (K,)               final b of every run
+      J_hist (ndarray): Shape (T,K)         cost after each iteration
+      p_hist (ndarray): Shape (T,K,n+1)     [w..., b] after each iteration; p_hist[:,k] and
+                                            J_hist[:,k] are the history of run k, as used by
+                                            plt_divergence and plotly_plt_divergence
+    """
+    X = np.asarray(X, dtype=float)
+    if X.ndim == 1:
+        X = X.reshape(-1,1)
+    m, n = X.shape
+    y = np.asarray(y, dtype=float).reshape(-1,1)                       # (m,1)
+    W = np.asarray(w_in, dtype=float).reshape(n,-1)                    # (n,1) or (n,K)
+    B = np.asarray(b_in, dtype=float).reshape(-1)
+    alphas = np.asarray(alphas, dtype=float).reshape(-1)
+    K = max(W.shape[1], B.shape[0], alphas.shape[0])
+    W = np.broadcast_to(W, (n,K)).copy()
+    B = np.broadcast_to(B, (K,)).copy()
+    alphas = np.broadcast_to(alphas, (K,))
+
+    T = min(num_iters, 100000) if Trace else 0                         # prevent resource exhaustion
+    J_hist = np.empty((T,K))
+    p_hist = np.empty((T,K,n+1))
+
+    with np.errstate(over='ignore', invalid='ignore'):                 # diverging runs overflow to inf/nan
+        Z = X @ W + B                                                  # (m,n)(n,K) = (m,K)
+        for i in range(num_iters):
+            F     = sigmoid(Z) if logistic else Z                      # (m,K)
+            err   = F - y                                              # (m,K)
+            dj_dw = (X.T @ err)/m + (lambda_/m) * W                    # (n,K)
+            dj_db = np.sum(err, axis=0)/m                              # (K,)
+
+            W = W - alphas * dj_dw
+            B = B - alphas * dj_db
+
+            # Prediction at the new parameters gives the cost now and the gradient next iteration
+            Z = X @ W + B
+            if i < T:
+                if logistic:
+                    cost = np.sum(-(y * Z) + log_1pexp(Z), axis=0)/m
+                else:
+                    cost = np.sum((Z - y)**2, axis=0)/(2*m)
+                J_hist[i] = cost + (lambda_/(2*m)) * np.sum(W**2, axis=0)
+                p_hist[i,:,:n] = W.T
+                p_hist[i,:,n]  = B
+
+    return W, B, J_hist, p_hist
 
 def zscore_normalize_features(X):
     """
@@ -7,7 +7,7 @@ from matplotlib.ticker import MaxNLocator
 from matplotlib.gridspec import GridSpec
 from matplotlib.colors import LinearSegmentedColormap
 from ipywidgets import interact
-from lab_utils_common import compute_cost
+from lab_utils_common import compute_cost, dataset_summary, history_recorder
 from lab_utils_common import dlblue, dlorange, dldarkred, dlmagenta, dlpurple, dlcolors
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
@@ -63,6 +63,25 @@ def mk_cost_lines(x,y,w,b, ax):
 # Cost lab
 ##########
 
+def compute_cost_grid(x, y, w, b):
+    """
+    Computes the cost J(w,b) for many (w,b) pairs in one pass.
+    The data is reduced once to a dataset_summary, after which every
+    (w,b) costs O(1), independent of grid size.
+    Args:
+      x (ndarray (m,)): Data, m examples
+      y (ndarray (m,)): target values
+      w (scalar or ndarray): model parameter(s), broadcastable with b
+      b (scalar or ndarray): model parameter(s), broadcastable with w
+    Returns
+      cost (ndarray): cost for every (w,b), shape of np.broadcast(w,b)
+    """
+    return dataset_summary(x, y).cost(w, b)
+
+def _is_vectorized(f):
+    ''' True if f is a dataset_summary method and can take arrays of w,b '''
+    return isinstance(getattr(f, '__self__', None), dataset_summary)
+
 
 def plt_intuition(x_train, y_train):
 
@@ -119,11 +138,8 @@ def plt_stationary(x_train, y_train):
 
     # get cost for w,b ranges for contour and 3D
     tmp_b,tmp_w = np.meshgrid(b_space,w_space)
-    z=np.zeros_like(tmp_b)
-    for i in range(tmp_w.shape[0]):
-        for j in range(tmp_w.shape[1]):
-            z[i,j] = compute_cost(x_train, y_train, tmp_w[i][j], tmp_b[i][j] )
-            if z[i,j] == 0: z[i,j] = 1e-6
+    z = compute_cost_grid(x_train, y_train, tmp_w, tmp_b)
+    z[z == 0] = 1e-6
 
     w0=200;b=-100    #initial point
     ### plot model w cost ###
@@ -247,14 +263,20 @@ def inbounds(a,b,xlim,ylim):
         return True
     return False
 
+def _hist_arrays(p_hist, J_hist=None):
+    ''' w, b and cost arrays from a history_recorder or from [w,b] and cost sequences '''
+    if isinstance(p_hist, history_recorder):
+        J_hist = p_hist.J_hist
+        p_hist = p_hist.p_hist
+    p = np.asarray(p_hist, dtype=float)
+    J = None if J_hist is None else np.asarray(J_hist, dtype=float)
+    return p[:,0], p[:,-1], J
+
 def plt_contour_wgrad(x, y, hist, ax, w_range=[-100, 500, 5], b_range=[-500, 500, 5],
                 contours = [0.1,50,1000,5000,10000,25000,50000],
                       resolution=5, w_final=200, b_final=100,step=10 ):
     b0,w0 = np.meshgrid(np.arange(*b_range),np.arange(*w_range))
-    z=np.zeros_like(b0)
-    for i in range(w0.shape[0]):
-        for j in range(w0.shape[1]):
-            z[i][j] = compute_cost(x, y, w0[i][j], b0[i][j] )
+    z = compute_cost_grid(x, y, w0, b0)
 
     CS = ax.contour(w0, b0, z, contours, linewidths=2,
                    colors=[dlblue, dlorange, dldarkred, dlmagenta, dlpurple])
@@ -265,10 +287,12 @@ def plt_contour_wgrad(x, y, hist, ax, w_range=[-100, 500, 5], b_range=[-500, 500
     ax.hlines(b, ax.get_xlim()[0],w, lw=2, color=dlpurple, ls='dotted')
     ax.vlines(w, ax.get_ylim()[0],b, lw=2, color=dlpurple, ls='dotted')
 
+    w_hist, b_hist, _ = _hist_arrays(hist)
+    hist = np.column_stack([w_hist, b_hist])
     base = hist[0]
     for point in hist[0::step]:
         edist = np.sqrt((base[0] - point[0])**2 + (base[1] - point[1])**2)
-        if(edist > resolution or point==hist[-1]):
+        if(edist > resolution or np.array_equal(point, hist[-1])):
             if inbounds(point,base, ax.get_xlim(),ax.get_ylim()):
                 plt.annotate('', xy=point, xytext=base,xycoords='data',
                          arrowprops={'arrowstyle': '->', 'color': 'r', 'lw': 3},
@@ -278,14 +302,8 @@ def plt_contour_wgrad(x, y, hist, ax, w_range=[-100, 500, 5], b_range=[-500, 500
 
 
 def plt_divergence(p_hist, J_hist, x_train,y_train):
-
-    x=np.zeros(len(p_hist))
-    y=np.zeros(len(p_hist))
-    v=np.zeros(len(p_hist))
-    for i in range(len(p_hist)):
-        x[i] = p_hist[i][0]
-        y[i] = p_hist[i][1]
-        v[i] = J_hist[i]
+    ''' p_hist may be a history_recorder, J_hist is then ignored '''
+    x, y, v = _hist_arrays(p_hist, J_hist)
 
     fig = plt.figure(figsize=(12,5))
     plt.subplots_adjust( wspace=0 )
@@ -299,11 +317,7 @@ def plt_divergence(p_hist, J_hist, x_train,y_train):
     # Print w vs cost to see minimum
     fix_b = 100
     w_array = np.arange(-70000, 70000, 1000, dtype="int64")
-    cost = np.zeros_like(w_array,float)
-
-    for i in range(len(w_array)):
-        tmp_w = w_array[i]
-        cost[i] = compute_cost(x_train, y_train, tmp_w, fix_b)
+    cost = compute_cost_grid(x_train, y_train, w_array, fix_b)
 
     ax.plot(w_array, cost)
     ax.plot(x,v, c=dlmagenta)
@@ -319,10 +333,7 @@ def plt_divergence(p_hist, J_hist, x_train,y_train):
     tmp_b,tmp_w = np.meshgrid(np.arange(-35000, 35000, 500),np.arange(-70000, 70000, 500))
     tmp_b = tmp_b.astype('int64')
     tmp_w = tmp_w.astype('int64')
-    z=np.zeros_like(tmp_b,float)
-    for i in range(tmp_w.shape[0]):
-        for j in range(tmp_w.shape[1]):
-            z[i][j] = compute_cost(x_train, y_train, tmp_w[i][j], tmp_b[i][j] )
+    z = compute_cost_grid(x_train, y_train, tmp_w, tmp_b)
 
     ax = fig.add_subplot(gs[2:], projection='3d')
     ax.plot_surface(tmp_w, tmp_b, z,  alpha=0.3, color=dlblue)
@@ -363,11 +374,13 @@ def plt_gradients(x_train,y_train, f_compute_cost, f_compute_gradient):
     fix_b = 100
     w_array = np.linspace(-100, 500, 50)
     w_array = np.linspace(0, 400, 50)
-    cost = np.zeros_like(w_array)
-
-    for i in range(len(w_array)):
-        tmp_w = w_array[i]
-        cost[i] = f_compute_cost(x_train, y_train, tmp_w, fix_b)
+    if _is_vectorized(f_compute_cost):
+        cost = f_compute_cost(x_train, y_train, w_array, fix_b)
+    else:
+        cost = np.zeros_like(w_array)
+        for i in range(len(w_array)):
+            tmp_w = w_array[i]
+            cost[i] = f_compute_cost(x_train, y_train, tmp_w, fix_b)
     ax[0].plot(w_array, cost,linewidth=1)
     ax[0].set_title("Cost vs w, with gradient; b set to 100")
     ax[0].set_ylabel('Cost')
@@ -385,11 +398,14 @@ def plt_gradients(x_train,y_train, f_compute_cost, f_compute_gradient):
     #===============
 
     tmp_b,tmp_w = np.meshgrid(np.linspace(-200, 200, 10), np.linspace(-100, 600, 10))
-    U = np.zeros_like(tmp_w)
-    V = np.zeros_like(tmp_b)
-    for i in range(tmp_w.shape[0]):
-        for j in range(tmp_w.shape[1]):
-            U[i][j], V[i][j] = f_compute_gradient(x_train, y_train, tmp_w[i][j], tmp_b[i][j] )
+    if _is_vectorized(f_compute_gradient):
+        U, V = f_compute_gradient(x_train, y_train, tmp_w, tmp_b)
+    else:
+        U = np.zeros_like(tmp_w)
+        V = np.zeros_like(tmp_b)
+        for i in range(tmp_w.shape[0]):
+            for j in range(tmp_w.shape[1]):
+                U[i][j], V[i][j] = f_compute_gradient(x_train, y_train, tmp_w[i][j], tmp_b[i][j] )
     X = tmp_w
     Y = tmp_b
     n=-2
@@ -430,12 +446,8 @@ def plotly_stationary(x_train, y_train):
 
     # Get cost for w,b ranges for contour and 3D
     tmp_b, tmp_w = np.meshgrid(b_space, w_space)
-    z = np.zeros_like(tmp_b)
-    for i in range(tmp_w.shape[0]):
-        for j in range(tmp_w.shape[1]):
-            z[i,j] = compute_cost(x_train, y_train, tmp_w[i][j], tmp_b[i][j])
-            if z[i,j] == 0: 
-                z[i,j] = 1e-6
+    z = compute_cost_grid(x_train, y_train, tmp_w, tmp_b)
+    z[z == 0] = 1e-6
 
     w0 = 200
     b0 = -100  # initial point
@@ -880,12 +892,8 @@ def plotly_stationary_interactive(x_train, y_train):
 
     # Get cost for w,b ranges for contour and 3D
     tmp_b, tmp_w = np.meshgrid(b_space, w_space)
-    z = np.zeros_like(tmp_b)
-    for i in range(tmp_w.shape[0]):
-        for j in range(tmp_w.shape[1]):
-            z[i,j] = compute_cost(x_train, y_train, tmp_w[i][j], tmp_b[i][j])
-            if z[i,j] == 0: 
-                z[i,j] = 1e-6
+    z = compute_cost_grid(x_train, y_train, tmp_w, tmp_b)
+    z[z == 0] = 1e-6
 
     w0 = 200
     b0 = -100  # initial point
@@ -1065,11 +1073,13 @@ def plotly_plt_gradients(x_train, y_train, f_compute_cost, f_compute_gradient):
     # Compute cost for range of w values (b fixed at 100)
     fix_b = 100
     w_array = np.linspace(0, 400, 50)
-    cost = np.zeros_like(w_array)
-
-    for i in range(len(w_array)):
-        tmp_w = w_array[i]
-        cost[i] = f_compute_cost(x_train, y_train, tmp_w, fix_b)
+    if _is_vectorized(f_compute_cost):
+        cost = f_compute_cost(x_train, y_train, w_array, fix_b)
+    else:
+        cost = np.zeros_like(w_array)
+        for i in range(len(w_array)):
+            tmp_w = w_array[i]
+            cost[i] = f_compute_cost(x_train, y_train, tmp_w, fix_b)
 
     # Plot cost curve
     fig.add_trace(
@@ -1196,21 +1206,28 @@ def plotly_plt_gradients_surface(x_train, y_train, f_compute_cost, f_compute_gra
 
     # Get cost for w,b ranges for contour and 3D
     tmp_b, tmp_w = np.meshgrid(b_space, w_space)
-    z = np.zeros_like(tmp_b)
-    for i in range(tmp_w.shape[0]):
-        for j in range(tmp_w.shape[1]):
-            z[i,j] = f_compute_cost(x_train, y_train, tmp_w[i][j], tmp_b[i][j])
-            if z[i,j] == 0:
-                z[i,j] = 1e-6
+    if _is_vectorized(f_compute_cost):
+        z = f_compute_cost(x_train, y_train, tmp_w, tmp_b)
+        z[z == 0] = 1e-6
+    else:
+        z = np.zeros_like(tmp_b)
+        for i in range(tmp_w.shape[0]):
+            for j in range(tmp_w.shape[1]):
+                z[i,j] = f_compute_cost(x_train, y_train, tmp_w[i][j], tmp_b[i][j])
+                if z[i,j] == 0:
+                    z[i,j] = 1e-6
 
     # Create gradient vector field
     tmp_b_grad, tmp_w_grad = np.meshgrid(np.linspace(-200, 200, 12), np.linspace(-100, 600, 12))
-    U = np.zeros_like(tmp_w_grad)  # dj_dw components
-    V = np.zeros_like(tmp_b_grad)  # dj_db components
+    if _is_vectorized(f_compute_gradient):
+        U, V = f_compute_gradient(x_train, y_train, tmp_w_grad, tmp_b_grad)
+    else:
+        U = np.zeros_like(tmp_w_grad)  # dj_dw components
+        V = np.zeros_like(tmp_b_grad)  # dj_db components
 
-    for i in range(tmp_w_grad.shape[0]):
-        for j in range(tmp_w_grad.shape[1]):
-            U[i][j], V[i][j] = f_compute_gradient(x_train, y_train, tmp_w_grad[i][j], tmp_b_grad[i][j])
+        for i in range(tmp_w_grad.shape[0]):
+            for j in range(tmp_w_grad.shape[1]):
+                U[i][j], V[i][j] = f_compute_gradient(x_train, y_train, tmp_w_grad[i][j], tmp_b_grad[i][j])
 
     # Flatten arrays for plotting
     X = tmp_w_grad.flatten()
@@ -1363,7 +1380,7 @@ def plotly_plt_contour_wgrad(x, y, hist, w_range=[-100, 500, 5], b_range=[-500,
         Training data features
     y : array-like
         Training data targets
-    hist : list
+    hist : list, ndarray or history_recorder
         History of [w,b] parameters during gradient descent
     w_range : list
         [start, stop, step] for w axis
@@ -1387,10 +1404,7 @@ def plotly_plt_contour_wgrad(x, y, hist, w_range=[-100, 500, 5], b_range=[-500,
     """
     # Create meshgrid
     b0, w0 = np.meshgrid(np.arange(*b_range), np.arange(*w_range))
-    z = np.zeros_like(b0)
-    for i in range(w0.shape[0]):
-        for j in range(w0.shape[1]):
-            z[i][j] = compute_cost(x, y, w0[i][j], b0[i][j])
+    z = compute_cost_grid(x, y, w0, b0)
 
     # Create figure
     fig = go.Figure()
@@ -1432,10 +1446,12 @@ def plotly_plt_contour_wgrad(x, y, hist, w_range=[-100, 500, 5], b_range=[-500,
     ))
 
     # Add gradient descent path with arrows
+    w_hist, b_hist, _ = _hist_arrays(hist)
+    hist = np.column_stack([w_hist, b_hist])
     base = hist[0]
     for point in hist[0::step]:
         edist = np.sqrt((base[0] - point[0])**2 + (base[1] - point[1])**2)
-        if edist > resolution or point == hist[-1]:
+        if edist > resolution or np.array_equal(point, hist[-1]):
             # Check if in bounds
             if (w_range[0] <= point[0] <= w_range[1] and
                 b_range[0] <= point[1] <= b_range[1] and
@@ -1483,10 +1499,10 @@ def plotly_plt_divergence(p_hist, J_hist, x_train, y_train):
 
     Parameters:
     -----------
-    p_hist : list
+    p_hist : list, ndarray or history_recorder
         History of [w,b] parameters
-    J_hist : list
-        History of cost values
+    J_hist : list or ndarray
+        History of cost values (ignored when p_hist is a history_recorder)
     x_train : array-like
         Training data features
     y_train : array-like
@@ -1498,9 +1514,7 @@ def plotly_plt_divergence(p_hist, J_hist, x_train, y_train):
         Interactive plotly figure with two subplots
     """
     # Extract w, b, cost from history
-    x = np.array([p[0] for p in p_hist])  # w values
-    y = np.array([p[1] for p in p_hist])  # b values
-    v = np.array(J_hist)  # cost values
+    x, y, v = _hist_arrays(p_hist, J_hist)  # w values, b values, cost values
 
     # Determine adaptive ranges based on the actual path
     w_min, w_max = x.min(), x.max()
@@ -1535,11 +1549,7 @@ def plotly_plt_divergence(p_hist, J_hist, x_train, y_train):
     fix_b = 100
     w_array_step = max(int(w_range_size / 100), 1)
     w_array = np.arange(int(w_plot_min), int(w_plot_max), w_array_step)
-    cost = np.zeros_like(w_array, float)
-
-    for i in range(len(w_array)):
-        tmp_w = w_array[i]
-        cost[i] = compute_cost(x_train, y_train, tmp_w, fix_b)
+    cost = compute_cost_grid(x_train, y_train, w_array, fix_b)
 
     # Plot cost curve
     fig.add_trace(
@@ -1573,10 +1583,7 @@ def plotly_plt_divergence(p_hist, J_hist, x_train, y_train):
         np.arange(int(b_plot_min), int(b_plot_max), b_step),
         np.arange(int(w_plot_min), int(w_plot_max), w_step)
     )
-    z = np.zeros_like(tmp_b, float)
-    for i in range(tmp_w.shape[0]):
-        for j in range(tmp_w.shape[1]):
-            z[i][j] = compute_cost(x_train, y_train, tmp_w[i][j], tmp_b[i][j])
+    z = compute_cost_grid(x_train, y_train, tmp_w, tmp_b)
 
     # Add surface
     fig.add_trace(
@@ -1671,12 +1678,8 @@ def plotly_stationary_with_click(x_train, y_train):
 
     # Get cost for w,b ranges for contour and 3D
     tmp_b, tmp_w = np.meshgrid(b_space, w_space)
-    z = np.zeros_like(tmp_b)
-    for i in range(tmp_w.shape[0]):
-        for j in range(tmp_w.shape[1]):
-            z[i,j] = compute_cost(x_train, y_train, tmp_w[i][j], tmp_b[i][j])
-            if z[i,j] == 0:
-                z[i,j] = 1e-6
+    z = compute_cost_grid(x_train, y_train, tmp_w, tmp_b)
+    z[z == 0] = 1e-6
 
     if not use_widgets:
         # Return static version if ipywidgets not available
@@ -0,0 +1,53 @@
+"""
+CI smoke benchmark: drives run_autonomous_discovery against the local mock LLM
+server for every provider and mode, without network access.
+Run from this directory with `python -m pytest -q`.
+"""
+import os
+import sys
+
+import matplotlib
+matplotlib.use('Agg')
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import discovery_benchmark as bench
+
+# Generous bound for one HTTP attempt to the mock at ~0 latency; the Nagle /
+# delayed-ACK stall on reused keep-alive connections showed up as ~40 ms
+MAX_ATTEMPT_P50 = 0.02
+
+@pytest.fixture(scope="module")
+def reports():
+    return bench.run_benchmark(runs=2, latency={'dist': 'constant', 'value': 0.0001}, chunk_delay=0.0)
+
+def test_every_scenario_reaches_the_fit(reports):
+    assert {(r['provider'], r['mode']) for r in reports} == {
+        (provider, mode) for provider in bench.PROVIDER_PATHS for mode in bench.MODES}
+    for rep in reports:
+        assert rep['iterations'] > 0
+        assert rep['iterations_to_fit']['success_rate'] == 1.0, (rep['provider'], rep['mode'])
+
+def test_report_has_stage_percentiles(reports):
+    for rep in reports:
+        for stage in ('prompt', 'request', 'parse', 'evaluate', 'total'):
+            pct = rep['stages'][stage]
+            assert pct['p50'] is not None and pct['p50'] <= pct['p95'] <= pct['p99']
+        assert rep['throughput']['iterations_per_s'] > 0
+
+def test_streaming_reports_time_to_first_score(reports):
+    for rep in reports:
+        if rep['mode'] == 'stream':
+            assert rep['time_to_first_score']['p50'] is not None
+
+def test_mock_adds_no_transport_stall(reports):
+    for rep in reports:
+        assert rep['http']['p50'] < MAX_ATTEMPT_P50, (rep['provider'], rep['mode'], rep['http'])
+
+def test_transient_errors_are_retried():
+    reports = bench.run_benchmark(providers=('claude',), modes=('plain',), runs=1, error_rate=0.3,
+                                  latency={'dist': 'constant', 'value': 0.0}, chunk_delay=0.0)
+    rep = reports[0]
+    assert rep['http']['retries'] > 0
+    assert rep['iterations_to_fit']['success_rate'] == 1.0
@@ -0,0 +1,619 @@
+"""
+Tests for discovery_methods that run without network access.
+Run from this directory with `python -m pytest -q`.
+"""
+import collections
+import os
+import sys
+import threading
+import warnings
+
+import matplotlib
+matplotlib.use('Agg')
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import discovery_methods as dm
+import discovery_transport
+
+##########################################################
+# Replicates
+##########################################################
+
+def test_replicates_do_not_depend_on_chunking():
+    # Spans several noise blocks, so chunks straddle block boundaries
+    num_points = 2 * dm.REPLICATE_BLOCK + 300
+    t, A_noisy, A_true = dm.generate_replicates('logistic', num_replicates=4, num_points=num_points, seed=7)
+    for chunk_points in (1, 64, 999, dm.REPLICATE_BLOCK, num_points, 10 * num_points):
+        t_c, A_c, A_true_c = dm.generate_replicates('logistic', num_replicates=4, num_points=num_points, seed=7,
+                                                    chunk_points=chunk_points)
+        assert dm.np.array_equal(t_c, t) and dm.np.array_equal(A_true_c, A_true)
+        assert dm.np.array_equal(A_c, A_noisy), chunk_points
+    chunks = list(dm.iter_replicate_chunks('logistic', num_replicates=4, num_points=1000, seed=7, chunk_points=300))
+    assert [len(c[0]) for c in chunks] == [300, 300, 300, 100]
+    assert dm.np.array_equal(dm.np.concatenate([c[1] for c in chunks], axis=1),
+                             dm.generate_replicates('logistic', num_replicates=4, num_points=1000, seed=7)[1])
+
+def test_replicates_seed_reproducible():
+    _, first, _ = dm.generate_replicates(num_replicates=3, num_points=50, seed=11)
+    _, again, _ = dm.generate_replicates(num_replicates=3, num_points=50, seed=11)
+    _, other, _ = dm.generate_replicates(num_replicates=3, num_points=50, seed=12)
+    assert dm.np.array_equal(first, again) and not dm.np.array_equal(first, other)
+
+def test_replicate_rows_do_not_depend_on_their_count():
+    _, few, _ = dm.generate_replicates(num_replicates=2, num_points=50, seed=3, chunk_points=16)
+    _, many, _ = dm.generate_replicates(num_replicates=5, num_points=50, seed=3)
+    assert dm.np.array_equal(many[:2], few)
+    assert not dm.np.array_equal(many[0], many[1])
+
+##########################################################
+# Equation compiler
+##########################################################
+
+@pytest.mark.parametrize("equation,kind", [
+    ('__import__("os").system("ls")', 'unsupported'),
+    ('__import__("os")', 'unsupported'),
+    ('t.__class__', 'unsupported'),
+    ('__builtins__', 'unsupported'),
+    ('np.random.rand(t)', 'unsupported'),
+    ('math.system(t)', 'unsupported'),
+    ('(lambda: 1)()', 'unsupported'),
+    ('t[0]', 'unsupported'),
+    ('exp(t, t)', 'unsupported'),
+    ('1000 *', 'syntax'),
+])
+def test_compiler_rejects_unsafe_equations(equation, kind):
+    with pytest.raises(dm.EquationError) as excinfo:
+        dm.compile_equation(equation)
+    assert excinfo.value.kind == kind
+    assert dm.evaluate_equation(equation, dm.np.arange(3.0)) is None
+
+def test_compiler_overflow_gives_inf_without_warnings():
+    with warnings.catch_warnings():
+        warnings.simplefilter('error')
+        values = dm.compile_equation('exp(1000 * t)')(dm.np.arange(3.0))
+        result = dm.score_equation('exp(1000 * t)', dm.np.arange(3.0), dm.np.ones(3))
+    assert values[0] == 1.0 and dm.np.all(dm.np.isinf(values[1:]))
+    assert result['r_squared'] == -dm.np.inf
+
+@pytest.mark.parametrize("raw,normalized", [
+    ('A = 1000 × e^(0.08t)', '1000 * e**(0.08*t)'),
+    ('A(t) = 2·t² − 3', '2*t**2 - 3'),
+    ('`1000 ÷ (1 + 9e^(-0.5t))`', '1000 / (1 + 9*e**(-0.5*t))'),
+    ('1e-3t + 2(t + 1)', '1e-3*t + 2*(t + 1)'),
+    ('3 sin(2t)', '3*sin(2*t)'),
+])
+def test_normalize_equation(raw, normalized):
+    assert dm.normalize_equation(raw) == normalized
+    t = dm.np.linspace(0, 5, 6)
+    assert dm.np.allclose(dm.compile_equation(raw)(t), dm.compile_equation(normalized)(t))
+
+def test_compiled_equations_are_cached_by_normalized_text():
+    first = dm.compile_equation('A = 1000 * exp(0.08 * t)')
+    hits = dm._compile_normalized.cache_info().hits
+    assert dm.compile_equation('  1000 * exp(0.08 * t)  ') is first
+    assert dm._compile_normalized.cache_info().hits == hits + 1
+
+@pytest.mark.parametrize("equation", ['A = 1000', 't'])
+def test_compiled_result_is_a_writable_copy(equation):
+    t = dm.np.arange(4.0)
+    compiled = dm.compile_equation(equation)
+    values = compiled(t)
+    assert values.shape == t.shape and values.flags.writeable
+    values += 1
+    assert dm.np.array_equal(compiled(t), dm.np.full(4, 1000.0) if equation == 'A = 1000' else dm.np.arange(4.0))
+    assert dm.np.array_equal(t, dm.np.arange(4.0))
+
+##########################################################
+# refine_constants
+##########################################################
+
+def test_refine_recovers_the_rate_of_a_known_law():
+    t, A_block, _ = dm.generate_replicates('compound_interest', {'rate': 0.07}, 1, 30, noise_level=0.02, seed=0)
+    refined = dm.refine_constants(dm.compile_equation("1000 * exp(0.05 * t)"), t, A_block[0])
+    principal, rate = refined['constants']
+    assert rate == pytest.approx(0.07, abs=1e-3)
+    assert principal == pytest.approx(1000, rel=0.01)
+    assert refined['equation'].startswith("1001.14 * exp(0.0701")
+    assert refined['sse'] == pytest.approx(dm.np.sum((A_block[0] - refined['predictions']) ** 2))
+    assert 0 < refined['iterations'] < 50
+
+def test_refine_fits_exponents_only_when_asked():
+    t, A_block, _ = dm.generate_replicates('power', None, 1, 30, noise_level=0.0, seed=0)
+    compiled = dm.compile_equation("100 * t**2")
+    assert compiled.exponents == (1,)
+    kept = dm.refine_constants(compiled, t, A_block[0])
+    assert kept['constants'][1] == 2.0 and kept['sse'] > 1.0
+    fitted = dm.refine_constants(compiled, t, A_block[0], fit_exponents=True)
+    assert fitted['constants'] == pytest.approx((100.0, 1.5), rel=1e-6)
+    assert fitted['sse'] < 1e-6
+
+def test_refine_leaves_equations_without_free_constants():
+    t = dm.np.linspace(0, 5, 10)
+    refined = dm.refine_constants(dm.compile_equation("exp(t)"), t, dm.np.ones(10))
+    assert refined['constants'] == () and refined['iterations'] == 0 and refined['equation'] == "exp(t)"
+
+##########################################################
+# Candidate scoring and ranking
+##########################################################
+
+RANKED_EQUATIONS = ("1000 * exp(0.08 * t)", "1000 + 200 * t", "1000 + 50 * t + 3 * t**2", "900 * exp(0.085 * t)")
+
+def reference_scores(y, predictions, size):
+    """The per-candidate path: calculate_r_squared and the textbook error and criteria formulas."""
+    n = len(y)
+    sse = dm.np.sum((y - predictions) ** 2)
+    return {'r_squared': dm.calculate_r_squared(y, predictions), 'rmse': dm.np.sqrt(sse / n),
+            'mae': dm.np.mean(dm.np.abs(y - predictions)), 'aic': n * dm.np.log(sse / n) + 2 * size,
+            'bic': n * dm.np.log(sse / n) + size * dm.np.log(n)}
+
+def test_score_candidates_matches_per_candidate_scores():
+    t, A_noisy, _ = dm.generate_compound_interest_data(noise_level=0.1, rng=dm.np.random.default_rng(6))
+    compiled = [dm.compile_equation(eq) for eq in RANKED_EQUATIONS]
+    P = dm.np.stack([c(t) for c in compiled] + [dm.np.full(len(t), dm.np.inf)])
+    sizes = [c.size for c in compiled] + [1]
+    scores = dm.score_candidates(A_noisy, P, sizes)
+    for j in range(len(compiled)):
+        reference = reference_scores(A_noisy, P[j], sizes[j])
+        for name, value in reference.items():
+            assert scores[name][j] == pytest.approx(value, rel=1e-10), name
+    assert scores['r_squared'][-1] == -dm.np.inf
+    assert all(scores[name][-1] == dm.np.inf for name in ('rmse', 'mae', 'aic', 'bic'))
+    assert dm.np.array_equal(dm.score_candidates(A_noisy, P[:2])['aic'] - scores['aic'][:2],
+                             2 * (1 - dm.np.array(sizes[:2], dtype=float)))
+
+@pytest.mark.parametrize("rank_by", ['r_squared', 'aic', 'bic'])
+def test_rank_results_orders_by_the_chosen_score(rank_by):
+    t, A_noisy, _ = dm.generate_compound_interest_data(noise_level=0.1, rng=dm.np.random.default_rng(6))
+    results = [dm.score_equation(eq, t, A_noisy, refine=False) for eq in RANKED_EQUATIONS + ("1000 *",)]
+    ranked = dm.rank_results(list(reversed(results)), A_noisy, rank_by)
+    assert ranked[-1]['equation'] == "1000 *"
+    assert all(ranked[-1][name] is None for name in ('rmse', 'mae', 'aic', 'bic'))
+    references = {}
+    for r in ranked[:-1]:
+        references[r['equation']] = reference = reference_scores(A_noisy, r['predictions'], r['size'])
+        assert r['r_squared'] == pytest.approx(reference['r_squared'], rel=1e-12)
+        for name in ('rmse', 'mae', 'aic', 'bic'):
+            assert r[name] == pytest.approx(reference[name], rel=1e-10), name
+    sign = -1 if rank_by == 'r_squared' else 1
+    expected = sorted(references, key=lambda eq: sign * references[eq][rank_by])
+    assert [r['equation'] for r in ranked[:-1]] == expected
+    with pytest.raises(ValueError):
+        dm.rank_results(results, A_noisy, 'mse')
+
+##########################################################
+# Validation
+##########################################################
+
+def test_kfold_masks_hold_out_every_point_once():
+    masks = dm.validation_masks(23, 'kfold', folds=5, seed=1)
+    assert masks.shape == (5, 23)
+    assert dm.np.array_equal(masks.sum(axis=0), dm.np.ones(23))
+    assert set(masks.sum(axis=1)) == {4, 5}
+    assert dm.np.array_equal(masks, dm.validation_masks(23, 'kfold', folds=5, seed=1))
+    assert dm.validation_masks(3, 'kfold', folds=5).shape == (3, 3)
+
+def test_holdout_mask_leaves_points_to_fit():
+    assert dm.validation_masks(20, 'holdout', holdout_fraction=0.25).sum() == 5
+    assert dm.validation_masks(4, 'holdout', holdout_fraction=0.9).sum() == 1
+    with pytest.raises(ValueError):
+        dm.validation_masks(20, 'loo')
+
+def test_validate_results_matches_refitting_each_fold():
+    t, A_noisy, _ = dm.generate_compound_interest_data(noise_level=0.05, rng=dm.np.random.default_rng(4))
+    masks = dm.validation_masks(len(t), 'kfold', folds=4)
+    results = [dm.score_equation(eq, t, A_noisy) for eq in
+               ("1000 * exp(0.05 * t)", "1000 + 100 * t", "t +")]
+    dm.validate_results(results, t, A_noisy, masks)
+    held_sse = dm.np.zeros(len(t))
+    for j, eq in enumerate(("1000 * exp(0.05 * t)", "1000 + 100 * t")):
+        compiled = dm.compile_equation(eq)
+        predictions = dm.np.empty(len(t))
+        for f, mask in enumerate(masks):
+            refined = dm.refine_constants(compiled, t[~mask], A_noisy[~mask])
+            predictions[mask] = compiled(t, refined['constants'])[mask]
+            fold_r_squared = dm.calculate_r_squared(A_noisy[mask], predictions[mask])
+            assert results[j]['fold_r_squared'][f] == pytest.approx(fold_r_squared, rel=1e-6, abs=1e-9)
+        assert results[j]['validated_r_squared'] == pytest.approx(dm.calculate_r_squared(A_noisy, predictions),
+                                                                  rel=1e-6)
+    assert results[2]['validated_r_squared'] is None and results[2]['fold_r_squared'] is None
+
+@pytest.mark.parametrize("validated,expected_iterations", [(None, 1), (0.5, 3)])
+def test_stopping_rule_uses_validated_r_squared(monkeypatch, validated, expected_iterations):
+    t, A_noisy, _ = dm.generate_compound_interest_data(noise_level=0.01, rng=dm.np.random.default_rng(5))
+    validate_results = dm.validate_results
+    def fake_validate(results, *args):
+        validate_results(results, *args)
+        for r in results:
+            r['validated_r_squared'] = validated if validated is not None else r['validated_r_squared']
+        return results
+    monkeypatch.setattr(dm, 'validate_results', fake_validate)
+    config = {'provider': 'local', 'max_iterations': 3, 'render': 'off', 'validation': 'kfold'}
+    iterations = dm.run_autonomous_discovery(t, A_noisy, config)
+    assert len(iterations) == expected_iterations
+    assert iterations[0]['r_squared'] > 0.99
+
+##########################################################
+# Local symbolic search
+##########################################################
+
+@pytest.mark.parametrize("law,expected", [('compound_interest', "1000 * exp(0.08 * t)"),
+                                          ('linear', "1000 + 250*t")])
+def test_symbolic_search_drops_redundant_terms(law, expected):
+    t, A_true, _ = dm.generate_replicates(law, num_replicates=1, num_points=20, noise_level=0.0, seed=0)
+    best = dm.symbolic_search(t, A_true[0])['candidates'][0]
+    assert best['equation'] == expected
+    assert best['num_params'] == 2 and best['r_squared'] == pytest.approx(1.0)
+
+@pytest.mark.parametrize("seed", range(3))
+def test_symbolic_search_candidates_are_distinct_and_pruned(seed):
+    t, A_noisy, _ = dm.generate_compound_interest_data(noise_level=0.05, rng=dm.np.random.default_rng(seed))
+    candidates = dm.symbolic_search(t, A_noisy)['candidates']
+    equations = [c['equation'] for c in candidates]
+    assert len(set(equations)) == len(equations)
+    bics = [c['bic'] for c in candidates]
+    assert bics == sorted(bics)
+    for equation in equations:
+        rates = [float(r) for r in dm.re.findall(r'(?:exp|sin|cos)\((-?[\d.e+-]+) \* t\)', equation)]
+        assert all(abs(r) > 1e-6 for r in rates), equation
+
+##########################################################
+# IncrementalParser
+##########################################################
+
+def feed_all(chunks):
+    """Feed chunks in order; returns the per-chunk results and the parser."""
+    parser = dm.IncrementalParser()
+    return [parser.feed(chunk) for chunk in chunks], parser
+
+@pytest.mark.parametrize("chunks", [
+    ["REASONING: grows\nEQUATION: 1000*exp(0.08*t)", "\nCONFIDENCE: High"],
+    ["REASONING: grows\nEQ", "UATION: 1000*exp(0.08", "*t)\n", "CONFIDENCE: High"],
+    ["EQUATION: 1000*exp(0.08*t) CONFIDENCE: High"],
+])
+def test_parser_reports_equation_once_complete(chunks):
+    results, parser = feed_all(chunks)
+    found = [r for r in results if r is not None]
+    assert found == ["1000*exp(0.08*t)"]
+    assert parser.equation == dm.parse_llm_response(parser.text)['equation']
+
+def test_parser_equation_on_line_after_label():
+    chunks = ["REASONING: grows\nEQUATION:\n", "A = 1000*exp(0.08*t)\n", "CONFIDENCE: High"]
+    results, parser = feed_all(chunks)
+    assert results == [None, "A = 1000*exp(0.08*t)", None]
+    assert parser.equation == dm.parse_llm_response(parser.text)['equation']
+
+def test_parser_waits_for_end_of_line():
+    results, parser = feed_all(["EQUATION:", "  \n", "1000*exp(0.08", "*t)"])
+    assert results == [None, None, None, None]
+    assert parser.feed("\n") == "1000*exp(0.08*t)"
+
+def test_stream_rescoring_waits_for_the_early_job(monkeypatch):
+    calls = []
+    def slow_score(equation, t, A_noisy, refine=True):
+        start = dm.time.perf_counter()
+        dm.time.sleep(0.2)
+        calls.append((equation, start, dm.time.perf_counter()))
+        return {'equation': equation}
+    def stream(prompt, config, usage=None):
+        yield "EQUATION: 1000*exp(0.08*t)\n"
+        yield "CONFIDENCE: High"
+    final = dict(dm.parse_llm_response("EQUATION: 1000*exp(0.08*t)"), equation="1000*exp(0.07*t)")
+    monkeypatch.setattr(dm, 'score_equation', slow_score)
+    monkeypatch.setattr(dm, 'stream_llm', stream)
+    monkeypatch.setattr(dm, 'parse_llm_response', lambda text: final)
+    start = dm.time.perf_counter()
+    result = dm.stream_and_evaluate("prompt", {}, None, None)
+    assert result['equation'] == "1000*exp(0.07*t)"
+    (early, _, early_end), (last, last_start, last_end) = calls
+    assert early == "1000*exp(0.08*t)" and last == "1000*exp(0.07*t)"
+    assert last_start >= early_end
+    # The first score reported is the returned equation's, not the discarded early one's
+    assert result['time_to_first_score'] == pytest.approx(last_end - start, abs=0.05)
+    assert result['timings']['evaluate'] == pytest.approx(0.4, abs=0.1)
+
+##########################################################
+# ProviderScheduler
+##########################################################
+
+def test_reconfigure_keeps_bucket_level():
+    scheduler = dm.ProviderScheduler('test', requests_per_minute=2)
+    scheduler.acquire()
+    scheduler.release()
+    scheduler.acquire()
+    scheduler.release()
+    now = dm.time.monotonic()
+    assert scheduler._wait_time(0, now) > 25
+    # Switching limits back and forth (e.g. a batch share and a direct call) must not refill the bucket
+    scheduler.configure(requests_per_minute=50)
+    scheduler.configure(requests_per_minute=2)
+    assert scheduler._wait_time(0, dm.time.monotonic()) > 25
+    scheduler.configure(requests_per_minute=1)
+    assert scheduler._requests.level <= 1
+
+def test_stream_usage_settles_token_reservation():
+    import discovery_benchmark as bench
+    with bench.MockLLMServer(chunk_delay=0.0) as server:
+        config = bench.mock_config('claude', server, rate_limits={'claude': {'tokens_per_minute': 100000}},
+                                   expected_output_tokens=5000)
+        scheduler = dm.get_scheduler('claude', config)
+        text = "".join(dm.stream_llm("EQUATION please", config))
+    # The 5000 reserved output tokens are refunded down to the small actual usage
+    assert text
+    assert scheduler._tokens.level > 100000 - 1000
+
+##########################################################
+# Telemetry
+##########################################################
+
+def test_summarize_usage_counts_failed_calls_separately():
+    done = {'input_tokens': 10, 'output_tokens': 5, 'provider': 'claude', 'model': 'm', 'cached': False, 'cost': 0.5}
+    assert dm.summarize_usage([done, done]) == {
+        'calls': 2, 'failed_calls': 0, 'cached_calls': 0, 'input_tokens': 20, 'output_tokens': 10, 'cost': 1.0}
+    usage = dm.summarize_usage([done, {}])
+    assert usage['calls'] == 1 and usage['failed_calls'] == 1
+    assert usage['input_tokens'] == 10 and usage['cost'] is None
+    assert dm.summarize_usage([])['cost'] == 0.0
+
+@pytest.mark.parametrize("mode", [{'stream': True}, {'stream': True, 'num_candidates': 3}])
+def test_streamed_stages_report_their_overlap(mode):
+    import discovery_benchmark as bench
+    t, A_noisy, _ = dm.generate_compound_interest_data(noise_level=0.02, rng=dm.np.random.default_rng(0))
+    with bench.MockLLMServer(chunk_delay=0.0) as server:
+        config = bench.mock_config('claude', server, max_iterations=2, **mode)
+        iterations = dm.run_autonomous_discovery(t, A_noisy, config)
+    for row in dm.telemetry_table(iterations):
+        assert row['overlap_s'] > 0
+        stages = sum(row[f"{stage}_s"] for stage in dm.TIMING_STAGES) - row['overlap_s']
+        assert stages <= row['total_s']
+        assert row['calls'] == mode.get('num_candidates', 1) and row['failed_calls'] == 0
+
+##########################################################
+# IterationRenderer
+##########################################################
+
+def test_file_renderer_survives_a_failed_plot(tmp_path, monkeypatch, capsys):
+    draw = dm._draw_iteration
+    def flaky_draw(ax, *item):
+        if item[-1] == 2:
+            raise ValueError("cannot draw")
+        draw(ax, *item)
+    monkeypatch.setattr(dm, '_draw_iteration', flaky_draw)
+    renderer = dm.IterationRenderer('file', str(tmp_path))
+    t = dm.np.linspace(0, 1, 5)
+    for i in (1, 2, 3):
+        renderer.plot(t, t, t, "t", 1.0, i)
+    renderer.close()
+    assert sorted(os.listdir(tmp_path)) == ["iteration_001.png", "iteration_003.png"]
+    assert [(i, str(e)) for i, e in renderer.errors] == [(2, "cannot draw")]
+    assert "Could not save the plot of iteration 2" in capsys.readouterr().out
+
+def test_renderer_closed_when_the_run_fails(tmp_path, monkeypatch):
+    closed = []
+    monkeypatch.setattr(dm.IterationRenderer, 'close', lambda self: closed.append(self.mode))
+    def broken(*args, **kwargs):
+        raise RuntimeError("evaluation failed")
+    monkeypatch.setattr(dm, 'evaluate_response', broken)
+    t, A_noisy, _ = dm.generate_compound_interest_data(noise_level=0.02, rng=dm.np.random.default_rng(0))
+    config = {'provider': 'local', 'max_iterations': 2, 'render': 'file', 'render_dir': str(tmp_path)}
+    with pytest.raises(RuntimeError):
+        dm.run_autonomous_discovery(t, A_noisy, config)
+    assert closed == ['file']
+
+def test_schedulers_are_keyed_by_their_limits():
+    direct = {'rate_limits': {'claude': {'requests_per_minute': 7, 'tokens_per_minute': 7000}}}
+    share = dict(direct, rate_limit_share=0.5)
+    first = dm.get_scheduler('claude', direct)
+    shared = dm.get_scheduler('claude', share)
+    assert shared is not first
+    assert dm.get_scheduler('claude', direct) is first
+    assert first.limits['requests_per_minute'] == 7 and shared.limits['requests_per_minute'] == 3.5
+    names = [name for name in dm.get_scheduler_stats() if name.startswith('claude')]
+    assert len(names) >= 2
+
+def test_retry_backoff_gives_up_the_request_slot(monkeypatch):
+    import discovery_benchmark as bench
+    limits = {'requests_per_minute': None, 'tokens_per_minute': 12345, 'max_in_flight': 1}
+    main = threading.current_thread()
+    real_sleep = dm.time.sleep
+    seen = []
+    def sleep(seconds):
+        if threading.current_thread() is main:
+            seen.append((scheduler.get_stats()['in_flight'], scheduler._tokens.level))
+        real_sleep(seconds)
+    with bench.MockLLMServer(error_rate=1.0, chunk_delay=0.0) as server:
+        config = bench.mock_config('claude', server, rate_limits={'claude': limits}, max_retries=1,
+                                   expected_output_tokens=100)
+        scheduler = dm.get_scheduler('claude', config)
+        monkeypatch.setattr(dm.time, 'sleep', sleep)
+        with pytest.raises(Exception):
+            dm.call_llm("EQUATION please", config)
+    # While backing off the request holds neither the in-flight slot nor its token reservation
+    assert seen and seen[0][0] == 0 and seen[0][1] > 12345 - 1
+    assert scheduler.get_stats()['in_flight'] == 0
+
+def test_yield_request_slot_lets_others_through():
+    config = {'provider': 'claude', 'expected_output_tokens': 10,
+              'rate_limits': {'claude': {'requests_per_minute': None, 'tokens_per_minute': 54321, 'max_in_flight': 1}}}
+    scheduler = dm.get_scheduler('claude', config)
+    got = threading.Event()
+    def other():
+        with scheduler.slot():
+            got.set()
+    with dm._scheduled_request("x", config):
+        with dm._yield_request_slot():
+            worker = threading.Thread(target=other, daemon=True)
+            worker.start()
+            assert got.wait(5)
+            worker.join()
+        assert scheduler.get_stats()['in_flight'] == 1
+    assert scheduler.get_stats()['in_flight'] == 0
+    with dm._yield_request_slot():       # no request on this thread: nothing to give up
+        pass
+
+##########################################################
+# Local fallback
+##########################################################
+
+@pytest.mark.parametrize("mode", [{}, {'stream': True}, {'num_candidates': 3}])
+@pytest.mark.parametrize("failure", ['unreachable', 'timeout'])
+def test_local_fallback_on_every_request_path(mode, failure, capsys):
+    import discovery_benchmark as bench
+    t, A_noisy, _ = dm.generate_compound_interest_data(noise_level=0.02, rng=dm.np.random.default_rng(0))
+    # The mock answers after 0.5 s, past the 0.1 s request timeout
+    with bench.MockLLMServer(latency={'dist': 'constant', 'value': 0.5}) as server:
+        config = bench.mock_config('claude', server, max_iterations=2, max_retries=0, request_timeout=0.1,
+                                   local_fallback=True, **mode)
+        if failure == 'unreachable':
+            config['anthropic_base_url'] = "http://127.0.0.1:9"      # nothing listens on the discard port
+        iterations = dm.run_autonomous_discovery(t, A_noisy, config)
+    assert "using the local symbolic search instead" in capsys.readouterr().out
+    assert iterations and iterations[0]['predictions'] is not None
+
+##########################################################
+# IterationRecord and TextStore
+##########################################################
+
+def local_run(max_iterations=3):
+    t, A_noisy, _ = dm.generate_compound_interest_data(noise_level=0.02, rng=dm.np.random.default_rng(1))
+    config = {'provider': 'local', 'max_iterations': max_iterations, 'render': 'off'}
+    return t, A_noisy, dm.run_autonomous_discovery(t, A_noisy, config)
+
+def test_records_read_like_iteration_dicts():
+    t, A_noisy, iterations = local_run()
+    record = iterations[0]
+    assert record['prompt'].startswith("You are a scientific AI agent")
+    assert "EQUATION:" in record['response']
+    assert record['reasoning'] and record['equation'] and record['confidence']
+    assert record['predictions'].shape == t.shape
+    assert record.get('candidates', []) == []
+    assert 'candidates' not in record and 'candidates' not in record.to_dict()
+    assert 'validated_r_squared' not in record
+    assert 'r_squared' in record and 'predictions' in record
+    assert dict(record)['equation'] == record.equation
+
+def test_record_predictions_use_full_precision_constants():
+    t, A_noisy, _ = dm.generate_compound_interest_data(noise_level=0.05, rng=dm.np.random.default_rng(3))
+    scored = dm.score_equation("1000 * exp(0.05 * t)", t, A_noisy)
+    assert scored['refined_equation'] is not None
+    record = dm.IterationRecord.from_dict(dict(scored, iteration=1), t)
+    assert dm.np.array_equal(record['predictions'], scored['predictions'])
+    assert dm.calculate_r_squared(A_noisy, record['predictions']) == scored['r_squared']
+    # The record survives a checkpoint round trip, where tuples become lists
+    restored = dm.IterationRecord.from_dict(dm.json.loads(dm.json.dumps(record.to_dict())), t)
+    assert dm.np.array_equal(restored['predictions'], scored['predictions'])
+
+def test_text_store_belongs_to_the_run():
+    import gc
+    import weakref
+    _, _, first = local_run()
+    _, _, second = local_run()
+    assert first[0].store is first[-1].store
+    assert first[0].store is not second[0].store
+    store = weakref.ref(first[0].store)
+    del first
+    gc.collect()
+    assert store() is None
+
+def test_text_store_clear():
+    _, _, iterations = local_run()
+    store = iterations[0].store
+    assert store.stats()['texts'] > 0
+    store.clear()
+    assert store.stats() == {'texts': 0, 'bytes': 0}
+    assert iterations[0]['prompt'] is None
+    assert iterations[0]['predictions'] is not None
+    # New texts get fresh ids, old records keep reading None
+    store.put("a new prompt")
+    assert iterations[0]['prompt'] is None
+
+def test_resumed_run_shares_the_store(tmp_path):
+    t, A_noisy, _ = dm.generate_compound_interest_data(noise_level=0.3, rng=dm.np.random.default_rng(2))
+    checkpoint = str(tmp_path / "run.jsonl")
+    config = {'provider': 'local', 'max_iterations': 1, 'render': 'off', 'checkpoint': checkpoint}
+    dm.run_autonomous_discovery(t, A_noisy, config)
+    recovered = dm.load_checkpoint(checkpoint, t)
+    iterations = dm.run_autonomous_discovery(t, A_noisy, dict(config, max_iterations=2), recovered)
+    assert len({id(it.store) for it in iterations}) == 1
+
+##########################################################
+# Call log
+##########################################################
+
+def test_call_log_is_bounded(monkeypatch):
+    import discovery_benchmark as bench
+    monkeypatch.setattr(discovery_transport, '_call_log', collections.deque(maxlen=5))
+    dm.reset_call_stats()
+    with bench.MockLLMServer(chunk_delay=0.0) as server:
+        config = bench.mock_config('claude', server)
+        for _ in range(8):
+            dm.call_llm("EQUATION please", config)
+    assert len(dm.get_call_stats()) == 5
+    assert dm.get_call_totals()['claude']['attempts'] == 8
+    dm.reset_call_stats()
+    assert dm.get_call_stats() == [] and dm.get_call_totals() == {}
+
+##########################################################
+# ResponseCache
+##########################################################
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(dm.time, 'time', lambda: now[0])
+    return now
+
+def test_cache_evicts_least_recently_used_by_utf8_bytes(tmp_path, clock):
+    cache = dm.ResponseCache(str(tmp_path / "cache.sqlite"), max_bytes=100)
+    for prompt in ["p1", "p2", "p3"]:
+        clock[0] += 1
+        cache.put("claude", "m", prompt, "é" * 15)     # 2 + 30 bytes, but only 17 characters
+    clock[0] += 1
+    assert cache.get("claude", "m", "p1") is not None
+    clock[0] += 1
+    cache.put("claude", "m", "p4", "é" * 15)
+    assert cache.get("claude", "m", "p2") is None
+    assert [cache.get("claude", "m", p) is not None for p in ("p1", "p3", "p4")] == [True, True, True]
+    cache.close()
+
+def test_cache_expires_old_entries(tmp_path, clock):
+    cache = dm.ResponseCache(str(tmp_path / "cache.sqlite"), max_age=60)
+    cache.put("claude", "m", "old", "response")
+    clock[0] += 30
+    cache.put("claude", "m", "new", "response")
+    clock[0] += 40
+    assert cache.get("claude", "m", "old") is None
+    assert cache.get("claude", "m", "new") == "response"
+    clock[0] += 31
+    cache.put("claude", "m", "newest", "response")
+    assert len(cache) == 1
+    cache.close()
+
+def test_replay_mode_serves_recorded_responses_only(tmp_path, monkeypatch):
+    config = {'provider': 'claude', 'claude_model': 'test-model', 'llm_cache': str(tmp_path / "cache.sqlite"),
+              'llm_cache_mode': 'replay'}
+    monkeypatch.setattr(discovery_transport, '_call_provider', lambda *args: pytest.fail("replay mode called the provider"))
+    dm.get_response_cache(config).put('claude', 'test-model', "recorded prompt", "EQUATION: 1000 * exp(0.08 * t)")
+    usage = {}
+    assert dm.call_llm("recorded prompt", config, usage) == "EQUATION: 1000 * exp(0.08 * t)"
+    assert usage['cached'] and usage['input_tokens'] == usage['output_tokens'] == 0
+    with pytest.raises(dm.CacheMissError):
+        dm.call_llm("new prompt", config)
+    with pytest.raises(dm.CacheMissError):
+        dm.call_llm("recorded prompt", dict(config, claude_model='other-model'))
+
+##########################################################
+# Batch discovery
+##########################################################
+
+def test_batch_dataset_leaves_the_global_rng_alone():
+    spec = {'name': 'seeded', 'law': 'compound_interest', 'noise_level': 0.1, 'num_points': 15, 'seed': 7}
+    config = {'provider': 'local', 'max_iterations': 1, 'render': 'off'}
+    dm.np.random.seed(123)
+    state = dm.np.random.get_state()[1].copy()
+    first = dm._run_batch_dataset(spec, config)
+    assert dm.np.array_equal(dm.np.random.get_state()[1], state)
+    second = dm._run_batch_dataset(spec, config)
+    assert first['error'] is None
+    assert (first['best_equation'], first['r_squared']) == (second['best_equation'], second['r_squared'])
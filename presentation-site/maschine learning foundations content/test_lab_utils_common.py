@@ -0,0 +1,321 @@
+"""
+Tests for lab_utils_common: the vectorized cost and gradient routines against
+the original per-sample loop versions on random data, the history recorder,
+and the gradient descent drivers.
+Run from this directory with `python -m pytest -q`.
+"""
+import os
+import sys
+
+import matplotlib
+matplotlib.use('Agg')
+import numpy as np
+import pytest
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+os.chdir(HERE)          # lab_utils_common loads ./leonteq.mplstyle on import
+
+import lab_utils_common as luc
+
+##########################################################
+# Loop reference implementations (the original versions)
+##########################################################
+
+def loop_compute_gradient(X, y, w, b):
+    m,n = X.shape
+    dj_dw = np.zeros((n,))
+    dj_db = 0.
+    for i in range(m):
+        err = (np.dot(X[i], w) + b) - y[i]
+        for j in range(n):
+            dj_dw[j] = dj_dw[j] + err * X[i,j]
+        dj_db = dj_db + err
+    return dj_db/m, dj_dw/m
+
+def loop_compute_cost_logistic(X, y, w, b, lambda_=0, safe=False):
+    m,n = X.shape
+    cost = 0.0
+    for i in range(m):
+        z_i = np.dot(X[i],w) + b
+        if safe:
+            cost += -(y[i] * z_i) + luc.log_1pexp(np.array([z_i]))[0]
+        else:
+            f_wb_i = luc.sigmoid(z_i)
+            cost  += -y[i] * np.log(f_wb_i) - (1 - y[i]) * np.log(1 - f_wb_i)
+    cost = cost/m
+    reg_cost = 0
+    if lambda_ != 0:
+        for j in range(n):
+            reg_cost += (w[j]**2)
+        reg_cost = (lambda_/(2*m))*reg_cost
+    return cost + reg_cost
+
+def loop_compute_cost_linear(X, y, w, b, lambda_=0):
+    m,n = X.shape
+    cost = 0.0
+    for i in range(m):
+        cost += (np.dot(X[i],w) + b - y[i])**2
+    reg_cost = 0.0
+    for j in range(n):
+        reg_cost += w[j]**2
+    return cost/(2*m) + (lambda_/(2*m))*reg_cost
+
+def loop_compute_gradient_full(X, y, w, b, logistic=False, lambda_=0):
+    m,n = X.shape
+    dj_dw = np.zeros((n,))
+    dj_db = 0.
+    for i in range(m):
+        f_wb_i = np.dot(X[i], w) + b
+        if logistic:
+            f_wb_i = luc.sigmoid(f_wb_i)
+        err = f_wb_i - y[i]
+        for j in range(n):
+            dj_dw[j] = dj_dw[j] + err * X[i,j]
+        dj_db = dj_db + err
+    dj_dw = dj_dw/m
+    for j in range(n):
+        dj_dw[j] = dj_dw[j] + (lambda_/m) * w[j]
+    return dj_db/m, dj_dw
+
+##########################################################
+# Fixtures
+##########################################################
+
+def make_data(m, n, logistic=False, scale=1.0, seed=0):
+    rng = np.random.default_rng(seed)
+    X = rng.normal(size=(m, n)) * scale
+    w = rng.normal(size=n)
+    b = float(rng.normal())
+    if logistic:
+        y = (rng.random(m) < 0.5).astype(float)
+    else:
+        y = X @ w + b + rng.normal(size=m)
+    return X, y, rng.normal(size=n), float(rng.normal())
+
+SHAPES = [(1, 1), (1, 5), (7, 3), (50, 12)]
+
+##########################################################
+# Tests
+##########################################################
+
+@pytest.mark.parametrize("m,n", SHAPES)
+def test_compute_cost_matches_loop(m, n):
+    X, y, w, b = make_data(m, n)
+    cost = luc.compute_cost(X, y, w, b)
+    ref  = loop_compute_cost_linear(X, y, w, b)
+    assert np.ndim(cost) == 0
+    np.testing.assert_allclose(cost, ref, rtol=1e-10)
+    np.testing.assert_allclose(luc.compute_cost_matrix(X, y, w, b), ref, rtol=1e-10)
+
+@pytest.mark.parametrize("shape", [(), (7,), (4, 3)])
+def test_sigmoid_matches_elementwise_formula(shape):
+    z = np.random.default_rng(1).normal(scale=10.0, size=shape)
+    g = luc.sigmoid(z)
+    assert np.shape(g) == shape
+    ref = np.vectorize(lambda v: 1.0 / (1.0 + np.exp(-v)))(z)
+    np.testing.assert_allclose(g, ref, rtol=1e-12)
+    np.testing.assert_allclose(luc.sigmoid(-z), 1 - g, atol=1e-12)
+
+def test_sigmoid_extreme_values():
+    with np.errstate(over='raise'):
+        g = luc.sigmoid(np.array([-1e5, -800.0, 0.0, 800.0, 1e5]))
+    assert np.all(np.isfinite(g))
+    np.testing.assert_allclose(g, [0.0, 0.0, 0.5, 1.0, 1.0], atol=1e-200)
+
+@pytest.mark.parametrize("m,n", SHAPES)
+def test_predict_matches_loop(m, n):
+    X, _, w, b = make_data(m, n)
+    ref = np.array([np.dot(X[i], w) + b for i in range(m)])
+    np.testing.assert_allclose(luc.predict_linear(X, w, b), ref, rtol=1e-12)
+    np.testing.assert_allclose(luc.predict_logistic(X, w, b), [luc.sigmoid(v) for v in ref], rtol=1e-12)
+
+@pytest.mark.parametrize("m,n", SHAPES)
+def test_compute_gradient_matches_loop(m, n):
+    X, y, w, b = make_data(m, n)
+    dj_db, dj_dw = luc.compute_gradient(X, y, w, b)
+    ref_db, ref_dw = loop_compute_gradient(X, y, w, b)
+    assert np.shape(dj_dw) == (n,)
+    np.testing.assert_allclose(dj_dw, ref_dw, rtol=1e-10, atol=1e-12)
+    np.testing.assert_allclose(dj_db, ref_db, rtol=1e-10, atol=1e-12)
+
+@pytest.mark.parametrize("m,n", SHAPES)
+@pytest.mark.parametrize("lambda_", [0, 0.7])
+@pytest.mark.parametrize("safe", [False, True])
+def test_compute_cost_logistic_matches_loop(m, n, lambda_, safe):
+    X, y, w, b = make_data(m, n, logistic=True)
+    cost = luc.compute_cost_logistic(X, y, w, b, lambda_=lambda_, safe=safe)
+    ref  = loop_compute_cost_logistic(X, y, w, b, lambda_=lambda_, safe=safe)
+    assert np.ndim(cost) == 0
+    np.testing.assert_allclose(cost, ref, rtol=1e-10)
+
+@pytest.mark.parametrize("m,n", [(1, 3), (40, 6)])
+@pytest.mark.parametrize("lambda_", [0, 1.5])
+def test_compute_cost_logistic_safe_extreme_logits(m, n, lambda_):
+    # |z| far beyond log_1pexp's switch-over at 20: the safe path must stay finite and exact
+    X, y, w, b = make_data(m, n, logistic=True, scale=200.0)
+    cost = luc.compute_cost_logistic(X, y, w, b, lambda_=lambda_, safe=True)
+    ref  = loop_compute_cost_logistic(X, y, w, b, lambda_=lambda_, safe=True)
+    assert np.isfinite(cost)
+    assert np.max(np.abs(X @ w + b)) > 20
+    np.testing.assert_allclose(cost, ref, rtol=1e-10)
+
+@pytest.mark.parametrize("m,n", SHAPES)
+@pytest.mark.parametrize("logistic", [False, True])
+@pytest.mark.parametrize("lambda_", [0, 0.3])
+def test_compute_cost_gradient_matrix_matches_loop(m, n, logistic, lambda_):
+    X, y, w, b = make_data(m, n, logistic=logistic)
+    cost, dj_db, dj_dw = luc.compute_cost_gradient_matrix(X, y, w, b, logistic, lambda_)
+    if logistic:
+        ref_cost = loop_compute_cost_logistic(X, y, w, b, lambda_=lambda_, safe=True)
+    else:
+        ref_cost = loop_compute_cost_linear(X, y, w, b, lambda_=lambda_)
+    ref_db, ref_dw = loop_compute_gradient_full(X, y, w, b, logistic, lambda_)
+    assert dj_dw.shape == (n, 1)
+    np.testing.assert_allclose(cost, ref_cost, rtol=1e-10, atol=1e-12)
+    np.testing.assert_allclose(dj_db, ref_db, rtol=1e-10, atol=1e-12)
+    np.testing.assert_allclose(dj_dw.reshape(-1), ref_dw, rtol=1e-10, atol=1e-12)
+
+@pytest.mark.parametrize("lambda_", [0, 2.0])
+def test_compute_cost_gradient_matrix_safe_extreme_logits(lambda_):
+    X, y, w, b = make_data(30, 4, logistic=True, scale=200.0, seed=3)
+    cost, dj_db, dj_dw = luc.compute_cost_gradient_matrix(X, y, w, b, logistic=True, lambda_=lambda_, safe=True)
+    ref_cost = loop_compute_cost_logistic(X, y, w, b, lambda_=lambda_, safe=True)
+    ref_db, ref_dw = loop_compute_gradient_full(X, y, w, b, True, lambda_)
+    assert np.isfinite(cost)
+    np.testing.assert_allclose(cost, ref_cost, rtol=1e-10)
+    np.testing.assert_allclose(dj_db, ref_db, rtol=1e-10, atol=1e-12)
+    np.testing.assert_allclose(dj_dw.reshape(-1), ref_dw, rtol=1e-10, atol=1e-12)
+
+@pytest.mark.parametrize("logistic", [False, True])
+def test_matrix_routines_agree(logistic):
+    X, y, w, b = make_data(25, 5, logistic=logistic, seed=7)
+    cost, dj_db, dj_dw = luc.compute_cost_gradient_matrix(X, y, w, b, logistic, 0.4)
+    np.testing.assert_allclose(cost, luc.compute_cost_matrix(X, y, w, b, logistic, 0.4), rtol=1e-12)
+    ref_db, ref_dw = luc.compute_gradient_matrix(X, y, w, b, logistic, 0.4)
+    np.testing.assert_allclose(dj_db, ref_db, rtol=1e-12)
+    np.testing.assert_allclose(dj_dw, ref_dw, rtol=1e-12)
+
+##########################################################
+# history_recorder
+##########################################################
+
+def record_run(history, num_iters):
+    for i in range(num_iters):
+        history.record(i, float(num_iters - i), np.zeros(2), 0.0)
+    return history
+
+@pytest.mark.parametrize("capacity,num_iters", [(10, 1000), (100, 5000), (1000, 200000)])
+def test_log_history_spans_the_run(capacity, num_iters):
+    history = record_run(luc.history_recorder(capacity, 'log', num_iters=num_iters, keep_last=False), num_iters)
+    iters = history.iters
+    assert len(iters) == history.count <= capacity
+    assert iters[0] == 0 and np.all(np.diff(iters) > 0)
+    assert iters[-1] >= num_iters / history.ratio - 1
+
+@pytest.mark.parametrize("capacity,num_iters", [(10, 1000), (50, 100000)])
+def test_log_history_thins_when_full(capacity, num_iters):
+    # num_iters unknown: the default ratio fills up and is coarsened instead of dropping the tail
+    history = record_run(luc.history_recorder(capacity, 'log', keep_last=False), num_iters)
+    iters = history.iters
+    assert len(iters) <= capacity
+    assert iters[0] == 0 and np.all(np.diff(iters) > 0)
+    assert iters[-1] >= num_iters / history.ratio - 1
+
+def test_log_history_keeps_last():
+    history = record_run(luc.history_recorder(10, 'log', num_iters=1000), 1000)
+    assert len(history) <= 11 and history.iters[-1] == 999 and history.J_hist[-1] == 1.0
+
+##########################################################
+# gradient_descent
+##########################################################
+
+def test_gradient_descent_returns_a_list_without_a_recorder():
+    X, y, w, b = make_data(30, 3, seed=8)
+    _, _, J_history = luc.gradient_descent(X, y, w, b, 0.05, 50, verbose=False)
+    assert isinstance(J_history, list) and len(J_history) == 50
+    J_history.append(0.0)
+    assert luc.gradient_descent(X, y, w, b, 0.05, 50, verbose=False, Trace=False)[2] == []
+    history = luc.history_recorder(50)
+    _, _, J_recorded = luc.gradient_descent(X, y, w, b, 0.05, 50, verbose=False, history=history)
+    assert isinstance(J_recorded, np.ndarray)
+    np.testing.assert_array_equal(J_recorded, J_history[:-1])
+
+##########################################################
+# gradient_descent_minibatch
+##########################################################
+
+def make_memmap(tmp_path, X):
+    X_map = np.memmap(tmp_path / "X.dat", dtype=float, mode='w+', shape=X.shape)
+    X_map[:] = X
+    X_map.flush()
+    return np.memmap(tmp_path / "X.dat", dtype=float, mode='r', shape=X.shape)
+
+def test_memmap_batches_stay_contiguous_in_shuffled_order(tmp_path):
+    X, y, _, _ = make_data(95, 3, seed=9)
+    X_map = make_memmap(tmp_path, X)
+    batches = list(luc.iter_minibatches(X_map, y, 10, shuffle=True, rng=np.random.default_rng(0)))
+    assert len(batches) == 10
+    starts = []
+    for X_batch, y_batch in batches:
+        assert type(X_batch) is np.ndarray
+        start = int(np.flatnonzero(np.all(X == X_batch[0], axis=1))[0])
+        np.testing.assert_array_equal(X_batch, X[start:start+10])
+        np.testing.assert_array_equal(y_batch, y[start:start+10])
+        starts.append(start)
+    assert sorted(starts) == list(range(0, 95, 10)) and starts != sorted(starts)
+
+def test_in_memory_batches_are_a_full_permutation():
+    X, y, _, _ = make_data(95, 3, seed=9)
+    batches = list(luc.iter_minibatches(X, y, 10, shuffle=True, rng=np.random.default_rng(0)))
+    X_seen = np.concatenate([X_batch for X_batch, _ in batches])
+    assert not np.array_equal(X_seen, X)
+    np.testing.assert_array_equal(np.sort(X_seen, axis=0), np.sort(X, axis=0))
+
+def test_generator_source_is_single_epoch():
+    X, y, w, b = make_data(40, 2, seed=10)
+    batches = ((X[i:i+8], y[i:i+8]) for i in range(0, 40, 8))
+    with pytest.raises(ValueError):
+        luc.gradient_descent_minibatch(batches, w, b, 0.05, 2, verbose=False)
+    batches = ((X[i:i+8], y[i:i+8]) for i in range(0, 40, 8))
+    _, _, J_hist, info = luc.gradient_descent_minibatch(batches, w, b, 0.05, 1, verbose=False, return_info=True)
+    assert info['updates'] == 5 and info['examples'] == 40 and len(J_hist) == 5
+    chunks = lambda: ((X[i:i+8], y[i:i+8]) for i in range(0, 40, 8))
+    _, _, _, info = luc.gradient_descent_minibatch(chunks, w, b, 0.05, 3, verbose=False, return_info=True)
+    assert info['updates'] == 15
+
+def test_full_batch_matches_gradient_descent(tmp_path):
+    X, y, w, b = make_data(60, 4, seed=11)
+    w_gd, b_gd, _ = luc.gradient_descent(X, y, w, b, 0.1, 200, verbose=False)
+    w_mb, b_mb, _ = luc.gradient_descent_minibatch((make_memmap(tmp_path, X), y), w, b, 0.1, 200,
+                                                   batch_size=60, shuffle=False, verbose=False)
+    np.testing.assert_allclose(w_mb, w_gd, rtol=1e-10)
+    np.testing.assert_allclose(b_mb, b_gd, rtol=1e-10)
+
+def test_minibatches_converge_to_the_full_batch_solution(tmp_path):
+    X, y, w, b = make_data(200, 3, seed=12)
+    w_gd, b_gd, _ = luc.gradient_descent(X, y, w, b, 0.1, 2000, verbose=False)
+    w_mb, b_mb, J_hist = luc.gradient_descent_minibatch((make_memmap(tmp_path, X), y), w, b, 0.02, 200,
+                                                        batch_size=16, seed=0, verbose=False)
+    np.testing.assert_allclose(w_mb, w_gd, atol=0.02)
+    np.testing.assert_allclose(b_mb, b_gd, atol=0.02)
+    assert np.mean(J_hist[-50:]) < np.mean(J_hist[:10])
+
+##########################################################
+# gradient_descent_sweep
+##########################################################
+
+@pytest.mark.parametrize("logistic,lambda_", [(False, 0), (False, 0.5), (True, 0), (True, 0.5)])
+def test_sweep_columns_match_gradient_descent(logistic, lambda_):
+    X, y, w, b = make_data(40, 3, logistic=logistic, seed=13)
+    alphas = np.array([0.001, 0.01, 0.1, 0.3])
+    W, B, J_hist, p_hist = luc.gradient_descent_sweep(X, y, w, b, alphas, 150, logistic, lambda_)
+    assert W.shape == (3, 4) and B.shape == (4,) and J_hist.shape == (150, 4) and p_hist.shape == (150, 4, 4)
+    for k, alpha in enumerate(alphas):
+        history = luc.history_recorder(150)
+        w_k, b_k, J_k = luc.gradient_descent(X, y, w, b, alpha, 150, logistic, lambda_, verbose=False,
+                                             history=history)
+        np.testing.assert_allclose(W[:, k], w_k, rtol=1e-9, atol=1e-12)
+        np.testing.assert_allclose(B[k], b_k, rtol=1e-9, atol=1e-12)
+        np.testing.assert_allclose(J_hist[:, k], J_k, rtol=1e-9)
+        np.testing.assert_allclose(p_hist[:, k], history.p_hist, rtol=1e-9, atol=1e-12)